@@ -1,36 +1,75 @@
 import uuid
 
+from api.dependencies import IDEMPOTENCY_KEY_QUERIES, IdempotencyKeyHeader
 from app.database import async_session_maker
+from app.notifications import SSE_HEADERS
+from app.query_budget import query_budget
 from fastapi import APIRouter, Query
 from schemas.acceptance import (
+    MAX_ACCEPTANCE_TASKS_PAGE_SIZE,
     CreateAcceptanceRequest,
     CreateAcceptanceResponse,
     GetAcceptanceInfoResponse,
 )
 from services.acceptance import AcceptanceService
+from services.idempotency import IdempotencyService
 from starlette import status
+from starlette.responses import StreamingResponse
 
 router = APIRouter(
     tags=["Acceptance"],
 )
 
 
+# Приемка, количество принятых товаров и страница задач
 @router.get("/getAcceptanceInfo", response_model=GetAcceptanceInfoResponse)
+@query_budget(3)
 async def get_acceptance_info(
     id: uuid.UUID = Query(),
+    task_cursor: uuid.UUID | None = Query(None, description="next_task_cursor предыдущей страницы"),
+    task_limit: int | None = Query(None, ge=1, le=MAX_ACCEPTANCE_TASKS_PAGE_SIZE, description="Размер страницы задач"),
 ) -> GetAcceptanceInfoResponse:
     """Получить инфо о приемке"""
     return await AcceptanceService(
         db_session_maker=async_session_maker,
-    ).get_acceptance_info(id=id)
+    ).get_acceptance_info(id=id, task_cursor=task_cursor, task_limit=task_limit)
 
 
+# Без бюджета: поток перечитывает приемку после каждого изменения, число запросов зависит от числа изменений
+@router.get("/watchAcceptance", response_class=StreamingResponse)
+async def watch_acceptance(
+    id: uuid.UUID = Query(),
+) -> StreamingResponse:
+    """Подписка на изменения приемки (Server-Sent Events): событие acceptance с GetAcceptanceInfoResponse
+    сразу и после каждого изменения задач, поток закрывается, когда не осталось задач в работе"""
+    stream = await AcceptanceService(
+        db_session_maker=async_session_maker,
+    ).watch_acceptance(id=id)
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# Приемка, SKU, товары, стоки, задачи, счетчики стоков, фоновая задача и сообщение outbox; товары, стоки и задачи
+# пишутся пачками по insertmanyvalues_page_size строк, бюджет рассчитан на приемку до 1000 товаров
 @router.post("/createAcceptance", response_model=CreateAcceptanceResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(8 + IDEMPOTENCY_KEY_QUERIES)
 async def create_acceptance(
     request_data: CreateAcceptanceRequest,
+    idempotency_key: IdempotencyKeyHeader = None,
 ) -> CreateAcceptanceResponse:
     """Создать задачу на приемку товара"""
     # TODO: Добавить валидацию на пустые списки
-    return await AcceptanceService(
+    service = AcceptanceService(
+        db_session_maker=async_session_maker,
+    )
+    return await IdempotencyService(
         db_session_maker=async_session_maker,
-    ).create_acceptance(request_data=request_data)
+    ).execute(
+        endpoint="createAcceptance",
+        key=idempotency_key,
+        request_data=request_data,
+        operation=lambda idempotent_request: service.create_acceptance(
+            request_data=request_data,
+            idempotent_request=idempotent_request,
+        ),
+        response_model=CreateAcceptanceResponse,
+    )
@@ -1,9 +1,17 @@
-from collections.abc import Generator
+from typing import Annotated
 
-from app.database import async_session_maker
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Header
 
+# Ключ идемпотентности запросов на запись: повтор запроса с тем же ключом возвращает сохраненный ответ
+IdempotencyKeyHeader = Annotated[
+    str | None,
+    Header(
+        alias="Idempotency-Key",
+        max_length=256,
+        description="Уникальный ключ запроса, повторы с тем же ключом не выполняются повторно",
+    ),
+]
 
-async def get_db() -> Generator[AsyncSession, None, None]:
-    async with async_session_maker() as session:
-        yield session
+# SQL-запросы к таблице ключей идемпотентности при запросе с ключом: проверка сохраненного ответа и сохранение
+# ответа в транзакции запроса, учитываются в бюджете запросов маршрутов на запись (app.query_budget)
+IDEMPOTENCY_KEY_QUERIES = 2
@@ -1,6 +1,8 @@
 import uuid
 
+from api.dependencies import IDEMPOTENCY_KEY_QUERIES, IdempotencyKeyHeader
 from app.database import async_session_maker
+from app.query_budget import query_budget
 from fastapi import APIRouter, Query
 from providers.discount import DiscountProvider
 from schemas.discount import (
@@ -11,6 +13,7 @@ from schemas.discount import (
 )
 from service_models import CreateDiscountDTO
 from services.discount import DiscountService
+from services.idempotency import IdempotencyService, IdempotentRequest
 from starlette import status
 
 router = APIRouter(
@@ -18,7 +21,9 @@ router = APIRouter(
 )
 
 
+# Акция и ее SKU
 @router.get("/getDiscount", response_model=DiscountSchema)
+@query_budget(2)
 async def get_discount(
     id: uuid.UUID = Query(),
 ) -> DiscountSchema:
@@ -36,24 +41,41 @@ async def get_discount(
     )
 
 
+# SKU, акция, привязка SKU к акции, фоновая задача пересчета цен и сообщение outbox
 @router.post("/createDiscount", response_model=CreateDiscountResponseSchema, status_code=status.HTTP_201_CREATED)
+@query_budget(5 + IDEMPOTENCY_KEY_QUERIES)
 async def create_discount(
     request_data: CreateDiscountSchema,
+    idempotency_key: IdempotencyKeyHeader = None,
 ) -> CreateDiscountResponseSchema:
     """Создание акции"""
-    discount_id = await DiscountService(
-        db_session_maker=async_session_maker,
-        discount_provider=DiscountProvider,
-    ).create_discount(
-        discount_data=CreateDiscountDTO(
-            sku_ids=request_data.sku_ids,
-            percentage=request_data.percentage,
+    async def create(idempotent_request: IdempotentRequest | None) -> CreateDiscountResponseSchema:
+        discount_id = await DiscountService(
+            db_session_maker=async_session_maker,
+            discount_provider=DiscountProvider,
+        ).create_discount(
+            discount_data=CreateDiscountDTO(
+                sku_ids=request_data.sku_ids,
+                percentage=request_data.percentage,
+            ),
+            idempotent_request=idempotent_request,
         )
+        return CreateDiscountResponseSchema(id=discount_id)
+
+    return await IdempotencyService(
+        db_session_maker=async_session_maker,
+    ).execute(
+        endpoint="createDiscount",
+        key=idempotency_key,
+        request_data=request_data,
+        operation=create,
+        response_model=CreateDiscountResponseSchema,
     )
-    return CreateDiscountResponseSchema(id=discount_id)
 
 
+# Статус акции, пересчет актуальных цен ее SKU и сообщения outbox
 @router.post("/cancelDiscount", status_code=status.HTTP_200_OK)
+@query_budget(3)
 async def cancel_discount(
     request_data: CancelDiscountSchema,
 ):
@@ -0,0 +1,28 @@
+from app.cache import default_cache
+from app.database import get_pool_stats
+from app.metrics import observe_cache, observe_pool, registry
+from app.query_budget import query_budget
+from fastapi import APIRouter, Request
+from schemas.monitoring import GetPoolStatsResponse
+from starlette.responses import PlainTextResponse
+
+router = APIRouter(
+    tags=["Monitoring"],
+)
+
+
+# Состояние пула и метрики собираются в памяти процесса, без SQL-запросов
+@router.get("/getPoolStats", response_model=GetPoolStatsResponse)
+@query_budget(0)
+async def get_db_pool_stats(request: Request) -> GetPoolStatsResponse:
+    """Состояние пула соединений с БД"""
+    return GetPoolStatsResponse(**get_pool_stats(request.app.state.engine))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+@query_budget(0)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    """Метрики приложения в текстовом формате Prometheus"""
+    observe_pool(get_pool_stats(request.app.state.engine))
+    observe_cache(default_cache)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
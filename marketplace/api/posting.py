@@ -1,23 +1,32 @@
 import uuid
 from typing import Any
 
+from api.dependencies import IDEMPOTENCY_KEY_QUERIES, IdempotencyKeyHeader
 from app.database import async_session_maker
+from app.notifications import SSE_HEADERS
+from app.query_budget import query_budget
 from fastapi import APIRouter, Query
+from schemas.batch import BatchRequest
 from schemas.posting import (
     CancelPostingRequest,
     CreatePostingRequest,
     CreatePostingResponse,
+    GetPostingBatchResponse,
     GetPostingResponse,
 )
+from services.idempotency import IdempotencyService
 from services.posting import PostingService
 from starlette import status
+from starlette.responses import StreamingResponse
 
 router = APIRouter(
     tags=["Posting"],
 )
 
 
+# Заказ, товары со стоками и задачи
 @router.get("/getPosting", response_model=GetPostingResponse)
+@query_budget(3)
 async def get_posting(
     id: uuid.UUID = Query(),
 ) -> GetPostingResponse:
@@ -27,22 +36,77 @@ async def get_posting(
     ).get_posting(posting_id=id)
 
 
+# Заказы, товары со стоками и задачи - по запросу на все заказы
+@router.post("/getPostingBatch", response_model=GetPostingBatchResponse)
+@query_budget(3)
+async def get_posting_batch(
+    request_data: BatchRequest,
+) -> GetPostingBatchResponse:
+    """Получение информации по заказам по списку ID, результаты в порядке запроса"""
+    return await PostingService(
+        db_session_maker=async_session_maker,
+    ).get_posting_batch(ids=request_data.ids)
+
+
+# Без бюджета: поток перечитывает заказ после каждого изменения, число запросов зависит от числа изменений
+@router.get("/watchPosting", response_class=StreamingResponse)
+async def watch_posting(
+    id: uuid.UUID = Query(),
+) -> StreamingResponse:
+    """Подписка на изменения заказа (Server-Sent Events): событие posting с GetPostingResponse
+    сразу и после каждого изменения статуса или задач, поток закрывается после отправки или отмены заказа"""
+    stream = await PostingService(
+        db_session_maker=async_session_maker,
+    ).watch_posting(posting_id=id)
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# Заказ, резерв стоков, задачи на подбор, счетчики стоков, фоновая задача сбора и сообщения outbox
 @router.post("/createPosting", response_model=CreatePostingResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(6 + IDEMPOTENCY_KEY_QUERIES)
 async def create_posting(
     request_data: CreatePostingRequest,
+    idempotency_key: IdempotencyKeyHeader = None,
 ) -> CreatePostingResponse:
     """Создание заказа"""
-    return await PostingService(
+    service = PostingService(
         db_session_maker=async_session_maker,
-    ).create_posting(request_data=request_data)
+    )
+    return await IdempotencyService(
+        db_session_maker=async_session_maker,
+    ).execute(
+        endpoint="createPosting",
+        key=idempotency_key,
+        request_data=request_data,
+        operation=lambda idempotent_request: service.create_posting(
+            request_data=request_data,
+            idempotent_request=idempotent_request,
+        ),
+        response_model=CreatePostingResponse,
+    )
 
 
+# Заказ под блокировкой и его задачи, отмена задач на подбор и перепроверка их статусов, снятие резерва,
+# задачи на размещение, доменные события и фоновая задача, статус заказа, счетчики стоков, outbox и уведомление
 @router.post("/cancelPosting", status_code=status.HTTP_200_OK)
+@query_budget(12 + IDEMPOTENCY_KEY_QUERIES)
 async def cancel_posting(
     request_data: CancelPostingRequest,
+    idempotency_key: IdempotencyKeyHeader = None,
 ) -> Any:
     """Отмена заказа"""
-    await PostingService(
+    service = PostingService(
+        db_session_maker=async_session_maker,
+    )
+    await IdempotencyService(
         db_session_maker=async_session_maker,
-    ).cancel_posting(request_data=request_data)
+    ).execute(
+        endpoint="cancelPosting",
+        key=idempotency_key,
+        request_data=request_data,
+        operation=lambda idempotent_request: service.cancel_posting(
+            request_data=request_data,
+            idempotent_request=idempotent_request,
+        ),
+    )
     return status.HTTP_200_OK
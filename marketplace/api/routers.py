@@ -1,5 +1,6 @@
 from api.acceptance import router as router_acceptance
 from api.discount import router as router_discount
+from api.monitoring import router as router_monitoring
 from api.posting import router as router_posting
 from api.sku import router as router_sku
 from api.task import router as router_task
@@ -10,4 +11,5 @@ all_routers = [
     router_discount,
     router_sku,
     router_acceptance,
+    router_monitoring,
 ]
@@ -2,19 +2,27 @@ import uuid
 from typing import Any
 
 from app.database import async_session_maker
+from app.query_budget import query_budget
 from fastapi import APIRouter, Query
 from providers.sku import SkuProvider
+from schemas.batch import BatchRequest
 from schemas.sku import (
+    MAX_ITEMS_PAGE_SIZE,
+    GetItemInfoBatchResponse,
     GetItemInfoBySkuIdResponse,
     GetItemInfoResponse,
+    GetSkuInfoBatchResponse,
     GetSkuInfoResponse,
+    GetSkuStockCountersResponse,
     MarkdownItemRequest,
     MoveToNotFoundRequest,
     SetSkuPriceRequest,
     ToggleIsHiddenRequest,
 )
 from services.sku import SkuService
+from services.stock_counter import StockCounterService
 from starlette import status
+from starlette.responses import StreamingResponse
 
 router = APIRouter(
     tags=["Sku"],
@@ -22,6 +30,7 @@ router = APIRouter(
 
 
 @router.get("/getItemInfo", response_model=GetItemInfoResponse)
+@query_budget(1)
 async def get_item_info(
     id: uuid.UUID = Query(),
 ) -> GetItemInfoResponse:
@@ -33,6 +42,7 @@ async def get_item_info(
 
 
 @router.get("/getSkuInfo", response_model=GetSkuInfoResponse)
+@query_budget(1)
 async def get_sku_info(
     id: uuid.UUID = Query(),
 ) -> GetSkuInfoResponse:
@@ -43,18 +53,72 @@ async def get_sku_info(
     ).get_sku_info(sku_id=id)
 
 
+@router.post("/getItemInfoBatch", response_model=GetItemInfoBatchResponse)
+@query_budget(1)
+async def get_item_info_batch(
+    request_data: BatchRequest,
+) -> GetItemInfoBatchResponse:
+    """Получение инфо о копиях товаров по списку ID, результаты в порядке запроса"""
+    return await SkuService(
+        db_session_maker=async_session_maker,
+    ).get_item_info_batch(ids=request_data.ids)
+
+
+@router.post("/getSkuInfoBatch", response_model=GetSkuInfoBatchResponse)
+@query_budget(1)
+async def get_sku_info_batch(
+    request_data: BatchRequest,
+) -> GetSkuInfoBatchResponse:
+    """Получение инфо о товарных группах по списку ID, результаты в порядке запроса"""
+    return await SkuService(
+        db_session_maker=async_session_maker,
+    ).get_sku_info_batch(ids=request_data.ids)
+
+
+# Стоки товаров SKU одним запросом: страницей или потоком через серверный курсор
 @router.get("/getItemInfoBySkuId", response_model=GetItemInfoBySkuIdResponse)
+@query_budget(1)
 async def get_item_info_by_sku_id(
     id: uuid.UUID = Query(),
-) -> GetItemInfoBySkuIdResponse:
+    cursor: uuid.UUID | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int | None = Query(None, ge=1, le=MAX_ITEMS_PAGE_SIZE, description="Размер страницы"),
+    stream: bool = Query(False, description="Отдать все товары потоком NDJSON, по строке ItemInfo на товар"),
+) -> GetItemInfoBySkuIdResponse | StreamingResponse:
     """Получение всех копий товаров с одинаковым SKU"""
-    return await SkuService(
+    service = SkuService(
         db_session_maker=async_session_maker,
         sku_provider=SkuProvider,
-    ).get_item_info_by_sku_id(sku_id=id)
+    )
+    if stream:
+        return StreamingResponse(service.stream_item_info_by_sku_id(sku_id=id), media_type="application/x-ndjson")
+    return await service.get_item_info_by_sku_id(sku_id=id, cursor=cursor, limit=limit)
+
+
+@router.get("/getSkuStockCounters", response_model=GetSkuStockCountersResponse)
+@query_budget(1)
+async def get_sku_stock_counters(
+    id: uuid.UUID = Query(),
+) -> GetSkuStockCountersResponse:
+    """Количество товаров SKU по стокам и резерву"""
+    return await SkuService(
+        db_session_maker=async_session_maker,
+    ).get_sku_stock_counters(sku_id=id)
+
+
+# Фоновая задача сверки
+@router.post("/reconcileSkuStockCounters", status_code=status.HTTP_202_ACCEPTED)
+@query_budget(1)
+async def reconcile_sku_stock_counters() -> Any:
+    """Запустить сверку счетчиков стоков SKU со стоками, расхождения исправляются и пишутся в лог"""
+    await StockCounterService(
+        db_session_maker=async_session_maker,
+    ).request_reconciliation()
+    return status.HTTP_202_ACCEPTED
 
 
+# Товар и его задачи с заказами, скидка, отмена задачи на подбор и новая задача, доменные события и фоновая задача
 @router.post("/markdownItem", status_code=status.HTTP_200_OK)
+@query_budget(7)
 async def markdown_item(
     request_data: MarkdownItemRequest,
 ) -> Any:
@@ -66,7 +130,9 @@ async def markdown_item(
     return status.HTTP_200_OK
 
 
+# Базовая цена, пересчет актуальной цены и сообщение outbox
 @router.post("/setSkuPrice", status_code=status.HTTP_200_OK)
+@query_budget(3)
 async def set_sku_price(
     request_data: SetSkuPriceRequest,
 ) -> Any:
@@ -79,6 +145,7 @@ async def set_sku_price(
 
 
 @router.post("/toggleIsHidden", status_code=status.HTTP_200_OK)
+@query_budget(1)
 async def toggle_is_hidden(
     request_data: ToggleIsHiddenRequest,
 ) -> Any:
@@ -90,7 +157,10 @@ async def toggle_is_hidden(
     return status.HTTP_200_OK
 
 
+# Товар и его задачи с заказами, блокировка заказов, отмена задач на подбор, резерв замен и задачи на их подбор,
+# доменные события и фоновая задача, сообщения outbox, сток и счетчики стоков
 @router.post("/moveToNotFound", status_code=status.HTTP_200_OK)
+@query_budget(11)
 async def move_to_not_found(
     request_data: MoveToNotFoundRequest,
 ) -> Any:
@@ -2,8 +2,16 @@ import uuid
 from typing import Any
 
 from app.database import async_session_maker
+from app.query_budget import query_budget
 from fastapi import APIRouter, Query
-from schemas.task import FinishTaskRequest, GetTaskInfoResponse
+from schemas.batch import BatchRequest
+from schemas.task import (
+    FinishTaskRequest,
+    FinishTasksRequest,
+    FinishTasksResponse,
+    GetTaskInfoBatchResponse,
+    GetTaskInfoResponse,
+)
 from services.task import TaskService
 from starlette import status
 
@@ -13,6 +21,7 @@ router = APIRouter(
 
 
 @router.get("/getTaskInfo", response_model=GetTaskInfoResponse)
+@query_budget(1)
 async def get_task_info(
     id: uuid.UUID = Query(),
 ) -> GetTaskInfoResponse:
@@ -22,7 +31,19 @@ async def get_task_info(
     ).get_task_info(task_id=id)
 
 
+@router.post("/getTaskInfoBatch", response_model=GetTaskInfoBatchResponse)
+@query_budget(1)
+async def get_task_info_batch(
+    request_data: BatchRequest,
+) -> GetTaskInfoBatchResponse:
+    """Получение деталей задач по списку ID, результаты в порядке запроса"""
+    return await TaskService(
+        db_session_maker=async_session_maker,
+    ).get_task_info_batch(ids=request_data.ids)
+
+
 @router.post("/finishTask", status_code=status.HTTP_200_OK)
+@query_budget(4)
 async def finish_task(
     request_data: FinishTaskRequest,
 ) -> Any:
@@ -31,3 +52,16 @@ async def finish_task(
         db_session_maker=async_session_maker,
     ).finish_task(request_data=request_data)
     return status.HTTP_200_OK
+
+
+# Завершение задач, статусы незавершенных задач, постановка обработки приемок, запись событий задач
+# и уведомления подписчиков приемок
+@router.post("/finishTasks", response_model=FinishTasksResponse)
+@query_budget(6)
+async def finish_tasks(
+    request_data: FinishTasksRequest,
+) -> FinishTasksResponse:
+    """Пакетное завершение задач, результаты в порядке запроса"""
+    return await TaskService(
+        db_session_maker=async_session_maker,
+    ).finish_tasks(request_data=request_data)
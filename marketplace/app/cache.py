@@ -0,0 +1,115 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+
+from app.config import config
+
+
+class CacheBackend(ABC):
+    """Хранилище кэша
+
+    Значения - строки (сериализованные ответы), поэтому хранилище может быть как локальным,
+    так и общим для всех процессов (например Redis).
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """LRU-кэш с ограничением времени жизни записей внутри процесса"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Ключ -> (момент устаревания по time.monotonic, значение)
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> str | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Cache:
+    """Read-through кэш
+
+    Ключи имеют вид "<пространство имен>:<ID>", статистика попаданий ведется по пространствам имен.
+    Инвалидация выполняется после фиксации транзакции записи. Если чтение из БД завершилось раньше записи,
+    а в кэш попало позже инвалидации, устаревшее значение проживет не дольше ttl.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._stats: dict[str, CacheStats] = {}
+
+    def _get_stats(self, key: str) -> CacheStats:
+        namespace = key.split(":", 1)[0]
+        return self._stats.setdefault(namespace, CacheStats())
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[str]]) -> str:
+        if not self.enabled:
+            return await loader()
+        stats = self._get_stats(key)
+        value = await self.backend.get(key)
+        if value is not None:
+            stats.hits += 1
+            return value
+        stats.misses += 1
+        value = await loader()
+        await self.backend.set(key, value, self.ttl)
+        return value
+
+    async def invalidate(self, keys: Iterable[str]) -> None:
+        if not self.enabled:
+            return
+        await self.backend.delete(keys)
+
+    def stats(self) -> dict[str, CacheStats]:
+        return dict(self._stats)
+
+
+default_cache = Cache(
+    backend=InMemoryCacheBackend(max_size=config.CACHE_MAX_SIZE),
+    ttl=config.CACHE_TTL,
+    enabled=config.CACHE_ENABLED,
+)
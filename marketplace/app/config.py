@@ -2,6 +2,8 @@ from pydantic import PostgresDsn, computed_field
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.query_budget import QueryBudgetMode
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -16,6 +18,64 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
 
+    # Движок БД и пул соединений
+    # Логирование всех SQL-запросов, только для отладки
+    DB_ECHO: bool = False
+    # Постоянные соединения пула на процесс, подбирается под количество воркеров и max_connections в Postgres
+    DB_POOL_SIZE: int = 5
+    # Дополнительные соединения сверх DB_POOL_SIZE при пиковой нагрузке
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько секунд ждать свободное соединение, прежде чем выбросить ошибку
+    DB_POOL_TIMEOUT: float = 30.0
+    # Через сколько секунд соединение пересоздается, -1 - не пересоздавать
+    DB_POOL_RECYCLE: int = 1800
+    # Проверка соединения перед выдачей из пула
+    DB_POOL_PRE_PING: bool = True
+    # Кэш подготовленных запросов asyncpg на соединение, 0 - отключить (нужно для pgbouncer в режиме transaction)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Кэш подготовленных запросов диалекта SQLAlchemy для asyncpg, 0 - отключить
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
+    # Кэш чтения SKU и товаров внутри процесса
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_SIZE: int = 10000
+    # Время жизни записи в секундах, ограничивает устаревание при записи из других процессов
+    CACHE_TTL: float = 30.0
+
+    # Фоновые задачи
+    JOBS_ENABLED: bool = True
+    # Максимальное количество одновременно выполняемых задач в процессе
+    JOBS_CONCURRENCY: int = 4
+    JOBS_POLL_INTERVAL: float = 1.0
+    JOBS_MAX_ATTEMPTS: int = 5
+    # Базовая задержка перед повтором, далее растет экспоненциально
+    JOBS_RETRY_BACKOFF: float = 2.0
+    # Через сколько секунд задача упавшего обработчика снова доступна для выполнения
+    JOBS_LEASE_TIMEOUT: float = 600.0
+    # Максимальное количество доменных событий, обрабатываемых одной транзакцией
+    DOMAIN_EVENTS_BATCH_SIZE: int = 1000
+
+    # Публикация изменений для внешних систем (outbox)
+    OUTBOX_ENABLED: bool = True
+    # Файл NDJSON, в который дописываются опубликованные сообщения
+    OUTBOX_FILE_PATH: str = "outbox.ndjson"
+    # Максимальное количество сообщений, публикуемых одной транзакцией
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+
+    # Подписки на изменения заказов и приемок (SSE) через Postgres LISTEN/NOTIFY
+    NOTIFICATIONS_ENABLED: bool = True
+    # Через сколько секунд простоя в поток подписки отправляется keepalive
+    NOTIFICATIONS_HEARTBEAT_INTERVAL: float = 15.0
+
+    # Ключи идемпотентности запросов на запись
+    # Сколько секунд хранится ответ на запрос с ключом, после этого ключ можно использовать заново
+    IDEMPOTENCY_KEY_TTL: float = 86400.0
+
+    # Проверка бюджета SQL-запросов маршрутов (app.query_budget): off, warn - предупреждение в лог,
+    # raise - ошибка с текстами запросов (режим тестов)
+    QUERY_BUDGET_MODE: QueryBudgetMode = "off"
+
     @computed_field  # type: ignore[misc]
     @property
     def DATABASE_URI(self) -> PostgresDsn:
@@ -1,23 +1,95 @@
+import time
+from dataclasses import dataclass
 from typing import Annotated
 
-from sqlalchemy import String, inspect
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import String, exc, inspect, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import ColumnProperty, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from app.config import config
+from app.config import Settings, config
+
+
+@dataclass
+class PoolWaitStats:
+    """Накопленная статистика ожидания соединения из пула"""
+    checkouts: int = 0
+    timeouts: int = 0
+    # Суммарное и максимальное время получения соединения, включая открытие нового соединения
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.wait_stats.checkouts += 1
+            self.wait_stats.wait_seconds_total += elapsed
+            self.wait_stats.wait_seconds_max = max(self.wait_stats.wait_seconds_max, elapsed)
+
+
+def create_engine(settings: Settings = config) -> AsyncEngine:
+    url = make_url(str(settings.DATABASE_URI)).update_query_dict({
+        "prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE),
+    })
+    return create_async_engine(
+        url=url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            # TODO: asyncpg не принимает "options" - уточнить замену
+            # https://stackoverflow.com/a/59932909
+            # "options": "-c timezone=utc",
+        },
+    )
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    """Текущее состояние пула соединений движка"""
+    pool = engine.sync_engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    wait_stats: PoolWaitStats | None = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(
+            checkouts=wait_stats.checkouts,
+            timeouts=wait_stats.timeouts,
+            wait_seconds_total=wait_stats.wait_seconds_total,
+            wait_seconds_max=wait_stats.wait_seconds_max,
+        )
+    return stats
 
-engine = create_async_engine(
-    url=str(config.DATABASE_URI),
-    echo=True,
-    # TODO: asyncpg не принимает "options" - уточнить замену
-    # connect_args={
-    #     # https://stackoverflow.com/a/59932909
-    #     "options": "-c timezone=utc",
-    # }
-)
 
+# Движок создается и привязывается к фабрике в lifespan приложения, при импорте соединений с БД нет
 async_session_maker = async_sessionmaker(
-    bind=engine,
     class_=AsyncSession,
     autocommit=False,
     autoflush=False,
@@ -1,27 +1,53 @@
-from urllib.request import Request
-
 from fastapi import FastAPI
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.exceptions import AppError, ValidationError, app_exc_from_http_exception
 
 
-async def exception_handler_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except Exception as exc:
-        # logger.error(f'Unhandled error: {exc!r}', exc_info=True)
+class ExceptionHandlerMiddleware:
+    """Перевод необработанных исключений в ответ с AppError
+
+    Реализовано как чистое ASGI middleware: в отличие от BaseHTTPMiddleware не создает
+    дополнительных задач и потоков на каждый запрос и не буферизует потоковые ответы.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # logger.error(f'Unhandled error: {exc!r}', exc_info=True)
+
+            # Если заголовки ответа уже отправлены, ответ с ошибкой отправить нельзя
+            if response_started:
+                raise
 
-        if not isinstance(exc, AppError):
-            original_exc = exc
-            exc = AppError(log=False)
-            exc.__cause__ = original_exc
+            if not isinstance(exc, AppError):
+                original_exc = exc
+                exc = AppError(log=False)
+                exc.__cause__ = original_exc
 
-        return await app_error_handler(request, exc)
+            response = await app_error_handler(Request(scope), exc)
+            await response(scope, receive, send)
 
 
 async def app_error_handler(request: Request, exc: AppError) -> JSONResponse:
@@ -62,4 +88,4 @@ def setup_exception_handlers(app: FastAPI) -> None:
     # request_id middleware будет пропущено при поднятии исключения.
     # Поэтому для отлова исключений используется свое middleware,
     # которое должно отрабатывать до request_id middleware.
-    app.add_middleware(BaseHTTPMiddleware, dispatch=exception_handler_middleware)
+    app.add_middleware(ExceptionHandlerMiddleware)
@@ -16,6 +16,7 @@ class ErrorCodes(enum.Enum):
 
     EX_NOT_FOUND = 'EX_NOT_FOUND'
     EX_FORBIDDEN = 'EX_FORBIDDEN'
+    EX_CONFLICT = 'EX_CONFLICT'
 
 
 @dataclass
@@ -100,11 +101,18 @@ class MethodNotAllowedError(ExternalBusinessError):
     message: str | None = 'Method not allowed.'
 
 
+@dataclass
+class ConflictError(ExternalBusinessError):
+    status_code: int = 409
+    error: str = ErrorCodes.EX_CONFLICT.value
+    message: str | None = 'Request conflicts with the current state of the resource.'
+
+
 _CODE_TO_CLASS_MAP = {
     **{422: ValidationError},
     **{
         cls.status_code: cls
-        for cls in [ValidationError, ForbiddenError, NotFoundError, MethodNotAllowedError]
+        for cls in [ValidationError, ForbiddenError, NotFoundError, MethodNotAllowedError, ConflictError]
     }
 }
 
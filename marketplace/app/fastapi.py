@@ -1,25 +1,82 @@
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+
 from fastapi import FastAPI
+from services.jobs import JOB_HANDLERS
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import configure_mappers
 
+from app.config import config
+from app.database import async_session_maker, create_engine
 from app.exception_handlers import setup_exception_handlers
+from app.jobs import JobRunner
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.notifications import default_notification_hub
+from app.outbox import NdjsonFileSink, OutboxRelay
+from app.query_budget import QueryBudgetMiddleware, instrument_query_budget
 from marketplace.api.routers import all_routers
 
 
-def create_app() -> FastAPI:
+@asynccontextmanager
+async def lifespan(
+    app: FastAPI,
+    engine_factory: Callable[[], AsyncEngine] = create_engine,
+) -> AsyncIterator[None]:
+    # Пул соединений привязан к циклу событий, поэтому движок создается при запуске, а не при импорте
+    engine = engine_factory()
+    instrument_engine(engine)
+    instrument_query_budget(engine)
+    async_session_maker.configure(bind=engine)
+    app.state.engine = engine
+
+    job_runner = JobRunner(
+        db_session_maker=async_session_maker,
+        handlers=JOB_HANDLERS,
+        concurrency=config.JOBS_CONCURRENCY,
+        poll_interval=config.JOBS_POLL_INTERVAL,
+        retry_backoff=config.JOBS_RETRY_BACKOFF,
+        lease_timeout=config.JOBS_LEASE_TIMEOUT,
+    )
+    outbox_relay = OutboxRelay(
+        db_session_maker=async_session_maker,
+        sink=NdjsonFileSink(path=Path(config.OUTBOX_FILE_PATH)),
+        batch_size=config.OUTBOX_BATCH_SIZE,
+        poll_interval=config.OUTBOX_POLL_INTERVAL,
+    )
+    if config.JOBS_ENABLED:
+        await job_runner.start()
+    if config.OUTBOX_ENABLED:
+        await outbox_relay.start()
+    if config.NOTIFICATIONS_ENABLED:
+        await default_notification_hub.start(engine)
+    yield
+    await default_notification_hub.stop()
+    await outbox_relay.stop()
+    await job_runner.stop()
+    # Закрываем соединения пула, чтобы не оставлять висящие сессии в Postgres
+    await engine.dispose()
+
+
+def create_app(engine_factory: Callable[[], AsyncEngine] = create_engine) -> FastAPI:
+    """Приложение, engine_factory - создание движка БД при запуске, тесты передают движок тестовой БД"""
     app = FastAPI(
         title="Универмаг 2.0",
         openapi_url="/openapi.json",
+        lifespan=partial(lifespan, engine_factory=engine_factory),
     )
     # Порядок регистрации middleware важен
     setup_exception_handlers(app)
+    # Бюджет запросов проверяется снаружи обработчика ошибок, чтобы превышение не превращалось в ответ с ошибкой
+    if config.QUERY_BUDGET_MODE != "off":
+        app.add_middleware(QueryBudgetMiddleware, mode=config.QUERY_BUDGET_MODE)
+    # Метрики добавляются последними, чтобы middleware было внешним и учитывало ответы с ошибками
+    app.add_middleware(MetricsMiddleware)
 
     for router in all_routers:
         app.include_router(router)
 
-    _configure_db()
+    configure_mappers()
 
     return app
-
-
-def _configure_db():
-    configure_mappers()
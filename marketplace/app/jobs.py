@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from typing import TypeAlias
+
+from models import Job
+from providers.job import JobProvider
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+JobHandler: TypeAlias = Callable[[dict], Awaitable[None]]
+
+
+@dataclass
+class JobRunner:
+    """Обработчик фоновых задач внутри процесса приложения
+
+    Задачи хранятся в таблице jobs, поэтому переживают перезапуск приложения.
+    Одновременно выполняется не более concurrency задач, упавшие задачи повторяются
+    с экспоненциально растущей задержкой.
+    """
+    db_session_maker: Callable[[], AsyncSession]
+    handlers: Mapping[str, JobHandler]
+    concurrency: int = 4
+    poll_interval: float = 1.0
+    retry_backoff: float = 2.0
+    lease_timeout: float = 600.0
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+
+    _poller: asyncio.Task | None = field(default=None, init=False)
+    _running: set[asyncio.Task] = field(default_factory=set, init=False)
+
+    async def start(self) -> None:
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poller
+            self._poller = None
+        # Даем текущим задачам завершиться, незавершенные будут повторно взяты после истечения аренды
+        if self._running:
+            await asyncio.wait(self._running, timeout=timeout)
+
+    async def run_once(self) -> int:
+        """Взять в работу и запустить готовые задачи, не больше чем есть свободных слотов"""
+        free_slots = self.concurrency - len(self._running)
+        if free_slots <= 0:
+            return 0
+        async with self.db_session_maker() as session:
+            jobs = await self.job_provider(session).claim(
+                limit=free_slots,
+                lease_timeout=datetime.timedelta(seconds=self.lease_timeout),
+            )
+            await session.commit()
+        for job in jobs:
+            task = asyncio.create_task(self._execute(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        return len(jobs)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Не удалось получить фоновые задачи")
+                claimed = 0
+            # Если очередь не пуста, сразу пробуем взять следующую пачку
+            if not claimed:
+                await asyncio.sleep(self.poll_interval)
+            elif len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+
+    async def _execute(self, job: Job) -> None:
+        try:
+            handler = self.handlers[job.name]
+            await handler(job.payload)
+        except Exception as exc:
+            logger.exception("Ошибка выполнения фоновой задачи %s (%s)", job.name, job.id)
+            retry_delay = datetime.timedelta(seconds=self.retry_backoff * 2 ** (job.attempts - 1))
+            async with self.db_session_maker() as session:
+                await self.job_provider(session).mark_failed(job=job, error=repr(exc), retry_delay=retry_delay)
+                await session.commit()
+            return
+        async with self.db_session_maker() as session:
+            await self.job_provider(session).mark_done(id=job.id)
+            await session.commit()
@@ -0,0 +1,348 @@
+"""Метрики приложения в текстовом формате Prometheus
+
+Собираются:
+- время обработки HTTP-запросов по маршрутам
+- количество, время выполнения и количество строк SQL-запросов в рамках HTTP-запроса
+- время выполнения каждого SQL-запроса по типу операции
+- время выполнения методов сервисов
+- попадания в кэш чтения
+- расхождения счетчиков стоков SKU, найденные последней сверкой
+"""
+import functools
+import inspect
+import math
+import time
+from collections.abc import Callable, Iterable, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache import Cache
+
+DEFAULT_BUCKETS: Sequence[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS: Sequence[float] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Метка маршрута для запросов, не попавших ни в один маршрут, чтобы не плодить метки по произвольным URL
+UNMATCHED_ROUTE = "__unmatched__"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values, strict=True)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+@dataclass
+class _HistogramValue:
+    buckets: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], _HistogramValue] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        histogram = self._values.get(key)
+        if histogram is None:
+            histogram = self._values[key] = _HistogramValue(buckets=[0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                histogram.buckets[i] += 1
+        histogram.sum += value
+        histogram.count += 1
+
+    def get(self, **labels: str) -> tuple[int, float]:
+        """Количество наблюдений и их сумма"""
+        histogram = self._values.get(self._key(labels))
+        if histogram is None:
+            return 0, 0.0
+        return histogram.count, histogram.sum
+
+    def samples(self) -> Iterable[str]:
+        labelnames = (*self.labelnames, "le")
+        for key, histogram in self._values.items():
+            # Бакеты в формате Prometheus накопительные, значения уже посчитаны в observe
+            for bound, count in zip(self.buckets, histogram.buckets, strict=True):
+                yield f"{self.name}_bucket{_format_labels(labelnames, (*key, _format_value(bound)))} {count}"
+            yield f"{self.name}_bucket{_format_labels(labelnames, (*key, '+Inf'))} {histogram.count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(histogram.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {histogram.count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets=buckets)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    labelnames=("method", "route", "status"),
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    labelnames=("operation",),
+)
+db_request_queries = registry.histogram(
+    "db_request_queries",
+    "Количество SQL-запросов за HTTP-запрос",
+    labelnames=("route",),
+    buckets=COUNT_BUCKETS,
+)
+db_request_query_duration = registry.histogram(
+    "db_request_query_duration_seconds",
+    "Суммарное время SQL-запросов за HTTP-запрос",
+    labelnames=("route",),
+)
+db_request_rows = registry.histogram(
+    "db_request_rows",
+    "Количество строк, возвращенных или измененных SQL-запросами за HTTP-запрос",
+    labelnames=("route",),
+    buckets=COUNT_BUCKETS,
+)
+service_method_duration = registry.histogram(
+    "service_method_duration_seconds",
+    "Время выполнения метода сервиса",
+    labelnames=("service", "method"),
+)
+db_pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Соединения пула БД по состоянию",
+    labelnames=("state",),
+)
+db_pool_wait = registry.gauge(
+    "db_pool_wait_seconds",
+    "Время ожидания соединения из пула БД с момента создания пула",
+    labelnames=("stat",),
+)
+db_pool_events = registry.gauge(
+    "db_pool_events",
+    "Количество выдач соединений и таймаутов ожидания пула БД с момента создания пула",
+    labelnames=("event",),
+)
+
+cache_requests = registry.gauge(
+    "cache_requests",
+    "Обращения к кэшу чтения с момента запуска процесса",
+    labelnames=("namespace", "result"),
+)
+cache_hit_ratio = registry.gauge(
+    "cache_hit_ratio",
+    "Доля попаданий в кэш чтения",
+    labelnames=("namespace",),
+)
+sku_stock_counter_drift = registry.gauge(
+    "sku_stock_counter_drift",
+    "Количество счетчиков стоков SKU, исправленных последней сверкой",
+)
+
+
+@dataclass
+class RequestQueryStats:
+    """SQL-запросы, выполненные в рамках одного HTTP-запроса"""
+    queries: int = 0
+    duration: float = 0.0
+    rows: int = 0
+
+
+# Статистика текущего HTTP-запроса, вне HTTP-запроса (например в фоновых задачах) не задана
+request_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def get_route_name(scope: Scope) -> str:
+    """Шаблон маршрута, а не фактический путь, чтобы количество меток было ограниченным"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware, замеряющее время HTTP-запросов и SQL-запросов внутри них"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestQueryStats()
+        token = request_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_query_stats.reset(token)
+            route = get_route_name(scope)
+            http_request_duration.observe(elapsed, method=scope["method"], route=route, status=str(status_code))
+            db_request_queries.observe(stats.queries, route=route)
+            db_request_query_duration.observe(stats.duration, route=route)
+            db_request_rows.observe(stats.rows, route=route)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    db_query_duration.observe(elapsed, operation=operation)
+
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.duration += elapsed
+        stats.rows += max(cursor.rowcount, 0)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подписаться на события выполнения SQL-запросов движка"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def observe_pool(pool_stats: dict) -> None:
+    """Обновить метрики пула соединений из app.database.get_pool_stats"""
+    for state in ("size", "checked_in", "checked_out", "overflow"):
+        db_pool_connections.set(pool_stats[state], state=state)
+    if "checkouts" in pool_stats:
+        db_pool_wait.set(pool_stats["wait_seconds_total"], stat="total")
+        db_pool_wait.set(pool_stats["wait_seconds_max"], stat="max")
+        db_pool_events.set(pool_stats["checkouts"], event="checkout")
+        db_pool_events.set(pool_stats["timeouts"], event="timeout")
+
+
+def observe_cache(cache: Cache) -> None:
+    """Обновить метрики кэша чтения"""
+    for namespace, stats in cache.stats().items():
+        cache_requests.set(stats.hits, namespace=namespace, result="hit")
+        cache_requests.set(stats.misses, namespace=namespace, result="miss")
+        cache_hit_ratio.set(stats.hit_ratio, namespace=namespace)
+
+
+def _timed(func: Callable, service: str) -> Callable:
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            service_method_duration.observe(time.perf_counter() - started, service=service, method=func.__name__)
+
+    return wrapper
+
+
+def instrument_service(cls: type) -> type:
+    """Декоратор класса сервиса: замеряет время выполнения всех публичных асинхронных методов"""
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, _timed(attr, service=cls.__name__))
+    return cls
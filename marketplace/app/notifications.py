@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from dataclasses import dataclass, field
+from functools import partial
+from typing import TypeVar
+
+from providers.notification import NOTIFICATIONS_CHANNEL
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+StateT = TypeVar("StateT", bound=BaseModel)
+
+# Комментарий SSE, не дает прокси закрыть простаивающее соединение
+SSE_KEEPALIVE = ": keepalive\n\n"
+# Поток SSE не должен кэшироваться и буферизоваться прокси
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _resolve(future: asyncio.Future, *_) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+# Сравнение по идентичности: экземпляр используется как значение по умолчанию полей сервисов
+@dataclass(eq=False)
+class NotificationHub:
+    """Рассылка уведомлений Postgres (LISTEN/NOTIFY) подписчикам внутри процесса
+
+    Процесс держит одно соединение LISTEN на все подписки, уведомление будит подписчиков его ключа.
+    Уведомление означает только, что объект изменился: подписчик сам перечитывает состояние,
+    поэтому несколько уведомлений подряд схлопываются в одно перечитывание.
+    После переподключения будятся все подписчики, так как уведомления за время разрыва потеряны.
+    """
+    # Движок приложения создается при запуске, поэтому может передаваться в start
+    engine: AsyncEngine | None = None
+    channel: str = NOTIFICATIONS_CHANNEL
+    heartbeat_interval: float = 15.0
+    reconnect_interval: float = 1.0
+
+    _subscribers: defaultdict[str, set[asyncio.Event]] = field(default_factory=lambda: defaultdict(set), init=False)
+    _listener: asyncio.Task | None = field(default=None, init=False)
+
+    async def start(self, engine: AsyncEngine | None = None) -> None:
+        if engine is not None:
+            self.engine = engine
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+    @contextlib.contextmanager
+    def subscribe(self, key: str) -> Iterator[asyncio.Event]:
+        """Подписка на ключ на время блока, событие выставляется при каждом уведомлении"""
+        changed = asyncio.Event()
+        self._subscribers[key].add(changed)
+        try:
+            yield changed
+        finally:
+            self._subscribers[key].discard(changed)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+
+    async def watch(
+        self,
+        key: str,
+        event: str,
+        load: Callable[[], Awaitable[StateT]],
+        is_final: Callable[[StateT], bool],
+    ) -> AsyncIterator[str]:
+        """Поток SSE с состоянием объекта: начальное состояние, затем новое после каждого изменения
+
+        Начальное состояние читается после подписки, поэтому изменение до начала потока не теряется.
+        Дальше состояние перечитывается только по уведомлению и отправляется, если изменилось.
+        Поток завершается после отправки конечного состояния.
+        """
+        with self.subscribe(key) as changed:
+            state = await load()
+            sent: str | None = None
+            while True:
+                data = state.model_dump_json()
+                if data != sent:
+                    yield format_sse(event, data)
+                    sent = data
+                if is_final(state):
+                    return
+                while True:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=self.heartbeat_interval)
+                        break
+                    except TimeoutError:
+                        yield SSE_KEEPALIVE
+                # Сбрасываем до чтения: изменение во время чтения разбудит подписчика еще раз
+                changed.clear()
+                state = await load()
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        for changed in self._subscribers.get(payload, ()):
+            changed.set()
+
+    def _wake_all(self) -> None:
+        for subscribers in self._subscribers.values():
+            for changed in subscribers:
+                changed.set()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    try:
+                        raw_connection = await conn.get_raw_connection()
+                        # Соединение asyncpg, уведомления принимаются его обработчиком
+                        driver_connection = raw_connection.driver_connection
+                        terminated: asyncio.Future = asyncio.get_running_loop().create_future()
+                        # Будущее привязывается к обработчику явно: разрыв старого соединения
+                        # не должен завершать ожидание нового после переподключения
+                        driver_connection.add_termination_listener(partial(_resolve, terminated))
+                        await driver_connection.add_listener(self.channel, self._on_notification)
+                        self._wake_all()
+                        await terminated
+                        logger.warning("Соединение LISTEN %s разорвано, переподключение", self.channel)
+                    finally:
+                        # Соединение с LISTEN не возвращается в пул, иначе уведомления получали бы чужие сессии
+                        await conn.invalidate()
+            except Exception:
+                logger.exception("Не удалось подписаться на уведомления %s", self.channel)
+            await asyncio.sleep(self.reconnect_interval)
+
+
+# Подписки процесса приложения, соединение LISTEN открывается в lifespan приложения
+default_notification_hub = NotificationHub(heartbeat_interval=config.NOTIFICATIONS_HEARTBEAT_INTERVAL)
@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Protocol
+
+from models import OutboxMessage
+from providers.outbox import OutboxProvider
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_message_to_dict(message: OutboxMessage) -> dict:
+    """Сообщение в виде, который получают приемники, ID используется потребителями для отсева повторов"""
+    return {
+        "id": message.id,
+        "topic": message.topic,
+        "key": message.key,
+        "payload": message.payload,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+class OutboxSink(Protocol):
+    """Приемник сообщений outbox
+
+    Пачка считается опубликованной, если publish завершился без ошибки,
+    иначе она будет передана повторно целиком.
+    Сообщения об одном объекте (key) приходят в порядке изменений, порядок сообщений разных объектов
+    не гарантируется: ID может быть меньше, чем у уже переданных сообщений, поэтому повторы отсеиваются
+    по самим ID, а не по последнему полученному.
+    """
+    async def publish(self, messages: Sequence[dict]) -> None:
+        ...
+
+
+@dataclass
+class InMemorySink:
+    """Приемник, накапливающий сообщения в памяти, для тестов"""
+    messages: list[dict] = field(default_factory=list)
+
+    async def publish(self, messages: Sequence[dict]) -> None:
+        self.messages.extend(messages)
+
+
+@dataclass
+class NdjsonFileSink:
+    """Приемник, дописывающий сообщения в файл NDJSON, по строке на сообщение
+
+    Пачка сбрасывается на диск (fsync) до отметки о публикации, поэтому при сбое строки могут повториться,
+    но не потеряться.
+    """
+    path: Path
+
+    async def publish(self, messages: Sequence[dict]) -> None:
+        lines = "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in messages)
+        # Запись в файл блокирующая, поэтому выполняется в отдельном потоке
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines: str) -> None:
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+@dataclass
+class OutboxRelay:
+    """Ретранслятор сообщений outbox в приемник внутри процесса приложения
+
+    Зафиксированные сообщения публикуются пачками в порядке ID и отмечаются опубликованными в той же транзакции,
+    в которой были прочитаны, только после успешной публикации пачки (at-least-once).
+    Сообщение транзакции, зафиксированной после публикации пачки, попадает в следующую пачку, даже если его ID меньше.
+    Пачки публикует один процесс за раз (advisory-блокировка), остальные в это время пропускают опрос.
+    """
+    db_session_maker: Callable[[], AsyncSession]
+    sink: OutboxSink
+    batch_size: int = 500
+    poll_interval: float = 1.0
+    outbox_provider: Callable[[AsyncSession], OutboxProvider] = OutboxProvider
+
+    _poller: asyncio.Task | None = field(default=None, init=False)
+
+    async def start(self) -> None:
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poller
+            self._poller = None
+
+    async def run_once(self) -> int:
+        """Опубликовать пачку неопубликованных сообщений, возвращает их количество"""
+        async with self.db_session_maker() as session:
+            outbox_provider = self.outbox_provider(session)
+            if not await outbox_provider.try_lock_relay():
+                return 0
+            messages: Sequence[OutboxMessage] = await outbox_provider.find_unpublished(limit=self.batch_size)
+            if not messages:
+                return 0
+            await self.sink.publish([outbox_message_to_dict(message) for message in messages])
+            await outbox_provider.mark_published(message.id for message in messages)
+            await session.commit()
+        return len(messages)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                published = await self.run_once()
+            except Exception:
+                logger.exception("Не удалось опубликовать сообщения outbox")
+                published = 0
+            # Полная пачка - вероятно, есть еще сообщения, следующая публикуется сразу
+            if published < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
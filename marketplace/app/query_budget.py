@@ -0,0 +1,124 @@
+"""Бюджет SQL-запросов на HTTP-запрос
+
+Маршрут объявляет максимальное количество SQL-запросов декоратором query_budget.
+QueryBudgetMiddleware (включается настройкой QUERY_BUDGET_MODE) считает запросы и при превышении бюджета
+пишет в лог предупреждение (warn) или выбрасывает QueryBudgetExceeded (raise, режим тестов)
+с текстами выполненных запросов. Для вызовов сервисов в тестах - контекстный менеджер assert_max_queries.
+"""
+import logging
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Literal, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+QueryBudgetMode = Literal["off", "warn", "raise"]
+EndpointT = TypeVar("EndpointT", bound=Callable[..., Any])
+
+_QUERY_BUDGET_ATTR = "__query_budget__"
+
+
+@dataclass
+class QueryRecorder:
+    """SQL-запросы, выполненные внутри record_queries, включая вложенные записи"""
+    statements: list[str] = field(default_factory=list)
+    parent: "QueryRecorder | None" = None
+
+
+# Запись текущего контекста, вне record_queries не задана
+_query_recorder: ContextVar[QueryRecorder | None] = ContextVar("query_recorder", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, name: str, max_queries: int, statements: Sequence[str]):
+        self.name = name
+        self.max_queries = max_queries
+        self.statements = list(statements)
+        lines = [f"{name}: {len(statements)} SQL-запросов при бюджете {max_queries}"]
+        lines.extend(f"{number}. {statement}" for number, statement in enumerate(statements, start=1))
+        super().__init__("\n".join(lines))
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryRecorder]:
+    """Записать SQL-запросы, выполненные в текущем контексте (задаче asyncio)"""
+    recorder = QueryRecorder(parent=_query_recorder.get())
+    token = _query_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _query_recorder.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, name: str = "block") -> Iterator[QueryRecorder]:
+    """Выбросить QueryBudgetExceeded, если внутри блока выполнено больше max_queries SQL-запросов"""
+    with record_queries() as recorder:
+        yield recorder
+    if len(recorder.statements) > max_queries:
+        raise QueryBudgetExceeded(name=name, max_queries=max_queries, statements=recorder.statements)
+
+
+def query_budget(max_queries: int) -> Callable[[EndpointT], EndpointT]:
+    """Декоратор обработчика маршрута: максимальное количество SQL-запросов за HTTP-запрос
+
+    Применяется под декоратором маршрута, чтобы в роутере был зарегистрирован уже размеченный обработчик.
+    """
+    def decorator(endpoint: EndpointT) -> EndpointT:
+        setattr(endpoint, _QUERY_BUDGET_ATTR, max_queries)
+        return endpoint
+
+    return decorator
+
+
+def get_query_budget(endpoint: Callable[..., Any] | None) -> int | None:
+    return getattr(endpoint, _QUERY_BUDGET_ATTR, None)
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware, проверяющее бюджет SQL-запросов маршрута"""
+
+    def __init__(self, app: ASGIApp, mode: QueryBudgetMode = "warn"):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        with record_queries() as recorder:
+            await self.app(scope, receive, send)
+        # Обработчик маршрута роутер записывает в scope при сопоставлении пути
+        max_queries = get_query_budget(scope.get("endpoint"))
+        if max_queries is None or len(recorder.statements) <= max_queries:
+            return
+        error = QueryBudgetExceeded(
+            name=f"{scope['method']} {scope['path']}",
+            max_queries=max_queries,
+            statements=recorder.statements,
+        )
+        if self.mode == "raise":
+            raise error
+        logger.warning("Превышен бюджет SQL-запросов\n%s", error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _query_recorder.get()
+    while recorder is not None:
+        recorder.statements.append(statement)
+        recorder = recorder.parent
+
+
+def instrument_query_budget(engine: AsyncEngine) -> None:
+    """Подписаться на выполнение SQL-запросов движка для подсчета в record_queries"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
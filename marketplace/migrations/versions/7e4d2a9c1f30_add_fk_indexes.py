@@ -0,0 +1,54 @@
+"""add_fk_indexes
+
+Revision ID: 7e4d2a9c1f30
+Revises: 5cabcb61fd52
+Create Date: 2026-10-18 11:02:47.183962
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4d2a9c1f30'
+down_revision: str | None = '5cabcb61fd52'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+INDEXES: list[tuple[str, str, list[str], str | None]] = [
+    ('ix_skus_discount_id', 'skus', ['discount_id'], None),
+    ('ix_item_discounts_item_id', 'item_discounts', ['item_id'], None),
+    ('ix_item_discounts_discount_id', 'item_discounts', ['discount_id'], None),
+    ('ix_items_sku_id_id', 'items', ['sku_id', 'id'], None),
+    ('ix_items_posting_id', 'items', ['posting_id'], None),
+    ('ix_items_acceptance_id', 'items', ['acceptance_id'], None),
+    ('ix_stocks_item_id', 'stocks', ['item_id'], None),
+    ('ix_stocks_item_id_available', 'stocks', ['item_id'], "NOT is_reserved AND status <> 'NOT_FOUND'"),
+    ('ix_tasks_posting_id', 'tasks', ['posting_id'], None),
+    ('ix_tasks_posting_id_in_work', 'tasks', ['posting_id'], "status = 'IN_WORK'"),
+    ('ix_tasks_item_id', 'tasks', ['item_id'], None),
+    ('ix_tasks_acceptance_id', 'tasks', ['acceptance_id'], None),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,40 @@
+"""add_sku_stock_counters
+
+Revision ID: 9b3f6c2d8e41
+Revises: 7e4d2a9c1f30
+Create Date: 2026-10-18 12:21:05.540318
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f6c2d8e41'
+down_revision: str | None = '7e4d2a9c1f30'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table('sku_stock_counters',
+    sa.Column('sku_id', sa.UUID(), nullable=False),
+    sa.Column('stock_status', postgresql.ENUM('VALID', 'NOT_FOUND', 'DEFECT', name='stockstatus', create_type=False), nullable=False),
+    sa.Column('is_reserved', sa.Boolean(), nullable=False),
+    sa.Column('count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['sku_id'], ['skus.id'], ),
+    sa.PrimaryKeyConstraint('sku_id', 'stock_status', 'is_reserved')
+    )
+    # Начальные значения счетчиков по текущим стокам
+    op.execute(
+        "INSERT INTO sku_stock_counters (sku_id, stock_status, is_reserved, count) "
+        "SELECT items.sku_id, stocks.status, stocks.is_reserved, count(*) "
+        "FROM stocks JOIN items ON items.id = stocks.item_id "
+        "GROUP BY items.sku_id, stocks.status, stocks.is_reserved"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sku_stock_counters')
@@ -0,0 +1,33 @@
+"""store_idempotency_response_in_request
+
+Revision ID: a7d4e2b8c5f1
+Revises: f3c8d2a6b9e4
+Create Date: 2026-10-18 21:12:43.518206
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e2b8c5f1'
+down_revision: str | None = 'f3c8d2a6b9e4'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Ключи незавершенных запросов больше не хранятся: ключ записывается вместе с результатом запроса
+    op.execute("DELETE FROM idempotency_keys WHERE status = 'IN_PROGRESS'")
+    op.drop_column('idempotency_keys', 'locked_at')
+    op.drop_column('idempotency_keys', 'status')
+    op.execute("DROP TYPE idempotencykeystatus")
+
+
+def downgrade() -> None:
+    status = sa.Enum('IN_PROGRESS', 'COMPLETED', name='idempotencykeystatus')
+    status.create(op.get_bind())
+    op.add_column('idempotency_keys', sa.Column('status', status, server_default='COMPLETED', nullable=False))
+    op.alter_column('idempotency_keys', 'status', server_default=None)
+    op.add_column('idempotency_keys', sa.Column('locked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
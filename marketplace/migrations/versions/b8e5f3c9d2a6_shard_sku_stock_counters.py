@@ -0,0 +1,41 @@
+"""shard_sku_stock_counters
+
+Revision ID: b8e5f3c9d2a6
+Revises: a7d4e2b8c5f1
+Create Date: 2026-10-18 21:47:05.310842
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e5f3c9d2a6'
+down_revision: str | None = 'a7d4e2b8c5f1'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Существующие значения счетчиков становятся частью 0
+    op.add_column('sku_stock_counters', sa.Column('shard', sa.SmallInteger(), server_default=sa.text('0'), nullable=False))
+    op.drop_constraint('sku_stock_counters_pkey', 'sku_stock_counters', type_='primary')
+    op.create_primary_key('sku_stock_counters_pkey', 'sku_stock_counters', ['sku_id', 'stock_status', 'is_reserved', 'shard'])
+
+
+def downgrade() -> None:
+    # Части счетчиков складываются в часть 0
+    op.execute(
+        "WITH moved AS ("
+        "DELETE FROM sku_stock_counters WHERE shard <> 0 RETURNING sku_id, stock_status, is_reserved, count"
+        ") "
+        "INSERT INTO sku_stock_counters (sku_id, stock_status, is_reserved, shard, count) "
+        "SELECT sku_id, stock_status, is_reserved, 0, sum(count) FROM moved "
+        "GROUP BY sku_id, stock_status, is_reserved "
+        "ON CONFLICT (sku_id, stock_status, is_reserved, shard) "
+        "DO UPDATE SET count = sku_stock_counters.count + excluded.count"
+    )
+    op.drop_constraint('sku_stock_counters_pkey', 'sku_stock_counters', type_='primary')
+    op.create_primary_key('sku_stock_counters_pkey', 'sku_stock_counters', ['sku_id', 'stock_status', 'is_reserved'])
+    op.drop_column('sku_stock_counters', 'shard')
@@ -0,0 +1,36 @@
+"""add_idempotency_keys
+
+Revision ID: c4e8a1f7b2d9
+Revises: 9b3f6c2d8e41
+Create Date: 2026-10-18 13:40:12.905117
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f7b2d9'
+down_revision: str | None = '9b3f6c2d8e41'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+    sa.Column('endpoint', sa.String(length=256), nullable=False),
+    sa.Column('key', sa.String(length=256), nullable=False),
+    sa.Column('request_hash', sa.String(length=256), nullable=False),
+    sa.Column('status', sa.Enum('IN_PROGRESS', 'COMPLETED', name='idempotencykeystatus'), nullable=False),
+    sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('endpoint', 'key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('idempotency_keys')
+    op.execute("DROP TYPE idempotencykeystatus")
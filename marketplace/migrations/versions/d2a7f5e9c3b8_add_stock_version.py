@@ -0,0 +1,25 @@
+"""add_stock_version
+
+Revision ID: d2a7f5e9c3b8
+Revises: c4e8a1f7b2d9
+Create Date: 2026-10-18 14:28:51.116734
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7f5e9c3b8'
+down_revision: str | None = 'c4e8a1f7b2d9'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column('stocks', sa.Column('version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('stocks', 'version')
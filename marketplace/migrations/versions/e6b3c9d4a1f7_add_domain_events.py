@@ -0,0 +1,45 @@
+"""add_domain_events
+
+Revision ID: e6b3c9d4a1f7
+Revises: d2a7f5e9c3b8
+Create Date: 2026-10-18 17:42:09.381205
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b3c9d4a1f7'
+down_revision: str | None = 'd2a7f5e9c3b8'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table('domain_events',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('name', sa.Enum('TASK_STATUS_CHANGED', name='domaineventname'), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_domain_events_unprocessed', 'domain_events', ['id'], unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+    op.add_column('postings', sa.Column('open_picking_tasks', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    # Начальные значения счетчиков по текущим задачам на подбор
+    op.execute(
+        "UPDATE postings SET open_picking_tasks = open_tasks.tasks_count "
+        "FROM (SELECT posting_id, count(*) AS tasks_count FROM tasks "
+        "WHERE type = 'PICKING' AND status = 'IN_WORK' AND posting_id IS NOT NULL GROUP BY posting_id) AS open_tasks "
+        "WHERE postings.id = open_tasks.posting_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('postings', 'open_picking_tasks')
+    op.drop_index('ix_domain_events_unprocessed', table_name='domain_events', postgresql_where=sa.text('processed_at IS NULL'))
+    op.drop_table('domain_events')
+    op.execute("DROP TYPE domaineventname")
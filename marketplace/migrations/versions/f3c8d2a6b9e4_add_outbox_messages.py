@@ -0,0 +1,37 @@
+"""add_outbox_messages
+
+Revision ID: f3c8d2a6b9e4
+Revises: e6b3c9d4a1f7
+Create Date: 2026-10-18 19:05:27.614032
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8d2a6b9e4'
+down_revision: str | None = 'e6b3c9d4a1f7'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_messages',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('topic', sa.Enum('SKU_PRICE_CHANGED', 'ITEM_RESERVATION_CHANGED', 'POSTING_STATUS_CHANGED', 'DISCOUNT_STATUS_CHANGED', 'ACCEPTANCE_CREATED', name='outboxtopic'), nullable=False),
+    sa.Column('key', sa.String(length=256), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_messages_unpublished', 'outbox_messages', ['id'], unique=False, postgresql_where=sa.text('published_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_unpublished', table_name='outbox_messages', postgresql_where=sa.text('published_at IS NULL'))
+    op.drop_table('outbox_messages')
+    op.execute("DROP TYPE outboxtopic")
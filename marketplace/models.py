@@ -5,9 +5,24 @@ from decimal import Decimal
 from typing import Annotated
 
 from app import database
+from app.database import str_256
 from schemas.discount import DiscountSchema, DiscountSchemaStatus
 from service_models import DiscountDTO
-from sqlalchemy import DECIMAL, UUID, CheckConstraint, DateTime, ForeignKey, sql, text
+from sqlalchemy import (
+    DECIMAL,
+    UUID,
+    BigInteger,
+    CheckConstraint,
+    DateTime,
+    ForeignKey,
+    Identity,
+    Index,
+    SmallInteger,
+    Text,
+    sql,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
@@ -88,7 +103,7 @@ class Sku(database.Base):
     count: Mapped[int] = mapped_column(default=0)
     is_hidden: Mapped[bool] = mapped_column(server_default=sql.false())
 
-    discount_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("discounts.id"))
+    discount_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("discounts.id"), index=True)
     # TODO: Оказывается тут должны быть discounts - т.е. Many To Many связь,
     #  это потребует достаточно больших изменений, которые не разумно делать без тестов
     #  и с уже ограниченным временем
@@ -113,16 +128,20 @@ class ItemDiscount(database.Base):
     # TODO: Добавить ограничение - не более 100% или 99% и не меньше 0 или 1
     percentage: Mapped[int] = mapped_column(server_default=text("0"))
 
-    item_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("items.id"))
+    item_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("items.id"), index=True)
     item: Mapped["Item"] = relationship("Item", back_populates="item_discounts")
 
-    discount_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("discounts.id"))
+    discount_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("discounts.id"), index=True)
     discount: Mapped["Discount"] = relationship("Discount", back_populates="item_discounts")
 
 
 class Item(database.Base):
     """Товар"""
     __tablename__ = "items"
+    __table_args__ = (
+        # Товары SKU, в том числе постранично по ID
+        Index("ix_items_sku_id_id", "sku_id", "id"),
+    )
 
     id: Mapped[uuid_pk]
     sku_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("skus.id"))
@@ -131,12 +150,12 @@ class Item(database.Base):
     # TODO: А возможно тут и нужен Optional, чтобы была хотя какая-то полезная работа от process_acceptance?
     stock: Mapped["Stock"] = relationship("Stock", back_populates='item', uselist=False)
 
-    posting_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("postings.id"))
+    posting_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("postings.id"), index=True)
     posting: Mapped["Posting"] = relationship("Posting", back_populates="items")
 
     tasks: Mapped[list["Task"]] = relationship("Task", back_populates="item")
 
-    acceptance_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("acceptances.id"))
+    acceptance_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("acceptances.id"), index=True)
     acceptance: Mapped["Acceptance"] = relationship("Acceptance", back_populates="items")
 
     item_discounts: Mapped[list["ItemDiscount"]] = relationship("ItemDiscount", back_populates="item")
@@ -154,14 +173,46 @@ class StockStatus(enum.StrEnum):
 class Stock(database.Base):
     """Описание состояния товара"""
     __tablename__ = "stocks"
+    __table_args__ = (
+        # Свободные для резервирования товары
+        Index(
+            "ix_stocks_item_id_available",
+            "item_id",
+            postgresql_where=text("NOT is_reserved AND status <> 'NOT_FOUND'"),
+        ),
+    )
 
     id: Mapped[uuid_pk]
     status: Mapped[StockStatus]
     is_reserved: Mapped[bool] = mapped_column(server_default=sql.false())
+    # Версия строки: сервисы меняют стоки условными UPDATE (StockProvider), которые увеличивают версию явно.
+    # Изменение через ORM выполнилось бы только если строку никто не изменил после чтения (иначе StaleDataError)
+    version: Mapped[int] = mapped_column(server_default=text("0"))
 
-    item_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("items.id"))
+    item_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("items.id"), index=True)
     item: Mapped["Item"] = relationship(back_populates="stock")
 
+    __mapper_args__ = {
+        "version_id_col": version,
+    }
+
+
+class SkuStockCounter(database.Base):
+    """Количество товаров SKU по статусу стока и признаку резерва
+
+    Поддерживается инкрементально в тех же транзакциях, что изменяют стоки,
+    расхождения со стоками исправляет фоновая сверка.
+    Значение счетчика - сумма по частям (shard): параллельные транзакции изменяют разные строки
+    и не ждут друг друга на блокировке одного счетчика.
+    """
+    __tablename__ = "sku_stock_counters"
+
+    sku_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("skus.id"), primary_key=True)
+    stock_status: Mapped[StockStatus] = mapped_column(primary_key=True)
+    is_reserved: Mapped[bool] = mapped_column(primary_key=True)
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True, server_default=text("0"))
+    count: Mapped[int] = mapped_column(server_default=text("0"))
+
 
 # TODO: Возможно стоит сделать статус NEW и сделать его по умолчанию
 class TaskStatus(enum.StrEnum):
@@ -180,6 +231,14 @@ class TaskType(enum.StrEnum):
 class Task(database.Base):
     """Определенная задача, в рамках которой надо совершить какое-то действие на складе/в логистике"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Задачи заказа, которые еще в работе
+        Index(
+            "ix_tasks_posting_id_in_work",
+            "posting_id",
+            postgresql_where=text("status = 'IN_WORK'"),
+        ),
+    )
     # TODO: Добавить констрейнт
     #  TaskType==PLACING and posting_id is not NULL
     #  or
@@ -193,13 +252,13 @@ class Task(database.Base):
     created_at: Mapped[created_at]
     type: Mapped[TaskType]
 
-    posting_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("postings.id"))
+    posting_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("postings.id"), index=True)
     posting: Mapped["Posting"] = relationship(back_populates="tasks")
 
-    item_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("items.id", use_alter=True))
+    item_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("items.id", use_alter=True), index=True)
     item: Mapped["Item"] = relationship(back_populates="tasks", uselist=False)
 
-    acceptance_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("acceptances.id"))
+    acceptance_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("acceptances.id"), index=True)
     acceptance: Mapped["Acceptance"] = relationship("Acceptance", back_populates="tasks")
 
 
@@ -222,6 +281,9 @@ class Posting(database.Base):
     created_at: Mapped[created_at]
     # TODO: Возможно стоит сделать значение по умолчанию?
     cost: Mapped[price]
+    # Количество задач на подбор в работе, поддерживается обработчиком доменных событий задач.
+    # Когда счетчик доходит до нуля, заказ собран
+    open_picking_tasks: Mapped[int] = mapped_column(server_default=text("0"))
 
     # TODO: Подумать делать ли отдельные relationship's с условиями?
     # valid_items
@@ -245,3 +307,121 @@ class Acceptance(database.Base):
     created_at: Mapped[created_at]
     items: Mapped[list["Item"]] = relationship(back_populates="acceptance")
     tasks: Mapped[list["Task"]] = relationship(back_populates="acceptance")
+
+
+class JobName(enum.StrEnum):
+    PROCESS_PICKING_POSTING = "process_picking_posting"
+    PROCESS_ACCEPTANCE = "process_acceptance"
+    UPDATE_SKUS_ACTUAL_PRICES = "update_skus_actual_prices"
+    RECONCILE_SKU_STOCK_COUNTERS = "reconcile_sku_stock_counters"
+    PROCESS_DOMAIN_EVENTS = "process_domain_events"
+
+
+class JobStatus(enum.StrEnum):
+    # Ожидает выполнения (в том числе повторного после ошибки)
+    PENDING = "pending"
+    # Взята в работу одним из обработчиков
+    RUNNING = "running"
+    DONE = "done"
+    # Исчерпаны все попытки выполнения
+    FAILED = "failed"
+
+
+class Job(database.Base):
+    """Фоновая задача, выполняемая после фиксации основной транзакции"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Одинаковые ожидающие задачи схлопываются в одну
+        Index(
+            "ix_jobs_pending_idempotency_key",
+            "idempotency_key",
+            unique=True,
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id: Mapped[uuid_pk]
+    name: Mapped[str_256]
+    payload: Mapped[dict] = mapped_column(JSONB, server_default=text("'{}'::jsonb"))
+    status: Mapped[JobStatus]
+    idempotency_key: Mapped[str_256 | None]
+    attempts: Mapped[int] = mapped_column(server_default=text("0"))
+    max_attempts: Mapped[int]
+    last_error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[created_at]
+    # Время, раньше которого задачу не нужно брать в работу (используется для отложенных повторов)
+    run_after: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+    # Время взятия в работу, по нему находятся задачи упавших обработчиков
+    locked_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class DomainEventName(enum.StrEnum):
+    # Изменение статуса задачи, в том числе создание задачи (статуса до изменения нет)
+    TASK_STATUS_CHANGED = "task_status_changed"
+
+
+class DomainEvent(database.Base):
+    """Доменное событие, записанное в той же транзакции, что и изменение (outbox)
+
+    События обрабатываются по порядку ID одним обработчиком за раз,
+    отметка об обработке фиксируется вместе с изменениями обработчика.
+    """
+    __tablename__ = "domain_events"
+    __table_args__ = (
+        # Очередь необработанных событий
+        Index("ix_domain_events_unprocessed", "id", postgresql_where=text("processed_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    name: Mapped[DomainEventName]
+    payload: Mapped[dict] = mapped_column(JSONB, server_default=text("'{}'::jsonb"))
+    created_at: Mapped[created_at]
+    processed_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class OutboxTopic(enum.StrEnum):
+    # Изменение базовой или актуальной цены SKU
+    SKU_PRICE_CHANGED = "sku_price_changed"
+    # Резервирование товара заказом или снятие резерва
+    ITEM_RESERVATION_CHANGED = "item_reservation_changed"
+    POSTING_STATUS_CHANGED = "posting_status_changed"
+    DISCOUNT_STATUS_CHANGED = "discount_status_changed"
+    ACCEPTANCE_CREATED = "acceptance_created"
+
+
+class OutboxMessage(database.Base):
+    """Сообщение для внешних систем, записанное в той же транзакции, что и изменение
+
+    Сообщения публикуются ретранслятором (app.outbox) пачками, доставка - at-least-once.
+    ID выдается при записи, поэтому порядок ID гарантирован только для сообщений об одном объекте.
+    """
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # Очередь неопубликованных сообщений
+        Index("ix_outbox_messages_unpublished", "id", postgresql_where=text("published_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    topic: Mapped[OutboxTopic]
+    # ID измененного объекта, сообщения с одним ключом публикуются в порядке изменений
+    key: Mapped[str_256]
+    payload: Mapped[dict] = mapped_column(JSONB, server_default=text("'{}'::jsonb"))
+    created_at: Mapped[created_at]
+    published_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class IdempotencyKey(database.Base):
+    """Ключ идемпотентности запроса на запись и сохраненный ответ на него
+
+    Записывается в транзакции самого запроса, поэтому есть только у зафиксированных запросов.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Ключи уникальны в пределах метода API
+    endpoint: Mapped[str_256] = mapped_column(primary_key=True)
+    key: Mapped[str_256] = mapped_column(primary_key=True)
+    # Хэш тела запроса: повтор с тем же ключом, но другим телом - ошибка клиента
+    request_hash: Mapped[str_256]
+    response: Mapped[dict | list | None] = mapped_column(JSONB)
+    created_at: Mapped[created_at]
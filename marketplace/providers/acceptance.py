@@ -1,6 +1,59 @@
-from models import Acceptance
+import uuid
+from collections.abc import Sequence
+
+from models import Acceptance, Item, Stock, Task, TaskStatus, TaskType
+from sqlalchemy import Row, func, select
 from utils.provider import SQLAlchemyProvider
 
 
 class AcceptanceProvider(SQLAlchemyProvider):
     model = Acceptance
+
+    async def find_info(self, id: uuid.UUID) -> Row:
+        """Заголовок приемки без построения ORM-объекта: (id, created_at)"""
+        stmt = select(self.model.id, self.model.created_at).filter(self.model.id == id)
+        res = await self.session.execute(stmt)
+        return res.one()
+
+    async def count_completed_by_sku_stock_status(self, id: uuid.UUID, type: TaskType) -> Sequence[Row]:
+        """Количество принятых товаров по SKU и статусу стока: (sku_id, stock_status, completed_count)
+
+        Группировка выполняется в БД, количество строк ответа равно количеству пар (SKU, статус стока),
+        а не количеству товаров. Пары без завершенных задач в результат не попадают.
+        """
+        completed = func.count().filter(Task.status == TaskStatus.COMPLETED)
+        stmt = (
+            select(Item.sku_id, Stock.status.label("stock_status"), completed.label("completed_count"))
+            .select_from(Task)
+            .join(Item, Item.id == Task.item_id)
+            .join(Stock, Stock.item_id == Item.id)
+            .filter(Task.acceptance_id == id, Task.type == type)
+            .group_by(Item.sku_id, Stock.status)
+            .having(completed > 0)
+            .order_by(Item.sku_id, Stock.status)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def find_task_rows(
+        self,
+        id: uuid.UUID,
+        type: TaskType,
+        after_id: uuid.UUID | None = None,
+        limit: int | None = None,
+    ) -> Sequence[Row]:
+        """Задачи приемки: (id, status)
+
+        Постраничная выборка по ключу: задачи с ID больше after_id, не более limit штук
+        """
+        stmt = (
+            select(Task.id, Task.status)
+            .filter(Task.acceptance_id == id, Task.type == type)
+            .order_by(Task.id)
+        )
+        if after_id is not None:
+            stmt = stmt.filter(Task.id > after_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        res = await self.session.execute(stmt)
+        return res.all()
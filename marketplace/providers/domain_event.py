@@ -0,0 +1,82 @@
+import uuid
+from collections.abc import Iterable, Sequence
+from typing import NamedTuple, Self
+
+from models import DomainEvent, DomainEventName, TaskStatus, TaskType
+from sqlalchemy import func, insert, select, text, update
+from utils.provider import SQLAlchemyProvider
+
+# Ключ advisory-блокировки обработчика событий: события применяются строго по порядку одним обработчиком
+CONSUMER_LOCK_KEY = 0x6576_656E_7473
+
+
+class TaskStatusChange(NamedTuple):
+    """Данные события TASK_STATUS_CHANGED"""
+    task_id: uuid.UUID
+    type: TaskType
+    posting_id: uuid.UUID | None
+    item_id: uuid.UUID | None
+    # Статус до изменения, для созданной задачи не задан
+    before: TaskStatus | None
+    after: TaskStatus
+
+    def to_payload(self) -> dict:
+        return {
+            "task_id": str(self.task_id),
+            "type": self.type,
+            "posting_id": str(self.posting_id) if self.posting_id else None,
+            "item_id": str(self.item_id) if self.item_id else None,
+            "before": self.before,
+            "after": self.after,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> Self:
+        return cls(
+            task_id=uuid.UUID(payload["task_id"]),
+            type=TaskType(payload["type"]),
+            posting_id=uuid.UUID(payload["posting_id"]) if payload["posting_id"] else None,
+            item_id=uuid.UUID(payload["item_id"]) if payload["item_id"] else None,
+            before=TaskStatus(payload["before"]) if payload["before"] else None,
+            after=TaskStatus(payload["after"]),
+        )
+
+
+class DomainEventProvider(SQLAlchemyProvider):
+    model = DomainEvent
+
+    async def add_task_status_changes(self, changes: Iterable[TaskStatusChange]) -> None:
+        """Запись событий изменения статусов задач одним запросом, ID событий идут в порядке изменений"""
+        values = [
+            {"name": DomainEventName.TASK_STATUS_CHANGED, "payload": change.to_payload()}
+            for change in changes
+        ]
+        if not values:
+            return
+        await self.session.execute(insert(self.model).values(values))
+
+    async def lock_consumer(self) -> None:
+        """Блокировка обработчика событий до конца транзакции"""
+        await self.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CONSUMER_LOCK_KEY})
+
+    async def find_unprocessed(self, limit: int) -> Sequence[DomainEvent]:
+        """Необработанные события в порядке записи"""
+        stmt = (
+            select(self.model)
+            .filter(self.model.processed_at.is_(None))
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().all()
+
+    async def mark_processed(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        stmt = (
+            update(self.model)
+            .filter(self.id_in(ids))
+            .values(processed_at=func.now())
+        )
+        await self.session.execute(stmt)
@@ -0,0 +1,55 @@
+import datetime
+from typing import Any
+
+from models import IdempotencyKey
+from sqlalchemy import Row, func, null, select
+from sqlalchemy.dialects.postgresql import insert
+from utils.provider import SQLAlchemyProvider
+
+
+class IdempotencyKeyProvider(SQLAlchemyProvider):
+    model = IdempotencyKey
+
+    async def find_state(self, endpoint: str, key: str, ttl: datetime.timedelta) -> Row | None:
+        """Сохраненный ответ на запрос с ключом, если срок хранения не истек: (request_hash, response)"""
+        stmt = (
+            select(self.model.request_hash, self.model.response)
+            .filter(
+                self.model.endpoint == endpoint,
+                self.model.key == key,
+                self.model.created_at >= func.now() - ttl,
+            )
+        )
+        res = await self.session.execute(stmt)
+        return res.one_or_none()
+
+    async def save(
+        self,
+        endpoint: str,
+        key: str,
+        request_hash: str,
+        response: Any,
+        ttl: datetime.timedelta,
+    ) -> bool:
+        """Сохранение ответа на запрос одним запросом (INSERT ... ON CONFLICT DO UPDATE)
+
+        Ключ с истекшим сроком хранения перезаписывается. Если тот же ключ записывает параллельная
+        транзакция, запрос ждет ее завершения. Возвращает False, если ключ уже занят.
+        """
+        stmt = insert(self.model).values(
+            endpoint=endpoint,
+            key=key,
+            request_hash=request_hash,
+            response=response if response is not None else null(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.endpoint, self.model.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "response": stmt.excluded.response,
+                "created_at": func.now(),
+            },
+            where=self.model.created_at < func.now() - ttl,
+        ).returning(self.model.key)
+        res = await self.session.execute(stmt)
+        return res.scalar_one_or_none() is not None
@@ -1,6 +1,91 @@
-from models import Item
-from utils.provider import SQLAlchemyProvider
+import uuid
+from collections.abc import AsyncIterator, Mapping, Sequence
+
+from models import Item, Posting, PostingStatus, Stock, Task
+from sqlalchemy import Row, Select, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from utils.provider import SQLAlchemyProvider, array_literal
 
 
 class ItemProvider(SQLAlchemyProvider):
     model = Item
+    load_profiles = {
+        # Состояние товара: только сток
+        "stock": (
+            joinedload(Item.stock),
+        ),
+        # Уценка товара: задачи товара вместе с заказами
+        "markdown": (
+            selectinload(Item.tasks).joinedload(Task.posting),
+        ),
+        # Потеря товара: задачи товара вместе с заказами, сток меняется условным запросом
+        "not_found": (
+            selectinload(Item.tasks).joinedload(Task.posting),
+        ),
+    }
+
+    async def find_info(self, id: uuid.UUID) -> Row:
+        """Инфо о товаре без построения ORM-объектов: (id, sku_id, status, is_reserved)"""
+        stmt = (
+            select(Item.id, Item.sku_id, Stock.status, Stock.is_reserved)
+            .join(Stock, Stock.item_id == Item.id)
+            .filter(Item.id == id)
+        )
+        res = await self.session.execute(stmt)
+        return res.one()
+
+    async def attach_to_postings(self, posting_id_by_item_id: Mapping[uuid.UUID, uuid.UUID]) -> None:
+        """Привязка подобранных товаров к заказам одним запросом
+
+        Товары привязываются только к собираемым заказам: резерв с товаров отмененного заказа снимает отмена.
+        """
+        if not posting_id_by_item_id:
+            return
+        picked = func.unnest(
+            array_literal(posting_id_by_item_id, Item.id.type),
+            array_literal(posting_id_by_item_id.values(), Item.posting_id.type),
+        ).table_valued("item_id", "posting_id").render_derived()
+        stmt = (
+            update(Item)
+            .filter(
+                Item.id == picked.c.item_id,
+                Posting.id == picked.c.posting_id,
+                Posting.status == PostingStatus.IN_ITEM_PICK,
+            )
+            .values(posting_id=picked.c.posting_id)
+        )
+        await self.session.execute(stmt)
+
+    def _stock_states_by_sku_id_query(self, sku_id: uuid.UUID) -> Select:
+        # Только нужные колонки без построения ORM-объектов, порядок по ID для постраничной выборки
+        return (
+            select(Item.id, Stock.status, Stock.is_reserved)
+            .join(Stock, Stock.item_id == Item.id)
+            .filter(Item.sku_id == sku_id)
+            .order_by(Item.id)
+        )
+
+    async def find_stock_states_by_sku_id(
+        self,
+        sku_id: uuid.UUID,
+        after_id: uuid.UUID | None = None,
+        limit: int | None = None,
+    ) -> Sequence[Row]:
+        """Состояния стоков товаров SKU: (ID товара, статус стока, признак резерва)
+
+        Постраничная выборка по ключу: товары с ID больше after_id, не более limit штук
+        """
+        stmt = self._stock_states_by_sku_id_query(sku_id)
+        if after_id is not None:
+            stmt = stmt.filter(Item.id > after_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def stream_stock_states_by_sku_id(self, sku_id: uuid.UUID, batch_size: int = 1000) -> AsyncIterator[Row]:
+        """Состояния стоков всех товаров SKU через серверный курсор, в памяти не больше batch_size строк"""
+        stmt = self._stock_states_by_sku_id_query(sku_id).execution_options(yield_per=batch_size)
+        res = await self.session.stream(stmt)
+        async for row in res:
+            yield row
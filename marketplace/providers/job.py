@@ -0,0 +1,104 @@
+import datetime
+import uuid
+from collections.abc import Mapping, Sequence
+
+from models import Job, JobName, JobStatus
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from utils.provider import SQLAlchemyProvider
+
+
+class JobProvider(SQLAlchemyProvider):
+    model = Job
+
+    async def enqueue(
+        self,
+        name: JobName,
+        payload: dict,
+        max_attempts: int,
+        idempotency_key: str | None = None,
+    ) -> None:
+        """Постановка фоновой задачи в очередь
+
+        Выполняется в транзакции вызывающего кода, поэтому задача станет видна обработчикам
+        только вместе с основными изменениями. Если задача с тем же ключом идемпотентности
+        уже ожидает выполнения, новая не создается.
+        """
+        stmt = insert(self.model).values(
+            id=uuid.uuid4(),
+            name=name,
+            payload=payload,
+            status=JobStatus.PENDING,
+            idempotency_key=idempotency_key,
+            max_attempts=max_attempts,
+        ).on_conflict_do_nothing(
+            index_elements=[self.model.idempotency_key],
+            index_where=text("status = 'PENDING'"),
+        )
+        await self.session.execute(stmt)
+
+    async def enqueue_many(self, name: JobName, payloads: Mapping[str, dict], max_attempts: int) -> None:
+        """Постановка в очередь нескольких задач одного типа одним запросом
+
+        payloads - данные задач по ключу идемпотентности, как и в enqueue, задачи с ключами,
+        уже ожидающими выполнения, не создаются.
+        """
+        if not payloads:
+            return
+        stmt = insert(self.model).values([
+            {
+                "id": uuid.uuid4(),
+                "name": name,
+                "payload": payload,
+                "status": JobStatus.PENDING,
+                "idempotency_key": idempotency_key,
+                "max_attempts": max_attempts,
+            }
+            for idempotency_key, payload in payloads.items()
+        ]).on_conflict_do_nothing(
+            index_elements=[self.model.idempotency_key],
+            index_where=text("status = 'PENDING'"),
+        )
+        await self.session.execute(stmt)
+
+    async def claim(self, limit: int, lease_timeout: datetime.timedelta) -> Sequence[Job]:
+        """Взятие в работу готовых к выполнению задач
+
+        Строки, уже заблокированные другими обработчиками, пропускаются (FOR UPDATE SKIP LOCKED).
+        Также повторно забираются задачи, обработчик которых не отчитался за время аренды.
+        """
+        candidates = (
+            select(self.model.id)
+            .filter(
+                or_(
+                    (self.model.status == JobStatus.PENDING) & (self.model.run_after <= func.now()),
+                    (self.model.status == JobStatus.RUNNING) & (self.model.locked_at < func.now() - lease_timeout),
+                )
+            )
+            .order_by(self.model.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(self.model)
+            .filter(self.model.id.in_(candidates.scalar_subquery()))
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=self.model.attempts + 1,
+                locked_at=func.now(),
+            )
+            .returning(self.model)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().all()
+
+    async def mark_done(self, id: uuid.UUID) -> None:
+        await self.edit_one(id=id, data={"status": JobStatus.DONE, "last_error": None})
+
+    async def mark_failed(self, job: Job, error: str, retry_delay: datetime.timedelta) -> None:
+        """Отложенный повтор задачи, либо окончательная ошибка, если попытки исчерпаны"""
+        if job.attempts >= job.max_attempts:
+            data = {"status": JobStatus.FAILED, "last_error": error}
+        else:
+            data = {"status": JobStatus.PENDING, "last_error": error, "run_after": func.now() + retry_delay}
+        await self.edit_one(id=job.id, data=data)
@@ -0,0 +1,34 @@
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import text
+from utils.provider import SQLAlchemyProvider
+
+# Канал Postgres, в который пишутся уведомления об изменениях заказов и приемок
+NOTIFICATIONS_CHANNEL = "status_changes"
+
+
+def posting_notification_key(posting_id: uuid.UUID) -> str:
+    return f"posting:{posting_id}"
+
+
+def acceptance_notification_key(acceptance_id: uuid.UUID) -> str:
+    return f"acceptance:{acceptance_id}"
+
+
+class NotificationProvider(SQLAlchemyProvider):
+    """Уведомления подписчикам на изменения через Postgres NOTIFY, своей таблицы нет"""
+
+    async def notify(self, keys: Iterable[str]) -> None:
+        """Уведомления по ключам одним запросом
+
+        Postgres доставляет уведомления только при фиксации транзакции, одинаковые уведомления
+        одной транзакции схлопываются в одно.
+        """
+        keys = sorted(set(keys))
+        if not keys:
+            return
+        await self.session.execute(
+            text("SELECT pg_notify(:channel, key) FROM unnest(CAST(:keys AS text[])) AS key"),
+            {"channel": NOTIFICATIONS_CHANNEL, "keys": keys},
+        )
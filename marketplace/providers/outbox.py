@@ -0,0 +1,63 @@
+from collections.abc import Iterable, Sequence
+from typing import NamedTuple
+
+from models import OutboxMessage, OutboxTopic
+from sqlalchemy import func, insert, select, text, update
+from utils.provider import SQLAlchemyProvider
+
+# Ключ advisory-блокировки ретранслятора: сообщения публикует один процесс за раз, чтобы пачки не дублировались
+RELAY_LOCK_KEY = 0x6F75_7462_6F78
+
+
+class OutboxRecord(NamedTuple):
+    """Данные сообщения outbox"""
+    topic: OutboxTopic
+    key: str
+    payload: dict
+
+
+class OutboxProvider(SQLAlchemyProvider):
+    model = OutboxMessage
+
+    async def add_many(self, records: Iterable[OutboxRecord]) -> None:
+        """Запись сообщений одним запросом, ID сообщений идут в порядке записей
+
+        Вызывается после изменения, о котором сообщается, уже выполненного в БД: изменение блокирует строку
+        объекта до фиксации, поэтому следующее сообщение об объекте записывается после фиксации предыдущего
+        и получает больший ID. ID выдается при записи, а не при фиксации, поэтому для разных объектов
+        порядок ID не совпадает с порядком фиксации.
+        """
+        values = [record._asdict() for record in records]
+        if not values:
+            return
+        await self.session.execute(insert(self.model).values(values))
+
+    async def try_lock_relay(self) -> bool:
+        """Блокировка ретранслятора до конца транзакции, False - сообщения уже публикует другой процесс"""
+        res = await self.session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RELAY_LOCK_KEY})
+        return res.scalar_one()
+
+    async def find_unpublished(self, limit: int) -> Sequence[OutboxMessage]:
+        """Неопубликованные зафиксированные сообщения в порядке ID
+
+        Сообщение транзакции, зафиксированной позже, может иметь меньший ID, чем уже опубликованные.
+        """
+        stmt = (
+            select(self.model)
+            .filter(self.model.published_at.is_(None))
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().all()
+
+    async def mark_published(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        stmt = (
+            update(self.model)
+            .filter(self.id_in(ids))
+            .values(published_at=func.now())
+        )
+        await self.session.execute(stmt)
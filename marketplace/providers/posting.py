@@ -1,6 +1,133 @@
-from models import Posting
-from utils.provider import SQLAlchemyProvider
+import uuid
+from collections.abc import Iterable, Mapping, Sequence
+from decimal import Decimal
+
+from models import Item, ItemDiscount, Posting, PostingStatus, Sku, Task
+from sqlalchemy import Row, case, func, literal, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from utils.provider import SQLAlchemyProvider, array_literal
 
 
 class PostingProvider(SQLAlchemyProvider):
     model = Posting
+    load_profiles = {
+        # Информация по заказу: товары со стоками и задачи
+        "info": (
+            selectinload(Posting.items).joinedload(Item.stock),
+            selectinload(Posting.tasks),
+        ),
+        # Сбор заказа: задачи с товарами (сток и SKU)
+        "picking": (
+            selectinload(Posting.tasks).joinedload(Task.item).options(
+                joinedload(Item.stock),
+                joinedload(Item.sku),
+            ),
+        ),
+        # Отмена заказа: задачи, по задачам на подбор снимается резерв с товаров
+        "cancel": (
+            selectinload(Posting.tasks),
+        ),
+    }
+
+    async def calculate_costs(self, ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, Decimal]:
+        """Стоимость заказов одним агрегирующим запросом
+
+        Стоимость товара - базовая цена SKU за вычетом максимальной скидки товара, стоимость заказа - сумма по товарам.
+        Заказов без товаров в результате нет.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        max_discount_percentage = (
+            select(func.max(ItemDiscount.percentage))
+            .filter(ItemDiscount.item_id == Item.id)
+            .scalar_subquery()
+        )
+        # Умножение на 0.01 вместо деления на 100: деление numeric в Postgres дает не меньше 16 знаков после запятой,
+        # а умножение сохраняет точность цены плюс два знака, как и расчет в Decimal
+        cost = func.sum(Sku.base_price * (100 - func.coalesce(max_discount_percentage, 0))) * literal(Decimal("0.01"))
+        stmt = (
+            select(Item.posting_id, cost)
+            .join(Sku, Sku.id == Item.sku_id)
+            .filter(Item.posting_id.in_(ids))
+            .group_by(Item.posting_id)
+        )
+        res = await self.session.execute(stmt)
+        return dict(res.tuples().all())
+
+    async def apply_open_picking_tasks_deltas(self, deltas: Mapping[uuid.UUID, int]) -> list[uuid.UUID]:
+        """Изменение счетчиков задач на подбор в работе одним запросом
+
+        Возвращает ID собираемых заказов, у которых не осталось задач в работе.
+        """
+        deltas = {posting_id: delta for posting_id, delta in sorted(deltas.items()) if delta}
+        if not deltas:
+            return []
+        changes = func.unnest(
+            array_literal(deltas, Posting.id.type),
+            array_literal(deltas.values(), Posting.open_picking_tasks.type),
+        ).table_valued("posting_id", "delta").render_derived()
+        stmt = (
+            update(Posting)
+            .filter(Posting.id == changes.c.posting_id)
+            .values(open_picking_tasks=Posting.open_picking_tasks + changes.c.delta)
+            .returning(Posting.id, Posting.status, Posting.open_picking_tasks)
+        )
+        res = await self.session.execute(stmt)
+        return [
+            row.id
+            for row in res.all()
+            if row.status is PostingStatus.IN_ITEM_PICK and row.open_picking_tasks == 0
+        ]
+
+    async def finish_assembly(self, ids: Iterable[uuid.UUID], costs: Mapping[uuid.UUID, Decimal]) -> Sequence[Row]:
+        """Завершение сборки заказов одним запросом
+
+        Заказ с товарами отправляется со стоимостью из costs, заказ без товаров отменяется.
+        Статус меняется только у собираемых заказов без задач в работе, поэтому сборка завершается один раз.
+        Возвращает строки (id, status, cost) завершенных заказов.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        assembled = func.unnest(
+            array_literal(ids, Posting.id.type),
+            array_literal((costs.get(posting_id) for posting_id in ids), Posting.cost.type),
+        ).table_valued("posting_id", "cost").render_derived()
+        stmt = (
+            update(Posting)
+            .filter(
+                Posting.id == assembled.c.posting_id,
+                Posting.status == PostingStatus.IN_ITEM_PICK,
+                Posting.open_picking_tasks == 0,
+            )
+            .values(
+                # Если не удалось подобрать никаких товаров, заказ отменяется
+                status=case(
+                    (assembled.c.cost.is_(None), literal(PostingStatus.CANCELED, Posting.status.type)),
+                    else_=literal(PostingStatus.SENT, Posting.status.type),
+                ),
+                cost=func.coalesce(assembled.c.cost, Decimal("0.00")),
+            )
+            .returning(Posting.id, Posting.status, Posting.cost)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def lock_in_item_pick(self, ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        """Разделяемая блокировка собираемых заказов до конца транзакции
+
+        Отмена заказа блокирует его строку монопольно, поэтому задачи на подбор, созданные под этой блокировкой,
+        не появятся у заказа после отмены. Возвращает ID заказов, которые еще собираются.
+        """
+        ids = sorted(set(ids))
+        if not ids:
+            return set()
+        stmt = (
+            select(Posting.id)
+            .filter(self.id_in(ids), Posting.status == PostingStatus.IN_ITEM_PICK)
+            .order_by(Posting.id)
+            .with_for_update(read=True)
+        )
+        res = await self.session.execute(stmt)
+        return set(res.scalars().all())
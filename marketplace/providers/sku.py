@@ -1,6 +1,95 @@
-from models import Sku
+import uuid
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+
+from models import Discount, DiscountStatus, Sku
+from sqlalchemy import Row, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from utils.provider import SQLAlchemyProvider
+from utils.utils import chunked
 
 
 class SkuProvider(SQLAlchemyProvider):
     model = Sku
+    # Максимальное количество SKU, пересчитываемых одним запросом
+    recalculate_chunk_size: int = 1000
+
+    async def find_info(self, id: uuid.UUID) -> Row:
+        """Инфо о SKU без построения ORM-объекта"""
+        stmt = (
+            select(
+                self.model.id,
+                self.model.created_at,
+                self.model.actual_price,
+                self.model.base_price,
+                self.model.count,
+                self.model.is_hidden,
+            )
+            .filter(self.model.id == id)
+        )
+        res = await self.session.execute(stmt)
+        return res.one()
+
+    async def find_ids(self, after_id: uuid.UUID | None, limit: int) -> Sequence[uuid.UUID]:
+        """Постраничная выборка ID SKU по ключу: ID больше after_id, не более limit штук"""
+        stmt = select(self.model.id).order_by(self.model.id).limit(limit)
+        if after_id is not None:
+            stmt = stmt.filter(self.model.id > after_id)
+        res = await self.session.execute(stmt)
+        return res.scalars().all()
+
+    async def add_missing(self, ids: Iterable[uuid.UUID]) -> None:
+        """Создание несуществующих SKU с базовой стоимостью 0.00 одним запросом"""
+        values = [
+            {
+                "id": sku_id,
+                # TODO: Подумать над данным моментом
+                "actual_price": Decimal("0.00"),
+                "base_price": Decimal("0.00"),
+            }
+            for sku_id in dict.fromkeys(ids)
+        ]
+        if not values:
+            return
+        stmt = insert(self.model).values(values).on_conflict_do_nothing(index_elements=[self.model.id])
+        await self.session.execute(stmt)
+
+    async def recalculate_actual_prices(
+        self,
+        ids: Iterable[uuid.UUID] | None = None,
+        discount_id: uuid.UUID | None = None,
+    ) -> list[Row]:
+        """Пересчет актуальной цены SKU по активным скидкам
+
+        Цена пересчитывается в БД: для SKU с активной скидкой это базовая цена за вычетом скидки,
+        для остальных - базовая цена. SKU выбираются либо по списку ID (пачками), либо по акции.
+        Возвращает строки (id, base_price, actual_price) SKU, цена которых пересчитана.
+        """
+        # TODO: После перехода на Many To Many связь брать максимальную из активных скидок
+        active_discount_percentage = (
+            select(Discount.percentage)
+            .filter(
+                Discount.id == self.model.discount_id,
+                Discount.status == DiscountStatus.ACTIVE,
+            )
+            .scalar_subquery()
+        )
+        stmt = (
+            update(self.model)
+            .values(
+                actual_price=func.round(
+                    self.model.base_price * (100 - func.coalesce(active_discount_percentage, 0)) / 100,
+                    2,
+                ),
+            )
+            .returning(self.model.id, self.model.base_price, self.model.actual_price)
+        )
+        if discount_id is not None:
+            res = await self.session.execute(stmt.filter(self.model.discount_id == discount_id))
+            return list(res.all())
+
+        updated: list[Row] = []
+        for ids_chunk in chunked(ids or [], self.recalculate_chunk_size):
+            res = await self.session.execute(stmt.filter(self.id_in(ids_chunk)))
+            updated.extend(res.all())
+        return updated
@@ -0,0 +1,153 @@
+import uuid
+from collections.abc import Mapping, Sequence
+from typing import TypeAlias
+
+from models import Item, SkuStockCounter, Stock, StockStatus
+from sqlalchemy import BigInteger, Row, Select, Text, and_, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from utils.provider import SQLAlchemyProvider
+
+# Ключ счетчика: (ID SKU, статус стока, признак резерва)
+StockCounterKey: TypeAlias = tuple[uuid.UUID, StockStatus, bool]
+
+# Порядок значений enum в Postgres - порядок объявления, а не порядок строк
+_STOCK_STATUS_ORDER = {status: position for position, status in enumerate(StockStatus)}
+
+
+def _lock_order(item: tuple[StockCounterKey, int]) -> tuple:
+    """Порядок изменения счетчика в ORDER BY sku_id, stock_status, is_reserved"""
+    (sku_id, stock_status, is_reserved), _ = item
+    return sku_id, _STOCK_STATUS_ORDER[stock_status], is_reserved
+
+
+class SkuStockCounterProvider(SQLAlchemyProvider):
+    model = SkuStockCounter
+    # Количество частей каждого счетчика, транзакция изменяет часть по своему ID
+    shards: int = 16
+
+    def _current_shard(self):
+        # Соседние транзакции получают соседние ID, поэтому параллельные изменения попадают в разные части
+        return cast(cast(func.pg_current_xact_id(), Text), BigInteger) % self.shards
+
+    async def apply_deltas(self, deltas: Mapping[StockCounterKey, int]) -> None:
+        """Изменение счетчиков на указанные величины одним запросом (INSERT ... ON CONFLICT DO UPDATE)
+
+        Выполняется в транзакции, изменяющей стоки, поэтому счетчики фиксируются вместе со стоками.
+        Изменяется часть счетчика, выбранная по ID транзакции: параллельные резервы товаров одного SKU
+        изменяют разные строки и не ждут фиксации друг друга.
+        Строки счетчиков блокируются в порядке ключей в БД, как в lock_by_sku_ids, чтобы параллельные транзакции
+        не блокировали друг друга по кругу.
+        """
+        shard = self._current_shard()
+        values = [
+            {"sku_id": sku_id, "stock_status": stock_status, "is_reserved": is_reserved, "shard": shard, "count": delta}
+            for (sku_id, stock_status, is_reserved), delta in sorted(deltas.items(), key=_lock_order)
+            if delta
+        ]
+        if not values:
+            return
+        stmt = insert(self.model).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.sku_id, self.model.stock_status, self.model.is_reserved, self.model.shard],
+            set_={"count": self.model.count + stmt.excluded.count},
+        )
+        await self.session.execute(stmt)
+
+    async def find_by_sku_id(self, sku_id: uuid.UUID) -> Sequence[Row]:
+        """Ненулевые счетчики SKU: (stock_status, is_reserved, units_count)"""
+        units_count = func.sum(self.model.count)
+        stmt = (
+            select(self.model.stock_status, self.model.is_reserved, units_count.label("units_count"))
+            .filter(self.model.sku_id == sku_id)
+            .group_by(self.model.stock_status, self.model.is_reserved)
+            .having(units_count != 0)
+            .order_by(self.model.stock_status, self.model.is_reserved)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    def _actual_counts_query(self) -> Select:
+        # Значения счетчиков, посчитанные по стокам
+        return (
+            select(
+                Item.sku_id,
+                Stock.status.label("stock_status"),
+                Stock.is_reserved,
+                func.count().label("units_count"),
+            )
+            .select_from(Stock)
+            .join(Item, Item.id == Stock.item_id)
+            .group_by(Item.sku_id, Stock.status, Stock.is_reserved)
+        )
+
+    async def find_drift(self, sku_ids: Sequence[uuid.UUID] | None = None) -> Sequence[Row]:
+        """Счетчики, расходящиеся со стоками: (sku_id, stock_status, is_reserved, stored_count, actual_count)
+
+        sku_ids - проверить только эти SKU, по умолчанию все. Отсутствующий счетчик или отсутствующие товары
+        считаются нулем. Счетчики и стоки читаются одним запросом, то есть на один момент времени.
+        """
+        actual_query = self._actual_counts_query()
+        stored_query = (
+            select(
+                self.model.sku_id,
+                self.model.stock_status,
+                self.model.is_reserved,
+                func.sum(self.model.count).label("units_count"),
+            )
+            .group_by(self.model.sku_id, self.model.stock_status, self.model.is_reserved)
+        )
+        if sku_ids is not None:
+            actual_query = actual_query.filter(self.id_in(sku_ids, column=Item.sku_id))
+            stored_query = stored_query.filter(self.id_in(sku_ids, column=self.model.sku_id))
+        actual = actual_query.subquery("actual")
+        stored = stored_query.subquery("stored")
+        stored_count = func.coalesce(stored.c.units_count, 0)
+        actual_count = func.coalesce(actual.c.units_count, 0)
+        stmt = (
+            select(
+                func.coalesce(stored.c.sku_id, actual.c.sku_id).label("sku_id"),
+                func.coalesce(stored.c.stock_status, actual.c.stock_status).label("stock_status"),
+                func.coalesce(stored.c.is_reserved, actual.c.is_reserved).label("is_reserved"),
+                stored_count.label("stored_count"),
+                actual_count.label("actual_count"),
+            )
+            .select_from(stored)
+            .join(
+                actual,
+                and_(
+                    actual.c.sku_id == stored.c.sku_id,
+                    actual.c.stock_status == stored.c.stock_status,
+                    actual.c.is_reserved == stored.c.is_reserved,
+                ),
+                full=True,
+            )
+            .filter(stored_count != actual_count)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def lock_by_sku_ids(self, sku_ids: Sequence[uuid.UUID]) -> None:
+        """Блокировка всех частей существующих счетчиков SKU до конца транзакции в порядке ключей, как в apply_deltas"""
+        stmt = (
+            select(self.model.sku_id)
+            .filter(self.id_in(sku_ids, column=self.model.sku_id))
+            .order_by(self.model.sku_id, self.model.stock_status, self.model.is_reserved, self.model.shard)
+            .with_for_update()
+        )
+        await self.session.execute(stmt)
+
+    async def reconcile(self, sku_ids: Sequence[uuid.UUID]) -> Sequence[Row]:
+        """Сверка счетчиков SKU со стоками и исправление расхождений, возвращает расхождения в формате find_drift
+
+        Блокируются только счетчики этих SKU: транзакции, уже изменившие их, успевают зафиксироваться до подсчета.
+        Расхождение применяется приращением, как изменения в apply_deltas: транзакция, которая еще не
+        зафиксирована и не видна подсчету, добавит свое изменение поверх исправленного значения,
+        в том числе к счетчику, созданному ей после блокировки.
+        """
+        await self.lock_by_sku_ids(sku_ids)
+        drift: Sequence[Row] = await self.find_drift(sku_ids)
+        await self.apply_deltas({
+            (row.sku_id, row.stock_status, row.is_reserved): row.actual_count - row.stored_count
+            for row in drift
+        })
+        return drift
@@ -0,0 +1,121 @@
+import uuid
+from collections.abc import Iterable, Mapping, Sequence
+
+from models import Item, Stock, StockStatus
+from sqlalchemy import Row, select, union_all, update
+from utils.provider import SQLAlchemyProvider
+
+
+class StockProvider(SQLAlchemyProvider):
+    model = Stock
+
+    async def reserve(self, item_ids: Iterable[uuid.UUID]) -> Sequence[Row]:
+        """Резервирование товаров одним условным запросом без предварительного чтения и блокировок
+
+        Резервируются только еще не зарезервированные стоки: если параллельная транзакция успела
+        зарезервировать товар раньше, условие NOT is_reserved после ожидания ее фиксации перепроверяется
+        и строка не обновляется. Поэтому товар не может быть зарезервирован дважды, а заказы на разные товары
+        одного SKU блокируют разные строки стоков. Счетчики SKU, изменяемые в той же транзакции,
+        разбиты на части (SkuStockCounterProvider.apply_deltas), поэтому такие заказы не ждут друг друга и на них.
+
+        Возвращает строки (item_id, sku_id, status) зарезервированных товаров.
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return []
+        stmt = (
+            update(Stock)
+            .filter(
+                self.id_in(item_ids, column=Stock.item_id),
+                Stock.is_reserved.is_(False),
+                Stock.item_id == Item.id,
+            )
+            .values(is_reserved=True, version=Stock.version + 1)
+            .returning(Stock.item_id, Item.sku_id, Stock.status)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def release(self, item_ids: Iterable[uuid.UUID]) -> Sequence[Row]:
+        """Снятие резерва с товаров одним условным запросом
+
+        Возвращает строки (item_id, sku_id, status) товаров, с которых резерв снят этим запросом.
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return []
+        stmt = (
+            update(Stock)
+            .filter(
+                self.id_in(item_ids, column=Stock.item_id),
+                Stock.is_reserved.is_(True),
+                Stock.item_id == Item.id,
+            )
+            .values(is_reserved=False, version=Stock.version + 1)
+            .returning(Stock.item_id, Item.sku_id, Stock.status)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def move_to_not_found(self, item_id: uuid.UUID) -> Row | None:
+        """Перемещение товара на сток NotFound одним условным запросом
+
+        Строка стока блокируется при чтении прежнего статуса (FOR UPDATE в CTE), поэтому прежний статус
+        и признак резерва согласованы с параллельными резервированием и снятием резерва, а версия строки
+        увеличивается так же, как при резервировании.
+        Возвращает строку (status, is_reserved) с прежним статусом стока или None, если товар уже на стоке NotFound.
+        """
+        before = (
+            select(Stock.id, Stock.status)
+            .filter(Stock.item_id == item_id, Stock.status != StockStatus.NOT_FOUND)
+            .with_for_update()
+            .cte("before")
+        )
+        stmt = (
+            update(Stock)
+            .filter(Stock.id == before.c.id)
+            .values(status=StockStatus.NOT_FOUND, version=Stock.version + 1)
+            .returning(before.c.status, Stock.is_reserved)
+        )
+        res = await self.session.execute(stmt)
+        return res.one_or_none()
+
+    async def reserve_replacements(self, count_by_sku_id: Mapping[uuid.UUID, int]) -> Sequence[Row]:
+        """Резервирование товаров на замену потерянным
+
+        Для каждого SKU подбирается не более указанного количества незарезервированных найденных товаров,
+        которые за один запрос блокируются (FOR UPDATE SKIP LOCKED) и резервируются.
+        Строки, заблокированные параллельными сборками, пропускаются, поэтому сборщики не ждут друг друга.
+
+        Возвращает строки (item_id, sku_id, status) зарезервированных товаров.
+        """
+        candidates = [
+            select(Stock.id)
+            .join(Item, Item.id == Stock.item_id)
+            .filter(
+                Item.sku_id == sku_id,
+                Stock.is_reserved.is_(False),
+                # TODO: Здесь бы стоило найти товар того же качества, но это требует бОльших доработок
+                Stock.status != StockStatus.NOT_FOUND,
+            )
+            .limit(count)
+            .with_for_update(of=Stock, skip_locked=True)
+            # Блокировка не допускается в ветках UNION, поэтому каждая выборка оформляется отдельным CTE
+            .cte(f"candidates_{index}")
+            for index, (sku_id, count) in enumerate(count_by_sku_id.items())
+            if count > 0
+        ]
+        if not candidates:
+            return []
+        candidate_stock_ids = union_all(*[select(cte.c.id) for cte in candidates])
+        stmt = (
+            update(Stock)
+            .filter(
+                Stock.id.in_(candidate_stock_ids),
+                Stock.item_id == Item.id,
+            )
+            .values(is_reserved=True, version=Stock.version + 1)
+            .returning(Stock.item_id, Item.sku_id, Stock.status)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
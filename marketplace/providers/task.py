@@ -1,6 +1,74 @@
-from models import Task
+import uuid
+from collections.abc import Iterable, Sequence
+
+from models import Item, Stock, Task, TaskStatus
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import joinedload
 from utils.provider import SQLAlchemyProvider
 
 
 class TaskProvider(SQLAlchemyProvider):
     model = Task
+    load_profiles = {
+        # Информация о задаче: товар и его сток
+        "target": (
+            joinedload(Task.item).joinedload(Item.stock),
+        ),
+        # Сбор заказа: товар задачи со стоком и SKU
+        "picking": (
+            joinedload(Task.item).options(
+                joinedload(Item.stock),
+                joinedload(Item.sku),
+            ),
+        ),
+    }
+
+    async def find_info(self, id: uuid.UUID) -> Row:
+        """Инфо о задаче и стоке ее товара без построения ORM-объектов"""
+        stmt = (
+            select(
+                Task.id,
+                Task.status,
+                Task.created_at,
+                Task.type,
+                Task.posting_id,
+                Stock.id.label("stock_id"),
+                Stock.status.label("stock_status"),
+            )
+            # Сток связан с товаром, поэтому таблицу товаров можно не подключать
+            .join(Stock, Stock.item_id == Task.item_id)
+            .filter(Task.id == id)
+        )
+        res = await self.session.execute(stmt)
+        return res.one()
+
+    async def finish_in_work(self, ids: Iterable[uuid.UUID], status: TaskStatus) -> Sequence[Row]:
+        """Завершение задач одним запросом: меняется статус только задач в работе
+
+        Проверка статуса выполняется в том же UPDATE, поэтому параллельное завершение одной задачи
+        с разными статусами не перезаписывает уже закрытую задачу.
+        Возвращает строки (id, type, acceptance_id, posting_id, item_id) завершенных задач.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        stmt = (
+            update(Task)
+            .filter(
+                self.id_in(ids),
+                Task.status == TaskStatus.IN_WORK,
+            )
+            .values(status=status)
+            .returning(Task.id, Task.type, Task.acceptance_id, Task.posting_id, Task.item_id)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def find_statuses(self, ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, TaskStatus]:
+        """Статусы задач по ID, отсутствующих в БД задач в результате нет"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        stmt = select(Task.id, Task.status).filter(self.id_in(ids))
+        res = await self.session.execute(stmt)
+        return dict(res.tuples().all())
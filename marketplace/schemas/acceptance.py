@@ -3,6 +3,8 @@ from uuid import UUID
 
 from pydantic import AwareDatetime, BaseModel, Field
 
+MAX_ACCEPTANCE_TASKS_PAGE_SIZE = 1000
+
 
 class StockStatusSchema(StrEnum):
     VALID = "valid"
@@ -37,6 +39,8 @@ class GetAcceptanceInfoResponse(BaseModel):
     created_at: AwareDatetime
     accepted: list[AcceptanceInfoResponseSkuByStockStatus] = Field(default_factory=list)
     task_ids: list[AcceptanceInfoTask] = Field(default_factory=list)
+    # Заполняется при постраничной выборке задач, если есть следующая страница
+    next_task_cursor: UUID | None = None
 
 
 class CreateAcceptanceRequest(BaseModel):
@@ -0,0 +1,35 @@
+from collections.abc import Iterable, Mapping
+from typing import Generic, Self, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+# Максимальное количество ID в одном пакетном запросе
+MAX_BATCH_SIZE = 500
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class BatchRequest(BaseModel):
+    ids: list[UUID] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchResult(BaseModel, Generic[T]):
+    id: UUID
+    # False, если объект с таким ID не найден, в этом случае data не заполняется
+    found: bool
+    data: T | None = None
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    # Результаты в порядке ID запроса
+    results: list[BatchResult[T]] = Field(default_factory=list)
+
+    @classmethod
+    def build(cls, ids: Iterable[UUID], found: Mapping[UUID, T]) -> Self:
+        return cls(
+            results=[
+                {"id": id, "found": id in found, "data": found.get(id)}
+                for id in ids
+            ],
+        )
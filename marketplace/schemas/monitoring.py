@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class GetPoolStatsResponse(BaseModel):
+    # Размер пула и количество свободных/выданных соединений
+    size: int
+    checked_in: int
+    checked_out: int
+    # Соединения сверх размера пула (отрицательное значение - пул еще не заполнен)
+    overflow: int
+    # Ожидание соединения с момента создания пула
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
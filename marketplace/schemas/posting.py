@@ -4,6 +4,7 @@ from enum import StrEnum
 from typing import TypeAlias
 
 from pydantic import AwareDatetime, BaseModel, Field
+from schemas.batch import BatchResponse
 
 item_uuid: TypeAlias = uuid.UUID
 sku_id: TypeAlias = uuid.UUID
@@ -48,12 +49,17 @@ class GetPostingResponse(BaseModel):
     task_ids: list[TaskSchema] = Field(default_factory=list)
 
 
+GetPostingBatchResponse = BatchResponse[GetPostingResponse]
+
+
 class CreatePostingRequest(BaseModel):
     ordered_goods: list[OrderedGood] = Field(default_factory=list)
 
 
 class CreatePostingResponse(BaseModel):
     id: uuid.UUID
+    # Заказанные товары, которые не удалось зарезервировать: уже зарезервированы другими заказами или не существуют
+    not_reserved_item_ids: list[uuid.UUID] = Field(default_factory=list)
 
 
 class CancelPostingRequest(BaseModel):
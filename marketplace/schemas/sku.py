@@ -3,6 +3,7 @@ from decimal import Decimal
 from uuid import UUID
 
 from pydantic import AwareDatetime, BaseModel, Field
+from schemas.batch import BatchResponse
 
 
 class StockStatus(enum.Enum):
@@ -27,14 +28,37 @@ class GetSkuInfoResponse(BaseModel):
     is_hidden: bool
 
 
+GetItemInfoBatchResponse = BatchResponse[GetItemInfoResponse]
+GetSkuInfoBatchResponse = BatchResponse[GetSkuInfoResponse]
+
+
 class ItemInfo(BaseModel):
     item_id: UUID
     stock: StockStatus
     reserved_state: bool
 
 
+# Максимальный размер страницы товаров SKU
+MAX_ITEMS_PAGE_SIZE = 1000
+
+
 class GetItemInfoBySkuIdResponse(BaseModel):
     items: list[ItemInfo] = Field(default_factory=list)
+    # ID, с которого начинается следующая страница, None - страниц больше нет
+    next_cursor: UUID | None = None
+
+
+class SkuStockCounter(BaseModel):
+    stock: StockStatus
+    reserved_state: bool
+    count: int
+
+
+class GetSkuStockCountersResponse(BaseModel):
+    sku_id: UUID
+    counters: list[SkuStockCounter] = Field(default_factory=list)
+    # Товары, которые можно зарезервировать: не зарезервированные и не потерянные
+    available_count: int
 
 
 class MarkdownItemRequest(BaseModel):
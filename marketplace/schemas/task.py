@@ -1,7 +1,8 @@
 from enum import StrEnum
 from uuid import UUID
 
-from pydantic import AwareDatetime, BaseModel
+from pydantic import AwareDatetime, BaseModel, Field
+from schemas.batch import MAX_BATCH_SIZE, BatchResponse
 
 
 class TaskStatus(StrEnum):
@@ -39,6 +40,9 @@ class GetTaskInfoResponse(BaseModel):
     posting_id: UUID | None
 
 
+GetTaskInfoBatchResponse = BatchResponse[GetTaskInfoResponse]
+
+
 class FinishTaskStatus(StrEnum):
     COMPLETED = "completed"
     CANCELED = "canceled"
@@ -47,3 +51,29 @@ class FinishTaskStatus(StrEnum):
 class FinishTaskRequest(BaseModel):
     id: UUID
     status: FinishTaskStatus
+
+
+class FinishTasksRequest(BaseModel):
+    ids: list[UUID] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    status: FinishTaskStatus
+
+
+class FinishTaskRejection(StrEnum):
+    NOT_FOUND = "not_found"
+    # Задача уже закрыта с другим статусом
+    ALREADY_FINISHED = "already_finished"
+
+
+class FinishTaskResult(BaseModel):
+    id: UUID
+    # True, если задача завершена этим или предыдущим запросом с тем же статусом
+    finished: bool
+    # Причина, по которой задача не завершена
+    rejection: FinishTaskRejection | None = None
+    # Текущий статус задачи, не заполняется для ненайденных задач
+    status: TaskStatus | None = None
+
+
+class FinishTasksResponse(BaseModel):
+    # Результаты в порядке ID запроса
+    results: list[FinishTaskResult] = Field(default_factory=list)
@@ -1,14 +1,23 @@
 import uuid
-from collections import defaultdict
-from collections.abc import Callable
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Sequence
 from dataclasses import dataclass
-from decimal import Decimal
-from typing import TypeAlias
 
-from models import Acceptance, Item, Sku, Stock, StockStatus, Task, TaskType
+from app.cache import Cache, default_cache
+from app.config import config
+from app.metrics import instrument_service
+from app.notifications import NotificationHub, default_notification_hub
+from models import JobName, StockStatus, TaskType
 from models import TaskStatus as DBTaskStatus
 from providers.acceptance import AcceptanceProvider
+from providers.item import ItemProvider
+from providers.job import JobProvider
+from providers.notification import NotificationProvider, acceptance_notification_key
+from providers.outbox import OutboxProvider
 from providers.sku import SkuProvider
+from providers.sku_stock_counter import SkuStockCounterProvider, StockCounterKey
+from providers.stock import StockProvider
+from providers.task import TaskProvider
 from schemas.acceptance import (
     AcceptanceInfoResponseSkuByStockStatus,
     AcceptanceInfoTask,
@@ -18,11 +27,14 @@ from schemas.acceptance import (
     StockStatusSchema,
     TaskStatus,
 )
+from services.idempotency import IdempotentRequest
+from services.outbox import acceptance_created
+from services.sku import item_cache_keys
+from services.stock_counter import count_stock_change
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from utils.utils import revert_dict
 
-SkuByStockStatusKey: TypeAlias = tuple[uuid.UUID, StockStatus]
-
 # TODO: Перенести в мапперы
 # TODO: Для Апи точно не нужен мапинг - нужно передавать поле как есть - проверить. Для БД - проверить
 db_to_api_stock_status_map: dict[StockStatus, StockStatusSchema] = {
@@ -39,61 +51,93 @@ task_status_model_to_api_map = {
 }
 
 
+@instrument_service
 @dataclass
 class AcceptanceService:
     db_session_maker: Callable[[], AsyncSession]
     acceptance_provider: Callable[[AsyncSession], AcceptanceProvider] = AcceptanceProvider
     sku_provider: Callable[[AsyncSession], SkuProvider] = SkuProvider
-
-    async def get_acceptance_info(self, id: uuid.UUID) -> GetAcceptanceInfoResponse:
-        """Получить инфо о приемке"""
+    item_provider: Callable[[AsyncSession], ItemProvider] = ItemProvider
+    stock_provider: Callable[[AsyncSession], StockProvider] = StockProvider
+    task_provider: Callable[[AsyncSession], TaskProvider] = TaskProvider
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    sku_stock_counter_provider: Callable[[AsyncSession], SkuStockCounterProvider] = SkuStockCounterProvider
+    outbox_provider: Callable[[AsyncSession], OutboxProvider] = OutboxProvider
+    notification_provider: Callable[[AsyncSession], NotificationProvider] = NotificationProvider
+    cache: Cache = default_cache
+    notification_hub: NotificationHub = default_notification_hub
+
+    async def get_acceptance_info(
+        self,
+        id: uuid.UUID,
+        task_cursor: uuid.UUID | None = None,
+        task_limit: int | None = None,
+    ) -> GetAcceptanceInfoResponse:
+        """Получить инфо о приемке
+
+        Без task_limit возвращаются все задачи начиная с task_cursor. С task_limit - страница задач
+        и next_task_cursor, который нужно передать в task_cursor для получения следующей страницы.
+        Секция accepted от страницы задач не зависит и всегда считается по всей приемке.
+        """
         async with self.db_session_maker() as session:
-            acceptance: Acceptance = await self.acceptance_provider(session).find_one(id=id)
-
-        # Получаем все задачи связанные с данной приемкой
-        acceptance_tasks: list[Task] = [
-            task
-            for task in acceptance.tasks
+            acceptance_provider = self.acceptance_provider(session)
+            # Только нужные ответу колонки, без построения графа ORM-объектов
+            acceptance: Row = await acceptance_provider.find_info(id=id)
             # Пока на всякий случай фильтруем задачи по типу
             # TODO: Добавить ограничение в таблице acceptances на тип задач только PLACING
-            if task.type is TaskType.PLACING
-        ]
-        # Предполагаем что нам интересен прогресс обработанных/принятых товаров, а не просто все товары
-
-        accepted_items_by_sku_stock_status: dict[SkuByStockStatusKey, list[Item]] = defaultdict(list)
-        # Получаем все товары, связанные с данной приемкой в статусе завершено
-        for task in acceptance_tasks:
-            item: Item = task.item
-            # Для удобства формируем ключ из ID SKU и статуса стока,
-            # т.к. количество принятых товаров нужно выводит по SKU и типу стока
-            key: SkuByStockStatusKey = (item.sku.id, item.stock.status)
-
-            # Если задание по приемке товара не завершено, то пропускаем данный товар
-            if task.status is not DBTaskStatus.COMPLETED:
-                continue
-            accepted_items_by_sku_stock_status[key].append(item)
-
-        accepted_info = [
-            AcceptanceInfoResponseSkuByStockStatus(
-                sku_id=sku_id,
-                stock=db_to_api_stock_status_map.get(stock_status),
-                # TODO: Нужно динамически считать в зависимости от количества принятых товаров
-                count=len(items),
+            # Предполагаем что нам интересен прогресс обработанных/принятых товаров, а не просто все товары,
+            # количество принятых товаров выводится по SKU и типу стока и считается в БД
+            accepted_rows: Sequence[Row] = await acceptance_provider.count_completed_by_sku_stock_status(
+                id=id,
+                type=TaskType.PLACING,
+            )
+            # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+            task_rows: Sequence[Row] = await acceptance_provider.find_task_rows(
+                id=id,
+                type=TaskType.PLACING,
+                after_id=task_cursor,
+                limit=task_limit + 1 if task_limit is not None else None,
             )
-            for (sku_id, stock_status), items in accepted_items_by_sku_stock_status.items()
-        ]
+        next_task_cursor: uuid.UUID | None = None
+        if task_limit is not None and len(task_rows) > task_limit:
+            task_rows = task_rows[:task_limit]
+            next_task_cursor = task_rows[-1].id
 
         return GetAcceptanceInfoResponse(
             id=acceptance.id,
             created_at=acceptance.created_at,
-            accepted=accepted_info,
+            accepted=[
+                AcceptanceInfoResponseSkuByStockStatus(
+                    sku_id=row.sku_id,
+                    stock=db_to_api_stock_status_map.get(row.stock_status),
+                    count=row.completed_count,
+                )
+                for row in accepted_rows
+            ],
             task_ids=[
                 AcceptanceInfoTask(
                     id=task.id,
                     status=task_status_model_to_api_map.get(task.status),
                 )
-                for task in acceptance_tasks
+                for task in task_rows
             ],
+            next_task_cursor=next_task_cursor,
+        )
+
+    async def watch_acceptance(self, id: uuid.UUID) -> AsyncIterator[str]:
+        """Изменения приемки потоком SSE
+
+        Сразу отправляется текущее инфо о приемке, затем новое после каждого изменения задач на размещение.
+        Поток завершается, когда в приемке не осталось задач в работе.
+        """
+        # Приемка проверяется до открытия потока, чтобы отсутствующая приемка была ошибкой запроса.
+        # Состояние для потока перечитывается уже после подписки на изменения
+        await self.get_acceptance_info(id=id)
+        return self.notification_hub.watch(
+            key=acceptance_notification_key(id),
+            event="acceptance",
+            load=lambda: self.get_acceptance_info(id=id),
+            is_final=lambda state: all(task.status is not TaskStatus.IN_WORK for task in state.task_ids),
         )
 
     async def process_acceptance(self, acceptance_id: uuid.UUID) -> None:
@@ -105,23 +149,25 @@ class AcceptanceService:
         # Некоторое ожидание для правдоподобности тяжелого долгого фонового действия
         # await sleep(10)
         async with self.db_session_maker() as session:
-            acceptance: Acceptance = await self.acceptance_provider(session).find_one(id=acceptance_id)
             # Предположим что в БД есть ограничения и таски приходят нужного типа
-            # TODO: Реализовать это место, как будет понятно, как делать скидку дефектному товару и сколько
-            for task in acceptance.tasks:
-                # task: Task
-                # item: Item = task.item
-                # stock: Stock = item.stock
-                # if stock.status is StockStatus.DEFECT:
-                #     # TODO: Сделать скидку
-                #     ...
-                # ...
-                task.status = TaskStatus.COMPLETED
+            # TODO: Реализовать обработку дефектного товара, как будет понятно, как делать скидку и сколько
+            completed_task_ids: list[uuid.UUID] = await self.task_provider(session).edit_many(
+                data={"status": DBTaskStatus.COMPLETED},
+                acceptance_id=acceptance_id,
+                status=DBTaskStatus.IN_WORK,
+            )
+            if completed_task_ids:
+                await self.notification_provider(session).notify([acceptance_notification_key(acceptance_id)])
             await session.commit()
 
-    async def create_acceptance(self, request_data: CreateAcceptanceRequest) -> CreateAcceptanceResponse:
+    async def create_acceptance(
+        self,
+        request_data: CreateAcceptanceRequest,
+        idempotent_request: IdempotentRequest | None = None,
+    ) -> CreateAcceptanceResponse:
         """
         Создать задачу на приемку товара
+        idempotent_request - ответ сохраняется для повторов в транзакции приемки.
 
         Приемка товара
         Приемка товара осуществляется в рамках задачи на приемку.
@@ -132,73 +178,77 @@ class AcceptanceService:
         необходимо автоматически создать новый SKU с базовой стоимостью 0.00.
         Максимальное кол-во товаров в рамках одного SKU - n < 1000 и n > 0.
         """
+        # ID генерируются заранее, чтобы связать товары, стоки и задачи без промежуточных flush
+        acceptance_id: uuid.UUID = uuid.uuid4()
+        items: list[dict] = []
+        stocks: list[dict] = []
+        tasks: list[dict] = []
+        stock_counter_deltas: Counter[StockCounterKey] = Counter()
+        for sku_by_stock_type in request_data.items_to_accept:
+            stock_status: StockStatus = api_to_db_stock_status_map.get(sku_by_stock_type.stock)
+            for _ in range(sku_by_stock_type.count):
+                count_stock_change(
+                    stock_counter_deltas,
+                    sku_id=sku_by_stock_type.sku_id,
+                    before=None,
+                    after=(stock_status, False),
+                )
+                item_id: uuid.UUID = uuid.uuid4()
+                items.append({
+                    "id": item_id,
+                    "sku_id": sku_by_stock_type.sku_id,
+                    "acceptance_id": acceptance_id,
+                })
+                stocks.append({
+                    "status": stock_status,
+                    "item_id": item_id,
+                })
+                tasks.append({
+                    "status": DBTaskStatus.IN_WORK,
+                    "type": TaskType.PLACING,
+                    "acceptance_id": acceptance_id,
+                    "item_id": item_id,
+                })
+
         async with self.db_session_maker() as session:
-            acceptance = Acceptance()
-            session.add(acceptance)
-            # Получаем ID для последующей связи
-            await session.flush()
-
-            # # Резервирование товаров
-            # for item in items:
-            #     item.stock.is_reserved = True
-            #     # Создание задач на подбор товара в рамках одного SKU
-            #     task: Task = Task(
-            #         status=TaskStatus.IN_WORK,
-            #         type=TaskType.PICKING,
-            #         posting=posting,
-            #         item=item,
-            #     )
-            #     session.add(task)
-
-            for sku_by_stock_type in request_data.items_to_accept:
-
-                sku_provider = self.sku_provider(session)
-                sku: Sku | None
-                # Получаем SKU
-                try:
-                    sku = await sku_provider.find_one(id=sku_by_stock_type.sku_id)
-                # TODO: Сузить исключение
-                except Exception:
-                    sku = None
-                # Если SKU не существует, создаем его
-                if not sku:
-                    sku = Sku(
-                        id=sku_by_stock_type.sku_id,
-                        # TODO: Подумать над данным моментом
-                        actual_price=Decimal("0.00"),
-                        base_price=Decimal("0.00"),
-                    )
-                    session.add(sku)
-                    # Выталкиваем для получение ID Sku
-                    await session.flush()
-
-                # TODO: Вынести в отдельную функцию create_items_by_sku_stocks
-                items: list[Item] = [
-                    Item(
-                        sku=sku,
-                        # TODO: Возможно придется вынести наверх и переделать в цикл вместо list comprehension
-                        #  В целом можно и стоки вынести в list comprehension
-                        stock=Stock(
-                            status=api_to_db_stock_status_map.get(sku_by_stock_type.stock)
-                        ),
-                        acceptance=acceptance,
-                    )
-                    for _ in range(sku_by_stock_type.count)
-                ]
-                # TODO: Вынести в отдельную функцию create_tasks_by_items_to_placing
-                tasks: list[Task] = [
-                    Task(
-                        status=TaskStatus.IN_WORK,
-                        type=TaskType.PLACING,
-                        acceptance=acceptance,
-                        item=item
-                    )
-                    for item in items
-                ]
-                session.add_all(tasks)
-                await session.commit()
-
-                # TODO: Запустить фоном обработку приемки задач
-                await self.process_acceptance(acceptance_id=acceptance.id)
-
-        return CreateAcceptanceResponse(id=acceptance.id)
+            await self.acceptance_provider(session).add_one({"id": acceptance_id})
+            # Если SKU не существует, создаем его
+            await self.sku_provider(session).add_missing(
+                ids=[sku_by_stock_type.sku_id for sku_by_stock_type in request_data.items_to_accept],
+            )
+            # Все строки пишутся многострочными INSERT, порядок важен из-за внешних ключей
+            await self.item_provider(session).add_many(items)
+            await self.stock_provider(session).add_many(stocks)
+            await self.task_provider(session).add_many(tasks)
+            await self.sku_stock_counter_provider(session).apply_deltas(stock_counter_deltas)
+            # Обработка приемки выполняется фоновой задачей
+            await self.job_provider(session).enqueue(
+                name=JobName.PROCESS_ACCEPTANCE,
+                payload={"acceptance_id": str(acceptance_id)},
+                max_attempts=config.JOBS_MAX_ATTEMPTS,
+                idempotency_key=f"{JobName.PROCESS_ACCEPTANCE}:{acceptance_id}",
+            )
+            await self.outbox_provider(session).add_many([
+                acceptance_created(
+                    acceptance_id=acceptance_id,
+                    items=[
+                        (
+                            sku_by_stock_type.sku_id,
+                            api_to_db_stock_status_map.get(sku_by_stock_type.stock),
+                            sku_by_stock_type.count,
+                        )
+                        for sku_by_stock_type in request_data.items_to_accept
+                    ],
+                ),
+            ])
+            if idempotent_request is not None:
+                await idempotent_request.save_response(session, CreateAcceptanceResponse(id=acceptance_id))
+            # Приемка фиксируется целиком одной транзакцией
+            await session.commit()
+        # У SKU появились новые товары
+        await self.cache.invalidate(item_cache_keys(
+            item_ids=[],
+            sku_ids=[sku_by_stock_type.sku_id for sku_by_stock_type in request_data.items_to_accept],
+        ))
+
+        return CreateAcceptanceResponse(id=acceptance_id)
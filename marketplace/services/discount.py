@@ -2,22 +2,32 @@ import uuid
 from collections.abc import Callable, Sequence
 from dataclasses import dataclass
 
-from app.database import async_session_maker
-from models import Discount, DiscountStatus, Sku
+from app.cache import Cache, default_cache
+from app.config import config
+from app.metrics import instrument_service
+from models import Discount, DiscountStatus, JobName, Sku
 from providers.discount import DiscountProvider
+from providers.job import JobProvider
+from providers.outbox import OutboxProvider
 from providers.sku import SkuProvider
+from schemas.discount import CreateDiscountResponseSchema
 from service_models import CreateDiscountDTO, DiscountDTO
-from services.sku import SkuService
-from sqlalchemy import select
+from services.idempotency import IdempotentRequest
+from services.outbox import discount_status_change, sku_price_changes
+from services.sku import sku_cache_keys
+from sqlalchemy import Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+@instrument_service
 @dataclass
 class DiscountService:
     db_session_maker: Callable[[], AsyncSession]
     discount_provider: Callable[[AsyncSession], DiscountProvider] = DiscountProvider
     sku_provider: Callable[[AsyncSession], SkuProvider] = SkuProvider
-    sku_service: Callable[[AsyncSession], SkuService] = SkuService
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    outbox_provider: Callable[[AsyncSession], OutboxProvider] = OutboxProvider
+    cache: Cache = default_cache
 
     async def get_discount(self, discount_id: uuid.UUID) -> DiscountDTO:
         async with self.db_session_maker() as session:
@@ -31,10 +41,26 @@ class DiscountService:
                 id=discount_id,
                 data={'status': DiscountStatus.FINISHED}
             )
+            # Возвращаем SKU акции актуальную цену без скидки
+            repriced: list[Row] = await self.sku_provider(session).recalculate_actual_prices(discount_id=discount_id)
+            await self.outbox_provider(session).add_many([
+                discount_status_change(
+                    discount_id=discount_id,
+                    status=DiscountStatus.FINISHED,
+                    sku_ids=[row.id for row in repriced],
+                ),
+                *sku_price_changes(repriced),
+            ])
             await session.commit()
+        await self.cache.invalidate(sku_cache_keys(row.id for row in repriced))
         return discount_id
 
-    async def create_discount(self, discount_data: CreateDiscountDTO) -> uuid.UUID:
+    async def create_discount(
+        self,
+        discount_data: CreateDiscountDTO,
+        idempotent_request: IdempotentRequest | None = None,
+    ) -> uuid.UUID:
+        """Создание акции, idempotent_request - ответ сохраняется для повторов в транзакции создания"""
         async with self.db_session_maker() as session:
             discount = Discount(
                 status=DiscountStatus.ACTIVE,
@@ -47,11 +73,22 @@ class DiscountService:
             )
             skus: Sequence[Sku] = (await session.execute(skus_query)).scalars().all()
             discount.skus = skus
+            await session.flush()
+            # Пересчет актуальных цен выполняется фоновой задачей
+            await self.job_provider(session).enqueue(
+                name=JobName.UPDATE_SKUS_ACTUAL_PRICES,
+                payload={"sku_ids": [str(sku.id) for sku in skus]},
+                max_attempts=config.JOBS_MAX_ATTEMPTS,
+                idempotency_key=f"{JobName.UPDATE_SKUS_ACTUAL_PRICES}:{discount.id}",
+            )
+            await self.outbox_provider(session).add_many([
+                discount_status_change(
+                    discount_id=discount.id,
+                    status=DiscountStatus.ACTIVE,
+                    sku_ids=[sku.id for sku in skus],
+                ),
+            ])
+            if idempotent_request is not None:
+                await idempotent_request.save_response(session, CreateDiscountResponseSchema(id=discount.id))
             await session.commit()
-            # TODO: Добавить в фоновые задачи
-            # NOTE: Очень важно передать НЕ текущую сессию, иначе будет либо ожидание, либо сессия будет уже закрыта
-            # await SkuService(
-            await self.sku_service(
-                db_session_maker=async_session_maker,
-            ).update_skus_actual_prices(sku_ids=[sku.id for sku in skus])
         return discount.id
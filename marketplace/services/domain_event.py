@@ -0,0 +1,45 @@
+from collections.abc import Iterable, Sequence
+
+from app.config import config
+from models import JobName, TaskStatus
+from providers.domain_event import DomainEventProvider, TaskStatusChange
+from providers.job import JobProvider
+from sqlalchemy import Row
+
+
+async def publish_task_status_changes(
+    domain_event_provider: DomainEventProvider,
+    job_provider: JobProvider,
+    changes: Sequence[TaskStatusChange],
+) -> None:
+    """Запись событий изменения статусов задач в транзакции изменения и постановка их обработки в очередь
+
+    Порядок изменений сохраняется: при замене задачи создание новой передается раньше отмены старой,
+    чтобы счетчик задач заказа не обнулялся между событиями.
+    """
+    changes = [change for change in changes if change.before is not change.after]
+    if not changes:
+        return
+    await domain_event_provider.add_task_status_changes(changes)
+    # Ожидающая обработка событий одна на все транзакции, она обработает все накопившиеся события
+    await job_provider.enqueue(
+        name=JobName.PROCESS_DOMAIN_EVENTS,
+        payload={},
+        max_attempts=config.JOBS_MAX_ATTEMPTS,
+        idempotency_key=JobName.PROCESS_DOMAIN_EVENTS,
+    )
+
+
+def finished_task_changes(finished: Iterable[Row], status: TaskStatus) -> list[TaskStatusChange]:
+    """Изменения статусов задач, завершенных TaskProvider.finish_in_work"""
+    return [
+        TaskStatusChange(
+            task_id=row.id,
+            type=row.type,
+            posting_id=row.posting_id,
+            item_id=row.item_id,
+            before=TaskStatus.IN_WORK,
+            after=status,
+        )
+        for row in finished
+    ]
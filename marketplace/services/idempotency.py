@@ -0,0 +1,123 @@
+import datetime
+import hashlib
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from app.config import config
+from app.exceptions import ConflictError
+from app.metrics import instrument_service
+from providers.idempotency_key import IdempotencyKeyProvider
+from pydantic import BaseModel
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ResponseT = TypeVar("ResponseT", bound=BaseModel)
+
+
+def request_hash(request_data: BaseModel) -> str:
+    return hashlib.sha256(request_data.model_dump_json().encode()).hexdigest()
+
+
+class IdempotencyKeyTaken(Exception):
+    """Ключ сохранил параллельный запрос, транзакция текущего запроса должна откатиться"""
+
+
+@dataclass(frozen=True)
+class IdempotentRequest:
+    """Запрос с ключом идемпотентности, передается в сервис, выполняющий запрос
+
+    Сервис сохраняет ответ через save_response в своей транзакции перед фиксацией:
+    результат запроса и ответ на него фиксируются или откатываются вместе.
+    """
+    endpoint: str
+    key: str
+    request_hash: str
+    ttl: float = config.IDEMPOTENCY_KEY_TTL
+    idempotency_key_provider: Callable[[AsyncSession], IdempotencyKeyProvider] = IdempotencyKeyProvider
+
+    async def save_response(self, session: AsyncSession, response: BaseModel | None) -> None:
+        """Сохранить ответ в транзакции запроса
+
+        Если ключ уже сохранил параллельный запрос, поднимает IdempotencyKeyTaken после его фиксации.
+        """
+        saved = await self.idempotency_key_provider(session).save(
+            endpoint=self.endpoint,
+            key=self.key,
+            request_hash=self.request_hash,
+            response=response.model_dump(mode="json") if response is not None else None,
+            ttl=datetime.timedelta(seconds=self.ttl),
+        )
+        if not saved:
+            raise IdempotencyKeyTaken
+
+
+@instrument_service
+@dataclass
+class IdempotencyService:
+    """Выполнение запросов на запись не более одного раза на ключ идемпотентности
+
+    Ответ сохраняется в транзакции самого запроса (IdempotentRequest.save_response), поэтому
+    зафиксированный запрос всегда имеет сохраненный ответ, а незафиксированный выполнится при повторе заново.
+    Повтор обслуживается одним чтением ключа без записи.
+    """
+    db_session_maker: Callable[[], AsyncSession]
+    idempotency_key_provider: Callable[[AsyncSession], IdempotencyKeyProvider] = IdempotencyKeyProvider
+    ttl: float = config.IDEMPOTENCY_KEY_TTL
+
+    async def execute(
+        self,
+        endpoint: str,
+        key: str | None,
+        request_data: BaseModel,
+        operation: Callable[[IdempotentRequest | None], Awaitable[ResponseT | None]],
+        response_model: type[ResponseT] | None = None,
+    ) -> ResponseT | None:
+        """Выполнить операцию, либо вернуть сохраненный ответ на запрос с тем же ключом
+
+        Операция получает IdempotentRequest (None без ключа) и сохраняет через него ответ в своей транзакции.
+        Повтор с тем же ключом, но другим телом запроса, завершается ConflictError.
+        Повтор во время выполнения исходного запроса ждет его фиксации и возвращает его ответ.
+        """
+        if key is None:
+            return await operation(None)
+
+        current_request_hash = request_hash(request_data)
+        state = await self._find_state(endpoint=endpoint, key=key)
+        if state is not None:
+            return self._replay(state, current_request_hash, response_model)
+
+        try:
+            return await operation(IdempotentRequest(
+                endpoint=endpoint,
+                key=key,
+                request_hash=current_request_hash,
+                ttl=self.ttl,
+                idempotency_key_provider=self.idempotency_key_provider,
+            ))
+        except IdempotencyKeyTaken:
+            # Параллельный запрос с тем же ключом зафиксировался раньше, транзакция операции откачена
+            state = await self._find_state(endpoint=endpoint, key=key)
+            if state is None:
+                raise ConflictError(message="Request with this idempotency key is in progress.")
+            return self._replay(state, current_request_hash, response_model)
+
+    async def _find_state(self, endpoint: str, key: str) -> Row | None:
+        async with self.db_session_maker() as session:
+            return await self.idempotency_key_provider(session).find_state(
+                endpoint=endpoint,
+                key=key,
+                ttl=datetime.timedelta(seconds=self.ttl),
+            )
+
+    @staticmethod
+    def _replay(
+        state: Row,
+        current_request_hash: str,
+        response_model: type[ResponseT] | None,
+    ) -> ResponseT | None:
+        if state.request_hash != current_request_hash:
+            raise ConflictError(message="Idempotency key is already used with a different request.")
+        if state.response is None or response_model is None:
+            return None
+        return response_model.model_validate(state.response)
@@ -0,0 +1,53 @@
+import uuid
+
+from app.config import config
+from app.database import async_session_maker
+from app.jobs import JobHandler
+from models import JobName
+from services.acceptance import AcceptanceService
+from services.posting import PostingService
+from services.sku import SkuService
+from services.stock_counter import StockCounterService
+
+
+async def process_picking_posting(payload: dict) -> None:
+    await PostingService(
+        db_session_maker=async_session_maker,
+    ).process_picking_posting(posting_id=uuid.UUID(payload["posting_id"]))
+
+
+async def process_acceptance(payload: dict) -> None:
+    await AcceptanceService(
+        db_session_maker=async_session_maker,
+    ).process_acceptance(acceptance_id=uuid.UUID(payload["acceptance_id"]))
+
+
+async def process_domain_events(payload: dict) -> None:
+    service = PostingService(db_session_maker=async_session_maker)
+    batch_size = config.DOMAIN_EVENTS_BATCH_SIZE
+    # События обрабатываются пачками, пока очередь не опустеет
+    while True:
+        processed = await service.process_task_events(limit=batch_size)
+        if processed < batch_size:
+            break
+
+
+async def update_skus_actual_prices(payload: dict) -> None:
+    await SkuService(
+        db_session_maker=async_session_maker,
+    ).update_skus_actual_prices(sku_ids=[uuid.UUID(sku_id) for sku_id in payload["sku_ids"]])
+
+
+async def reconcile_sku_stock_counters(payload: dict) -> None:
+    await StockCounterService(
+        db_session_maker=async_session_maker,
+    ).reconcile()
+
+
+JOB_HANDLERS: dict[str, JobHandler] = {
+    JobName.PROCESS_PICKING_POSTING: process_picking_posting,
+    JobName.PROCESS_ACCEPTANCE: process_acceptance,
+    JobName.UPDATE_SKUS_ACTUAL_PRICES: update_skus_actual_prices,
+    JobName.RECONCILE_SKU_STOCK_COUNTERS: reconcile_sku_stock_counters,
+    JobName.PROCESS_DOMAIN_EVENTS: process_domain_events,
+}
@@ -0,0 +1,89 @@
+"""Сообщения outbox об изменениях для внешних систем
+
+Сообщения записываются сервисами в транзакции изменения и публикуются ретранслятором app.outbox.
+Цены передаются строками, чтобы не терять точность Decimal в JSON.
+"""
+import uuid
+from collections.abc import Iterable
+from decimal import Decimal
+
+from models import DiscountStatus, OutboxTopic, PostingStatus, StockStatus
+from providers.outbox import OutboxRecord
+from sqlalchemy import Row
+
+
+def sku_price_changes(rows: Iterable[Row]) -> list[OutboxRecord]:
+    """Сообщения об изменении цен по строкам (id, base_price, actual_price) SkuProvider.recalculate_actual_prices"""
+    return [
+        OutboxRecord(
+            topic=OutboxTopic.SKU_PRICE_CHANGED,
+            key=str(row.id),
+            payload={
+                "sku_id": str(row.id),
+                "base_price": str(row.base_price),
+                "actual_price": str(row.actual_price),
+            },
+        )
+        for row in rows
+    ]
+
+
+def item_reservation_changes(
+    items: Iterable[tuple[uuid.UUID, uuid.UUID]],
+    posting_id: uuid.UUID,
+    is_reserved: bool,
+) -> list[OutboxRecord]:
+    """Сообщения о резервировании товаров заказом или снятии резерва, items - пары (ID товара, ID SKU)"""
+    return [
+        OutboxRecord(
+            topic=OutboxTopic.ITEM_RESERVATION_CHANGED,
+            key=str(item_id),
+            payload={
+                "item_id": str(item_id),
+                "sku_id": str(sku_id),
+                "posting_id": str(posting_id),
+                "is_reserved": is_reserved,
+            },
+        )
+        for item_id, sku_id in items
+    ]
+
+
+def posting_status_change(posting_id: uuid.UUID, status: PostingStatus, cost: Decimal) -> OutboxRecord:
+    return OutboxRecord(
+        topic=OutboxTopic.POSTING_STATUS_CHANGED,
+        key=str(posting_id),
+        payload={"posting_id": str(posting_id), "status": status, "cost": str(cost)},
+    )
+
+
+def discount_status_change(
+    discount_id: uuid.UUID,
+    status: DiscountStatus,
+    sku_ids: Iterable[uuid.UUID],
+) -> OutboxRecord:
+    """Сообщение о запуске или завершении акции, новые цены SKU акции передаются отдельными сообщениями"""
+    return OutboxRecord(
+        topic=OutboxTopic.DISCOUNT_STATUS_CHANGED,
+        key=str(discount_id),
+        payload={
+            "discount_id": str(discount_id),
+            "status": status,
+            "sku_ids": [str(sku_id) for sku_id in sku_ids],
+        },
+    )
+
+
+def acceptance_created(acceptance_id: uuid.UUID, items: Iterable[tuple[uuid.UUID, StockStatus, int]]) -> OutboxRecord:
+    """Сообщение о создании приемки, items - тройки (ID SKU, сток, количество товаров)"""
+    return OutboxRecord(
+        topic=OutboxTopic.ACCEPTANCE_CREATED,
+        key=str(acceptance_id),
+        payload={
+            "acceptance_id": str(acceptance_id),
+            "items": [
+                {"sku_id": str(sku_id), "stock": stock, "count": count}
+                for sku_id, stock, count in items
+            ],
+        },
+    )
@@ -1,13 +1,18 @@
 import uuid
-from collections import defaultdict
-from collections.abc import Callable, Sequence
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Callable, Sequence
 from dataclasses import dataclass
 from decimal import Decimal
 from itertools import chain
 
+from app.cache import Cache, default_cache
+from app.config import config
+from app.metrics import instrument_service
+from app.notifications import NotificationHub, default_notification_hub
 from models import (
+    DomainEvent,
     Item,
-    ItemDiscount,
+    JobName,
     Posting,
     PostingStatus,
     Sku,
@@ -18,79 +23,133 @@ from models import (
     TaskType,
 )
 from models import StockStatus as DBStockStatus
+from providers.domain_event import DomainEventProvider, TaskStatusChange
 from providers.item import ItemProvider
+from providers.job import JobProvider
+from providers.notification import NotificationProvider, posting_notification_key
+from providers.outbox import OutboxProvider
 from providers.posting import PostingProvider
+from providers.sku_stock_counter import SkuStockCounterProvider, StockCounterKey
+from providers.stock import StockProvider
+from providers.task import TaskProvider
 from schemas.posting import (
     CancelPostingRequest,
     CreatePostingRequest,
     CreatePostingResponse,
+    GetPostingBatchResponse,
     GetPostingResponse,
     OrderedGood,
     TaskSchema,
 )
-from sqlalchemy import select
+from schemas.posting import PostingStatus as PostingStatusSchema
+from services.domain_event import finished_task_changes, publish_task_status_changes
+from services.idempotency import IdempotentRequest
+from services.outbox import item_reservation_changes, posting_status_change
+from services.sku import item_cache_keys
+from services.stock_counter import count_stock_change
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
 
+def posting_to_posting_info(posting: Posting) -> GetPostingResponse:
+    items_by_not_hided_sku: dict[uuid.UUID, list[Item]] = defaultdict(list)
+    # items_by_hided_sku: dict[uuid.UUID, list[Item]] = defaultdict(list)
+
+    # TODO: Сделать получение не найденных товаров из списка товаров отмененных задач
+    #  + возможно стоит добавить дополнительное условие и не показывать товары, по которым была замена
+    for item in posting.items:
+        # NOTE: Так как пока решено не прикреплять изначально заказанные товары к заказу,
+        # (такие товары можно найти в задачах на подбор), то нет смысла использовать здесь логику sku.is_hidden
+        # if item.sku.is_hidden:
+        #     items_by_hided_sku[item.sku.id].append(item)
+        #     continue
+        items_by_not_hided_sku[item.sku_id].append(item)
+
+    # Находим не найденные товары из списка отмененных задач на подбор товара
+    # TODO: Скорректировать, убрав из списка успешно замененные товары
+    not_found_sku_ids: list[uuid.UUID] = [
+        task.item_id
+        for task in posting.tasks
+        if task.type is TaskType.PICKING and task.status is TaskStatus.CANCELED
+    ]
+
+    return GetPostingResponse(
+        id=posting.id,
+        status=posting.status,
+        created_at=posting.created_at,
+        # NOTE: Цена просчитывается с учетом всех скидок в процессе сбора заказа
+        cost=posting.cost,
+        ordered_goods=[
+            OrderedGood(
+                sku=sku_id,
+                from_valid_ids=[item.id for item in items if item.stock.status is DBStockStatus.VALID],
+                from_defect_ids=[item.id for item in items if item.stock.status is DBStockStatus.DEFECT],
+            )
+            for sku_id, items in items_by_not_hided_sku.items()
+        ],
+        # TODO: Посмотреть по ходу точно ли понятен смысл данного поля
+        # TODO: Подумать в какой момент влияет сокрытие SKU.
+        #  На данный момент кажется что в момент создания заказа
+        not_found=not_found_sku_ids,
+        task_ids=[
+            TaskSchema(
+                id=task.id,
+                type=task.type,
+                status=task.status,
+            )
+            for task in posting.tasks
+        ],
+    )
+
+
+@instrument_service
 @dataclass
 class PostingService:
     db_session_maker: Callable[[], AsyncSession]
     posting_provider: Callable[[AsyncSession], PostingProvider] = PostingProvider
     item_provider: Callable[[AsyncSession], ItemProvider] = ItemProvider
+    stock_provider: Callable[[AsyncSession], StockProvider] = StockProvider
+    task_provider: Callable[[AsyncSession], TaskProvider] = TaskProvider
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    sku_stock_counter_provider: Callable[[AsyncSession], SkuStockCounterProvider] = SkuStockCounterProvider
+    domain_event_provider: Callable[[AsyncSession], DomainEventProvider] = DomainEventProvider
+    outbox_provider: Callable[[AsyncSession], OutboxProvider] = OutboxProvider
+    notification_provider: Callable[[AsyncSession], NotificationProvider] = NotificationProvider
+    cache: Cache = default_cache
+    notification_hub: NotificationHub = default_notification_hub
 
     async def get_posting(self, posting_id: uuid.UUID) -> GetPostingResponse:
         """Получение информации по заказу"""
         async with self.db_session_maker() as session:
-            posting: Posting = await self.posting_provider(session).find_one(id=posting_id)
-
-        items_by_not_hided_sku: dict[uuid.UUID, list[Item]] = defaultdict(list)
-        # items_by_hided_sku: dict[uuid.UUID, list[Item]] = defaultdict(list)
+            posting: Posting = await self.posting_provider(session).find_one(id=posting_id, load_profile="info")
+        return posting_to_posting_info(posting)
 
-        # TODO: Сделать получение не найденных товаров из списка товаров отмененных задач
-        #  + возможно стоит добавить дополнительное условие и не показывать товары, по которым была замена
-        for item in posting.items:
-            # NOTE: Так как пока решено не прикреплять изначально заказанные товары к заказу,
-            # (такие товары можно найти в задачах на подбор), то нет смысла использовать здесь логику sku.is_hidden
-            # if item.sku.is_hidden:
-            #     items_by_hided_sku[item.sku.id].append(item)
-            #     continue
-            items_by_not_hided_sku[item.sku.id].append(item)
+    async def get_posting_batch(self, ids: list[uuid.UUID]) -> GetPostingBatchResponse:
+        """Получение информации по заказам по списку ID одним запросом"""
+        async with self.db_session_maker() as session:
+            postings: dict[uuid.UUID, Posting] = await self.posting_provider(session).find_many(
+                ids=ids,
+                load_profile="info",
+            )
+        return GetPostingBatchResponse.build(
+            ids=ids,
+            found={posting_id: posting_to_posting_info(posting) for posting_id, posting in postings.items()},
+        )
 
-        # Находим не найденные товары из списка отмененных задач на подбор товара
-        # TODO: Скорректировать, убрав из списка успешно замененные товары
-        not_found_sku_ids: list[uuid.UUID] = [
-            task.item.id
-            for task in posting.tasks
-            if task.type is TaskType.PICKING and task.statis is TaskStatus.CANCELED
-        ]
+    async def watch_posting(self, posting_id: uuid.UUID) -> AsyncIterator[str]:
+        """Изменения заказа потоком SSE
 
-        return GetPostingResponse(
-            id=posting.id,
-            status=posting.status,
-            created_at=posting.created_at,
-            # NOTE: Цена просчитывается с учетом всех скидок в процессе сбора заказа
-            cost=posting.cost,
-            ordered_goods=[
-                OrderedGood(
-                    sku=sku_id,
-                    from_valid_ids=[item.id for item in items if item.stock.status is DBStockStatus.VALID],
-                    from_defect_ids=[item.id for item in items if item.stock.status is DBStockStatus.DEFECT],
-                )
-                for sku_id, items in items_by_not_hided_sku.items()
-            ],
-            # TODO: Посмотреть по ходу точно ли понятен смысл данного поля
-            # TODO: Подумать в какой момент влияет сокрытие SKU.
-            #  На данный момент кажется что в момент создания заказа
-            not_found=not_found_sku_ids,
-            task_ids=[
-                TaskSchema(
-                    id=task.id,
-                    type=task.type,
-                    status=task.status,
-                )
-                for task in posting.tasks
-            ],
+        Сразу отправляется текущее состояние заказа, затем новое после каждого изменения статуса или задач.
+        Поток завершается, когда заказ отправлен или отменен.
+        """
+        # Заказ проверяется до открытия потока, чтобы отсутствующий заказ был ошибкой запроса.
+        # Состояние для потока перечитывается уже после подписки на изменения
+        await self.get_posting(posting_id=posting_id)
+        return self.notification_hub.watch(
+            key=posting_notification_key(posting_id),
+            event="posting",
+            load=lambda: self.get_posting(posting_id=posting_id),
+            is_final=lambda state: state.status is not PostingStatusSchema.in_item_pick,
         )
 
     async def process_picking_posting(
@@ -108,32 +167,32 @@ class PostingService:
         Если альтернативного товара нет и подобрать другой товар невозможно -
         заказ должен быть собран без этого товара.
         Текущей задаче проставляется статус Canceled.
+
+        Изменения статусов задач записываются доменными событиями, завершение сборки заказа
+        (стоимость и статус) выполняет обработчик событий process_task_events.
         """
         async with self.db_session_maker() as session:
-            # Получаем заказ
-            posting: Posting = await self.posting_provider(session).find_one(id=posting_id)
-            # Цикл сделан для удобства, чтобы повторно не вызывать process_posting и собрать все товары за раз,
-            # в случае с добавлением задач на подбор потерянного товара
-            while True:
-                # Обновляем для получения актуального статуса задач
-                # await session.refresh(posting)
-                await session.refresh(
-                    posting,
-                    # Указываем какие связи необходимо обновить, иначе будет ошибка
-                    attribute_names=[
-                        "tasks",
-                        "items",
-                    ]
-                )
-                # Получаем актуальные задачи на сбор
-                picking_tasks_to_process: list[Task] = [
-                    task
-                    for task in posting.tasks
-                    if task.type is TaskType.PICKING and task.status is TaskStatus.IN_WORK
-                ]
-                # Если нет актуальных задач на подбор, то прерываем цикл
-                if not picking_tasks_to_process:
-                    break
+            task_provider = self.task_provider(session)
+            posting_provider = self.posting_provider(session)
+            posting: Posting = await posting_provider.find_one(id=posting_id, load_profile="picking")
+            # Задачи отмененного или уже собранного заказа не обрабатываются
+            if posting.status is not PostingStatus.IN_ITEM_PICK:
+                return
+            # Получаем актуальные задачи на сбор
+            picking_tasks_to_process: list[Task] = [
+                task
+                for task in posting.tasks
+                if task.type is TaskType.PICKING and task.status is TaskStatus.IN_WORK
+            ]
+            # Цикл нужен, чтобы сразу обработать задачи на подбор замены потерянным товарам
+            while picking_tasks_to_process:
+                # Заказ блокируется до задач: отмена ждет фиксации прохода, а после отмены замены не подбираются
+                if not await posting_provider.lock_in_item_pick(ids=[posting.id]):
+                    return
+                # ID задач по статусу, в который их нужно перевести
+                task_ids_by_status: defaultdict[TaskStatus, list[uuid.UUID]] = defaultdict(list)
+                # SKU потерянных товаров по ID задач, для них нужно подобрать замену
+                lost_sku_id_by_task_id: dict[uuid.UUID, uuid.UUID] = {}
                 # Обрабатываем заказ
                 task: Task
                 for task in picking_tasks_to_process:
@@ -143,108 +202,159 @@ class PostingService:
                     # Если SKU товара скрыт, было решено просто закрывать задачу на сбор
                     if sku.is_hidden:
                         # Отменяем текущую задачу
-                        task.status = TaskStatus.CANCELED
+                        task_ids_by_status[TaskStatus.CANCELED].append(task.id)
                         # TODO: Добавить причину отмены?
                         #  Так как она нигде не выводится и нам запрещено изменять контракт API,
                         #  то в рамках поставленной задачи от подобного поля нет смысла
-                        # Добавляем изменение по текущей задаче
-                        await session.commit()
-                        continue
-
-                    if stock.status is StockStatus.VALID:
-                        # Здесь пока ничего не требуется делать, статус собранной задачи отображен ниже
-                        ...
                     elif stock.status is StockStatus.NOT_FOUND:
-                        # TODO:
-                        # await self.item_provider(session).find_unreserved_one(
-                        #     sku_id=sku.id,
-                        # )
-
-                        # Получаем незарезервированный товар
-                        query = (
-                            select(Item).filter(
-                                Stock.is_reserved is False,
-                                # TODO: Здесь бы стоило найти товар того же качества, но это требует бОльших доработок
-                                Stock.status is not StockStatus.NOT_FOUND,
-                            )
-                        )
-                        item_for_change: Item | None = (await session.execute(query)).scalar()
-                        # Если такой товар есть, то создаем задачу на сбор
-                        if item_for_change:
-                            task_for_change: Task = Task(
-                                status=TaskStatus.IN_WORK,
-                                type=TaskType.PICKING,
-                                posting=posting,
-                                item=item_for_change,
-                            )
-                            session.add(task_for_change)
+                        # Замену подбираем сразу для всех потерянных товаров заказа после обхода задач
+                        lost_sku_id_by_task_id[task.id] = sku.id
                         # Отменяем текущую задачу
-                        task.status = TaskStatus.CANCELED
-                        # Добавляем изменение по текущей задаче и добавляем задачу на подбор аналогичного товара
-                        await session.commit()
-                        continue
-                    elif stock.status is StockStatus.DEFECT:
-                        # TODO: Вынести в сервис по применению скидок?
-                        ...
-                    # Привязываем данный товар за текущим заказом
-                    item.posting = posting
-                    # Задача обработана
-                    task.status = TaskStatus.COMPLETED
-                    await session.commit()
+                        task_ids_by_status[TaskStatus.CANCELED].append(task.id)
+                    else:
+                        # TODO: Для StockStatus.DEFECT вынести в сервис по применению скидок?
+                        # Задача обработана, товар привязывается к заказу обработчиком событий
+                        task_ids_by_status[TaskStatus.COMPLETED].append(task.id)
 
-                await session.commit()
-            # Получаем актуальное состояние заказа
-            await session.refresh(
-                posting,
-                # Указываем какие связи необходимо обновить, иначе будет ошибка
-                attribute_names=[
-                    "tasks",
-                    "items",
-                ]
-            )
-            # Проверяем собран ли заказ - для этого все задачи должны быть завершены
-            is_assembled = all([task.status is TaskStatus.COMPLETED for task in posting.tasks])
-            if is_assembled:
-                # Формируем цену заказа
-                actual_posting_price: Decimal = Decimal("0.00")
-                item: Item
-                # Если так получилось,
-                # что не удалось подобрать никаких товаров,
-                # то заказ нужно отменить - иначе это не имеет никакого смысла
-                if not posting.items:
-                    posting.status = PostingStatus.CANCELED
-                    await session.commit()
-                    return
-                for item in posting.items:
-                    # Находим максимальную скидку
-                    # TODO: Вынести в функцию получения максимальной скидки
-                    max_item_discount: ItemDiscount | None = None
-                    for item_discount in item.item_discounts:
-                        if max_item_discount is None or item_discount.percentage > max_item_discount.percentage:
-                            max_item_discount = item_discount
-                    sku: Sku = item.sku
-                    item_cost = sku.base_price
-                    # Если скидка присутствует, то применяем её
-                    if max_item_discount:
-                        # Применяем максимальную скидку
-                        coefficient = (Decimal("100.00") - Decimal(max_item_discount.percentage)) / Decimal("100.00")
-                        item_cost = sku.base_price * coefficient
-                    # Суммируем с остальной стоимостью заказа
-                    actual_posting_price += item_cost
+                # Статусы меняются условным UPDATE: задачи, завершенные параллельно (например сборщиком),
+                # повторно не завершаются и не порождают событий
+                task_status_changes: list[TaskStatusChange] = []
+                for status, task_ids in task_ids_by_status.items():
+                    finished: Sequence[Row] = await task_provider.finish_in_work(ids=task_ids, status=status)
+                    task_status_changes.extend(finished_task_changes(finished, status=status))
+                # Количество потерянных товаров по SKU, для которых нужно подобрать замену
+                lost_items_count_by_sku_id: Counter[uuid.UUID] = Counter(
+                    lost_sku_id_by_task_id[change.task_id]
+                    for change in task_status_changes
+                    if change.task_id in lost_sku_id_by_task_id
+                )
 
-                # Обновляем стоимость заказа
-                posting.cost = actual_posting_price
-                # Предполагаем что сразу по завершению сборки идет отправка и заказ отправлен,
-                # без промежуточного процесса
-                posting.status = PostingStatus.SENT
+                replacement_task_ids: list[uuid.UUID] = []
+                if lost_items_count_by_sku_id:
+                    # Резервируем замену для всех потерянных товаров одним запросом
+                    replacement_items = await self.stock_provider(session).reserve_replacements(
+                        count_by_sku_id=lost_items_count_by_sku_id,
+                    )
+                    # Счетчики стоков SKU меняются в той же транзакции, что и резерв
+                    stock_counter_deltas: Counter[StockCounterKey] = Counter()
+                    for replacement_item in replacement_items:
+                        count_stock_change(
+                            stock_counter_deltas,
+                            sku_id=replacement_item.sku_id,
+                            before=(replacement_item.status, False),
+                            after=(replacement_item.status, True),
+                        )
+                    await self.sku_stock_counter_provider(session).apply_deltas(stock_counter_deltas)
+                    # Если замена нашлась, то создаем задачи на сбор аналогичных товаров
+                    replacement_task_ids = await task_provider.add_many([
+                        {
+                            "status": TaskStatus.IN_WORK,
+                            "type": TaskType.PICKING,
+                            "posting_id": posting.id,
+                            "item_id": replacement_item.item_id,
+                        }
+                        for replacement_item in replacement_items
+                    ])
+                    # Созданные задачи передаются раньше отмененных, чтобы заказ не считался собранным между ними
+                    task_status_changes[:0] = [
+                        TaskStatusChange(
+                            task_id=task_id,
+                            type=TaskType.PICKING,
+                            posting_id=posting.id,
+                            item_id=replacement_item.item_id,
+                            before=None,
+                            after=TaskStatus.IN_WORK,
+                        )
+                        for task_id, replacement_item in zip(replacement_task_ids, replacement_items, strict=True)
+                    ]
+                    await self.outbox_provider(session).add_many(item_reservation_changes(
+                        [(replacement_item.item_id, replacement_item.sku_id) for replacement_item in replacement_items],
+                        posting_id=posting.id,
+                        is_reserved=True,
+                    ))
+                await publish_task_status_changes(
+                    self.domain_event_provider(session),
+                    self.job_provider(session),
+                    task_status_changes,
+                )
+                # Фиксируем все изменения по задачам одной транзакцией
                 await session.commit()
+                if lost_items_count_by_sku_id:
+                    await self.cache.invalidate(item_cache_keys(
+                        item_ids=[replacement_item.item_id for replacement_item in replacement_items],
+                        sku_ids=[replacement_item.sku_id for replacement_item in replacement_items],
+                    ))
+                # Следующий проход - только по задачам на подбор замены, заказ целиком повторно не загружается
+                replacement_tasks: dict[uuid.UUID, Task] = await task_provider.find_many(
+                    ids=replacement_task_ids,
+                    load_profile="picking",
+                )
+                picking_tasks_to_process = list(replacement_tasks.values())
+
+    async def process_task_events(self, limit: int = config.DOMAIN_EVENTS_BATCH_SIZE) -> int:
+        """Обработка событий изменения статусов задач: сборка заказов
 
-    async def create_posting(self, request_data: CreatePostingRequest) -> CreatePostingResponse:
+        Счетчики задач на подбор в работе меняются на сумму изменений по пачке событий,
+        подобранные товары привязываются к заказам. Заказ, у которого не осталось задач в работе,
+        отправляется со стоимостью подобранных товаров или отменяется, если подобрать ничего не удалось.
+        События отмечаются обработанными в той же транзакции, поэтому каждое применяется ровно один раз.
+        Возвращает количество обработанных событий.
+        """
+        async with self.db_session_maker() as session:
+            domain_event_provider = self.domain_event_provider(session)
+            # Порядок событий важен, поэтому обработчики выполняются по очереди
+            await domain_event_provider.lock_consumer()
+            events: Sequence[DomainEvent] = await domain_event_provider.find_unprocessed(limit=limit)
+            if not events:
+                return 0
+            open_picking_tasks_deltas: Counter[uuid.UUID] = Counter()
+            posting_id_by_picked_item_id: dict[uuid.UUID, uuid.UUID] = {}
+            changed_posting_ids: set[uuid.UUID] = set()
+            for event in events:
+                change = TaskStatusChange.from_payload(event.payload)
+                if change.posting_id is not None:
+                    changed_posting_ids.add(change.posting_id)
+                if change.type is not TaskType.PICKING or change.posting_id is None:
+                    continue
+                open_picking_tasks_deltas[change.posting_id] += (
+                    int(change.after is TaskStatus.IN_WORK) - int(change.before is TaskStatus.IN_WORK)
+                )
+                if change.after is TaskStatus.COMPLETED and change.item_id is not None:
+                    posting_id_by_picked_item_id[change.item_id] = change.posting_id
+
+            posting_provider = self.posting_provider(session)
+            await self.item_provider(session).attach_to_postings(posting_id_by_picked_item_id)
+            assembled_posting_ids: list[uuid.UUID] = await posting_provider.apply_open_picking_tasks_deltas(
+                open_picking_tasks_deltas,
+            )
+            # Формируем цену заказов с учетом максимальной скидки каждого товара одним запросом
+            costs: dict[uuid.UUID, Decimal] = await posting_provider.calculate_costs(ids=assembled_posting_ids)
+            # Предполагаем что сразу по завершению сборки идет отправка и заказ отправлен,
+            # без промежуточного процесса
+            finished: Sequence[Row] = await posting_provider.finish_assembly(ids=assembled_posting_ids, costs=costs)
+            await self.outbox_provider(session).add_many(
+                posting_status_change(posting_id=row.id, status=row.status, cost=row.cost)
+                for row in finished
+            )
+            # Подписчики заказов узнают об изменениях задач и статуса после фиксации
+            await self.notification_provider(session).notify(
+                posting_notification_key(posting_id) for posting_id in changed_posting_ids
+            )
+            await domain_event_provider.mark_processed(event.id for event in events)
+            await session.commit()
+        return len(events)
+
+    async def create_posting(
+        self,
+        request_data: CreatePostingRequest,
+        idempotent_request: IdempotentRequest | None = None,
+    ) -> CreatePostingResponse:
         """
         Создание заказа
         Пользователь выбирает определенные товары, после чего заказывает их.
         Создаются задачи на сбор заказа, на каждый конкретный ID товара - отдельная задача.
         Товар, на который создана задача должен быть зарезервирован.
+        idempotent_request - ответ сохраняется для повторов в транзакции создания заказа.
         """
 
         # """
@@ -258,106 +368,177 @@ class PostingService:
         # Текущей задаче проставляется статус Canceled.
         # """
         async with self.db_session_maker() as session:
-            # Предсоздаем заказ
+            # Если SKU скрыт, то это уже проблема сбора заказа.
+            # Только вот вопрос, а точно ли так?
+            # Тут выбор между:
+            # возможностью покупателя гарантировано получить товар
+            # и
+            # возможностью продавца отозвать свой товар.
+            # Так как товар мы все равно можем не найти, а отзываться может:
+            # либо опасный товар,
+            # либо некорректно сформированный товар,
+            # то оставим отмену скрытых позиций на момент сбора заказа
+            ordered_item_ids: list[uuid.UUID] = list(dict.fromkeys(chain.from_iterable(
+                chain(ordered_goods_by_sku.from_valid_ids, ordered_goods_by_sku.from_defect_ids)
+                for ordered_goods_by_sku in request_data.ordered_goods
+            )))
+            # Резервирование одним условным запросом: товары, уже зарезервированные другими заказами,
+            # в том числе параллельными, повторно не резервируются
+            reserved_items: Sequence[Row] = await self.stock_provider(session).reserve(item_ids=ordered_item_ids)
+            reserved_item_ids: set[uuid.UUID] = {reserved_item.item_id for reserved_item in reserved_items}
+            # TODO: Предусмотреть выброс ошибки, если товары не найдены полностью или частично?
+
+            # Создаем заказ, когда известно количество задач на подбор
             posting: Posting = Posting(
                 # TODO: Возможно стоит сделать статус NEW и сделать его по умолчанию
-                status=PostingStatus.IN_ITEM_PICK,
+                # Если не удалось зарезервировать никаких товаров, собирать нечего и заказ сразу отменяется
+                status=PostingStatus.IN_ITEM_PICK if reserved_item_ids else PostingStatus.CANCELED,
                 # TODO: Подумать над моментом подсчета цены
                 cost=Decimal("0.00"),
+                # Дальше счетчик поддерживается обработчиком событий изменения статусов задач
+                open_picking_tasks=len(reserved_item_ids),
             )
             # Добавляем и выталкиваем его в БД, чтобы получить ID для последующей связки с товарами и задачами
             session.add(posting)
             await session.flush()
 
-            for ordered_goods_by_sku in request_data.ordered_goods:
-                # Если SKU скрыт, то это уже проблема сбора заказа.
-                # Только вот вопрос, а точно ли так?
-                # Тут выбор между:
-                # возможностью покупателя гарантировано получить товар
-                # и
-                # возможностью продавца отозвать свой товар.
-                # Так как товар мы все равно можем не найти, а отзываться может:
-                # либо опасный товар,
-                # либо некорректно сформированный товар,
-                # то оставим отмену скрытых позиций на момент сбора заказа
-
-                # Выбираем все стоки товара
-                query = (
-                    select(Item)
-                    .filter(
-                        # https://docs-python.ru/standart-library/modul-itertools-python/funktsija-chain-modulja
-                        # -itertools/
-                        Item.id.in_(chain(
-                            ordered_goods_by_sku.from_valid_ids,
-                            ordered_goods_by_sku.from_defect_ids,
-                        ))
-                    )
-                    .options(
-                        joinedload(Item.sku),
-                        joinedload(Item.stock),
-                    )
-                    # # Блокируем стоки товара на обновление, чтобы только мы могли их зарезервировать
-                    # .with_for_update(
-                    #     # of=Stock,
-                    # )
+            stock_counter_deltas: Counter[StockCounterKey] = Counter()
+            for reserved_item in reserved_items:
+                count_stock_change(
+                    stock_counter_deltas,
+                    sku_id=reserved_item.sku_id,
+                    before=(reserved_item.status, False),
+                    after=(reserved_item.status, True),
                 )
-                # Получение товаров
-                items: Sequence[Item] = (await session.execute(query)).scalars().all()
-                # TODO: Предусмотреть выброс ошибки, если товары не найдены полностью или частично?
-
-                # Резервирование товаров
-                for item in items:
-                    item.stock.is_reserved = True
-                    # Создание задач на подбор товара в рамках одного SKU
-                    task: Task = Task(
-                        status=TaskStatus.IN_WORK,
-                        type=TaskType.PICKING,
-                        posting=posting,
-                        item=item,
-                    )
-                    session.add(task)
-                # TODO: Должна ли быть привязка товаров в создании заказа? Пока думаю что нет
-                await session.commit()
-            # TODO: Вынести в фоновую задачу
-            await self.process_picking_posting(posting_id=posting.id)
+            # Задачи на подбор создаются только для зарезервированных этим заказом товаров
+            await self.task_provider(session).add_many([
+                {
+                    "status": TaskStatus.IN_WORK,
+                    "type": TaskType.PICKING,
+                    "posting_id": posting.id,
+                    "item_id": item_id,
+                }
+                for item_id in ordered_item_ids
+                if item_id in reserved_item_ids
+            ])
+            # TODO: Должна ли быть привязка товаров в создании заказа? Пока думаю что нет
+            # Счетчики стоков SKU меняются в той же транзакции, что и резерв
+            await self.sku_stock_counter_provider(session).apply_deltas(stock_counter_deltas)
+            # Сбор заказа выполняется фоновой задачей, которая станет доступна вместе с заказом
+            await self.job_provider(session).enqueue(
+                name=JobName.PROCESS_PICKING_POSTING,
+                payload={"posting_id": str(posting.id)},
+                max_attempts=config.JOBS_MAX_ATTEMPTS,
+                idempotency_key=f"{JobName.PROCESS_PICKING_POSTING}:{posting.id}",
+            )
+            await self.outbox_provider(session).add_many([
+                posting_status_change(posting_id=posting.id, status=posting.status, cost=posting.cost),
+                *item_reservation_changes(
+                    [(reserved_item.item_id, reserved_item.sku_id) for reserved_item in reserved_items],
+                    posting_id=posting.id,
+                    is_reserved=True,
+                ),
+            ])
+            response = CreatePostingResponse(
+                id=posting.id,
+                not_reserved_item_ids=[item_id for item_id in ordered_item_ids if item_id not in reserved_item_ids],
+            )
+            if idempotent_request is not None:
+                await idempotent_request.save_response(session, response)
+            await session.commit()
+        await self.cache.invalidate(item_cache_keys(
+            item_ids=[reserved_item.item_id for reserved_item in reserved_items],
+            sku_ids=[reserved_item.sku_id for reserved_item in reserved_items],
+        ))
 
-        return CreatePostingResponse(id=posting.id)
+        return response
 
-    async def process_cancel_posting(
+    async def cancel_posting(
         self,
-        posting_id: uuid.UUID,
-    ):
-        """Процесс обработки отмены заказа"""
-        # TODO: Сделать процесс обработки отмены заказа
-        ...
-
-    async def cancel_posting(self, request_data: CancelPostingRequest) -> None:
+        request_data: CancelPostingRequest,
+        idempotent_request: IdempotentRequest | None = None,
+    ) -> None:
         """
         Отмена заказа
         До момента, когда заказ отправлен (проставлен статус Sent) - пользователь может отменить заказ.
-        Должны быть созданы задачи на размещение, которые снимут резерв с товара, вернут его на стоки.
+        Незавершенные задачи на подбор отменяются, резерв снимается с их товаров и с уже подобранных товаров,
+        подобранные товары возвращаются на места хранения задачами на размещение.
+        idempotent_request - отмена запоминается для повторов в транзакции отмены.
         """
         async with self.db_session_maker() as session:
-            posting: Posting = await self.posting_provider(session).find_one(id=request_data.id)
+            # Строка заказа блокируется до фиксации отмены: подбор замен ждет ее и видит заказ отмененным
+            posting: Posting = await self.posting_provider(session).find_one(
+                id=request_data.id,
+                load_profile="cancel",
+                with_for_update=True,
+            )
             if posting.status is PostingStatus.SENT:
                 raise Exception("Заказ невозможно отменить.\nПричина: Заказ отправлен")
-            elif posting.status is PostingStatus.SENT:
-                # Если заказ отменен, то нет смысла делать что-либо, разве что добавить логгирование?
+            elif posting.status is PostingStatus.CANCELED:
+                # Повторная отмена ничего не меняет
                 return
-            for item in posting.items:
-                # TODO: В процессах описано что именно задачи снимут резерв - подумать над этим
-                # Снятие резерва с товара
-                item.stock.is_reserved = False
-                # Создание задач на подбор товара в рамках одного SKU
-                task: Task = Task(
-                    status=TaskStatus.IN_WORK,
-                    type=TaskType.PLACING,
-                    posting=posting,
-                    item=item,
+            task_provider = self.task_provider(session)
+            picking_tasks: list[Task] = [task for task in posting.tasks if task.type is TaskType.PICKING]
+            # Незавершенные задачи на подбор отменяются, их товары остаются на местах хранения
+            canceled: Sequence[Row] = await task_provider.finish_in_work(
+                ids=[task.id for task in picking_tasks if task.status is TaskStatus.IN_WORK],
+                status=TaskStatus.CANCELED,
+            )
+            task_statuses: dict[uuid.UUID, TaskStatus] = {task.id: task.status for task in picking_tasks}
+            task_statuses.update(dict.fromkeys((row.id for row in canceled), TaskStatus.CANCELED))
+            # Задачи, которые сборщик завершил после чтения заказа, учитываются по актуальному статусу
+            task_statuses.update(await task_provider.find_statuses(
+                ids=[task_id for task_id, status in task_statuses.items() if status is TaskStatus.IN_WORK],
+            ))
+            picked_item_ids: list[uuid.UUID] = [
+                task.item_id for task in picking_tasks if task_statuses[task.id] is TaskStatus.COMPLETED
+            ]
+            # Резерв снимается одним запросом с подобранных товаров и с товаров отмененных задач
+            released_items: Sequence[Row] = await self.stock_provider(session).release(
+                item_ids=[*picked_item_ids, *(row.item_id for row in canceled)],
+            )
+            stock_counter_deltas: Counter[StockCounterKey] = Counter()
+            for released_item in released_items:
+                count_stock_change(
+                    stock_counter_deltas,
+                    sku_id=released_item.sku_id,
+                    before=(released_item.status, True),
+                    after=(released_item.status, False),
                 )
-                session.add(task)
+            # Подобранные товары возвращаются на места хранения задачами на размещение
+            await task_provider.add_many([
+                {
+                    "status": TaskStatus.IN_WORK,
+                    "type": TaskType.PLACING,
+                    "posting_id": posting.id,
+                    "item_id": item_id,
+                }
+                for item_id in picked_item_ids
+            ])
+            await publish_task_status_changes(
+                self.domain_event_provider(session),
+                self.job_provider(session),
+                finished_task_changes(canceled, status=TaskStatus.CANCELED),
+            )
             posting.status = PostingStatus.CANCELED
+            # Сообщения outbox записываются после изменений, о которых сообщают
+            await session.flush()
+            # Счетчики стоков SKU меняются в той же транзакции, что и резерв
+            await self.sku_stock_counter_provider(session).apply_deltas(stock_counter_deltas)
+            await self.outbox_provider(session).add_many([
+                posting_status_change(posting_id=posting.id, status=posting.status, cost=posting.cost),
+                *item_reservation_changes(
+                    [(released_item.item_id, released_item.sku_id) for released_item in released_items],
+                    posting_id=posting.id,
+                    is_reserved=False,
+                ),
+            ])
+            await self.notification_provider(session).notify([posting_notification_key(posting.id)])
+            if idempotent_request is not None:
+                await idempotent_request.save_response(session, None)
             await session.commit()
-            # TODO: Вынести в фоновую задачу
-            await self.process_cancel_posting(posting_id=posting.id)
+            await self.cache.invalidate(item_cache_keys(
+                item_ids=[released_item.item_id for released_item in released_items],
+                sku_ids=[released_item.sku_id for released_item in released_items],
+            ))
         return
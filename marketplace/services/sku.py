@@ -1,8 +1,11 @@
 import uuid
-from collections.abc import Callable, Sequence
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Iterable, Sequence
 from dataclasses import dataclass
-from decimal import Decimal
+from itertools import chain
 
+from app.cache import Cache, default_cache
+from app.metrics import instrument_service
 from models import (
     Item,
     ItemDiscount,
@@ -16,22 +19,35 @@ from models import (
 from models import (
     StockStatus as DBStockStatus,
 )
+from providers.domain_event import DomainEventProvider, TaskStatusChange
 from providers.item import ItemProvider
+from providers.job import JobProvider
+from providers.outbox import OutboxProvider
+from providers.posting import PostingProvider
 from providers.sku import SkuProvider
+from providers.sku_stock_counter import SkuStockCounterProvider, StockCounterKey
+from providers.stock import StockProvider
+from providers.task import TaskProvider
 from schemas.sku import (
+    GetItemInfoBatchResponse,
     GetItemInfoBySkuIdResponse,
     GetItemInfoResponse,
+    GetSkuInfoBatchResponse,
     GetSkuInfoResponse,
+    GetSkuStockCountersResponse,
     ItemInfo,
     MarkdownItemRequest,
     MoveToNotFoundRequest,
     SetSkuPriceRequest,
+    SkuStockCounter,
     StockStatus,
     ToggleIsHiddenRequest,
 )
-from sqlalchemy import select
+from services.domain_event import finished_task_changes, publish_task_status_changes
+from services.outbox import item_reservation_changes, sku_price_changes
+from services.stock_counter import count_stock_change
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
 # TODO: подумать над маппингом
 get_item_info_stock_status_db_to_api_map = {
@@ -41,76 +57,193 @@ get_item_info_stock_status_db_to_api_map = {
 }
 
 
+def sku_cache_keys(sku_ids: Iterable[uuid.UUID]) -> list[str]:
+    """Ключи кэша инфо о SKU"""
+    return [f"sku:{sku_id}" for sku_id in sku_ids]
+
+
+def item_cache_keys(item_ids: Iterable[uuid.UUID], sku_ids: Iterable[uuid.UUID]) -> list[str]:
+    """Ключи кэша инфо о товарах и списков товаров их SKU"""
+    return [
+        *(f"item:{item_id}" for item_id in item_ids),
+        *(f"items_by_sku:{sku_id}" for sku_id in set(sku_ids)),
+    ]
+
+
+def item_to_item_info(item: Item) -> GetItemInfoResponse:
+    return GetItemInfoResponse(
+        id=item.id,
+        sku_id=item.sku_id,
+        stock=get_item_info_stock_status_db_to_api_map.get(item.stock.status),
+        reserved_state=item.stock.is_reserved,
+    )
+
+
+def stock_state_to_item_info(row: Row) -> ItemInfo:
+    """Инфо о товаре из строки (ID товара, статус стока, признак резерва)"""
+    return ItemInfo(
+        item_id=row.id,
+        stock=get_item_info_stock_status_db_to_api_map.get(row.status),
+        reserved_state=row.is_reserved,
+    )
+
+
+def sku_to_sku_info(sku: Sku) -> GetSkuInfoResponse:
+    return GetSkuInfoResponse(
+        id=sku.id,
+        created_at=sku.created_at,
+        actual_price=sku.actual_price,
+        base_price=sku.base_price,
+        count=sku.count,
+        is_hidden=sku.is_hidden,
+    )
+
+
+@instrument_service
 @dataclass
 class SkuService:
     db_session_maker: Callable[[], AsyncSession]
     sku_provider: Callable[[AsyncSession], SkuProvider] = SkuProvider
     item_provider: Callable[[AsyncSession], ItemProvider] = ItemProvider
+    sku_stock_counter_provider: Callable[[AsyncSession], SkuStockCounterProvider] = SkuStockCounterProvider
+    stock_provider: Callable[[AsyncSession], StockProvider] = StockProvider
+    task_provider: Callable[[AsyncSession], TaskProvider] = TaskProvider
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    domain_event_provider: Callable[[AsyncSession], DomainEventProvider] = DomainEventProvider
+    outbox_provider: Callable[[AsyncSession], OutboxProvider] = OutboxProvider
+    posting_provider: Callable[[AsyncSession], PostingProvider] = PostingProvider
+    cache: Cache = default_cache
 
     async def get_item_info(self, item_id: uuid.UUID) -> GetItemInfoResponse:
+        async def load() -> str:
+            return (await self._get_item_info(item_id=item_id)).model_dump_json()
+
+        [key] = item_cache_keys(item_ids=[item_id], sku_ids=[])
+        return GetItemInfoResponse.model_validate_json(await self.cache.get_or_set(key, load))
+
+    async def _get_item_info(self, item_id: uuid.UUID) -> GetItemInfoResponse:
         async with self.db_session_maker() as session:
-            item: Item = await self.item_provider(session).find_one(**{"id": item_id})
+            # Только нужные ответу колонки, без построения графа ORM-объектов
+            row: Row = await self.item_provider(session).find_info(id=item_id)
         return GetItemInfoResponse(
-            id=item.id,
-            sku_id=item.sku_id,
-            stock=get_item_info_stock_status_db_to_api_map.get(item.stock.status),
-            reserved_state=item.stock.is_reserved,
+            id=row.id,
+            sku_id=row.sku_id,
+            stock=get_item_info_stock_status_db_to_api_map.get(row.status),
+            reserved_state=row.is_reserved,
+        )
+
+    async def get_item_info_batch(self, ids: list[uuid.UUID]) -> GetItemInfoBatchResponse:
+        """Получение инфо о копиях товаров по списку ID одним запросом"""
+        async with self.db_session_maker() as session:
+            items: dict[uuid.UUID, Item] = await self.item_provider(session).find_many(ids=ids, load_profile="stock")
+        return GetItemInfoBatchResponse.build(
+            ids=ids,
+            found={item_id: item_to_item_info(item) for item_id, item in items.items()},
         )
 
     async def get_sku_info(self, sku_id: uuid.UUID) -> GetSkuInfoResponse:
+        async def load() -> str:
+            return (await self._get_sku_info(sku_id=sku_id)).model_dump_json()
+
+        [key] = sku_cache_keys(sku_ids=[sku_id])
+        return GetSkuInfoResponse.model_validate_json(await self.cache.get_or_set(key, load))
+
+    async def _get_sku_info(self, sku_id: uuid.UUID) -> GetSkuInfoResponse:
+        async with self.db_session_maker() as session:
+            row: Row = await self.sku_provider(session).find_info(id=sku_id)
+        return GetSkuInfoResponse.model_validate(row._mapping)
+
+    async def get_sku_info_batch(self, ids: list[uuid.UUID]) -> GetSkuInfoBatchResponse:
+        """Получение инфо о товарных группах по списку ID одним запросом"""
         async with self.db_session_maker() as session:
-            sku = await self.sku_provider(session).find_one(id=sku_id)
-        return GetSkuInfoResponse(
-            id=sku.id,
-            created_at=sku.created_at,
-            actual_price=sku.actual_price,
-            base_price=sku.base_price,
-            count=sku.count,
-            is_hidden=sku.is_hidden,
+            skus: dict[uuid.UUID, Sku] = await self.sku_provider(session).find_many(ids=ids)
+        return GetSkuInfoBatchResponse.build(
+            ids=ids,
+            found={sku_id: sku_to_sku_info(sku) for sku_id, sku in skus.items()},
         )
 
-    async def get_item_info_by_sku_id(self, sku_id: uuid.UUID) -> GetItemInfoBySkuIdResponse:
+    async def get_item_info_by_sku_id(
+        self,
+        sku_id: uuid.UUID,
+        cursor: uuid.UUID | None = None,
+        limit: int | None = None,
+    ) -> GetItemInfoBySkuIdResponse:
+        """Получение копий товаров SKU
+
+        Без limit возвращаются все товары начиная с cursor. С limit - страница товаров и next_cursor,
+        который нужно передать в cursor для получения следующей страницы.
+        """
+        if cursor is not None or limit is not None:
+            return await self._get_item_info_by_sku_id(sku_id=sku_id, after_id=cursor, limit=limit)
+
+        async def load() -> str:
+            return (await self._get_item_info_by_sku_id(sku_id=sku_id)).model_dump_json()
+
+        [key] = item_cache_keys(item_ids=[], sku_ids=[sku_id])
+        return GetItemInfoBySkuIdResponse.model_validate_json(await self.cache.get_or_set(key, load))
+
+    async def _get_item_info_by_sku_id(
+        self,
+        sku_id: uuid.UUID,
+        after_id: uuid.UUID | None = None,
+        limit: int | None = None,
+    ) -> GetItemInfoBySkuIdResponse:
         async with self.db_session_maker() as session:
-            # items = await self.item_provider(session).find_one(**{"id": id})
-            # TODO: Вынести в провайдер
-            stmt = select(Item).filter_by(
+            # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+            rows: Sequence[Row] = await self.item_provider(session).find_stock_states_by_sku_id(
                 sku_id=sku_id,
-            ).options(
-                joinedload('*')
+                after_id=after_id,
+                limit=limit + 1 if limit is not None else None,
             )
-            res = await session.execute(stmt)
-            items: Sequence[Item] = res.unique().scalars().all()
+        next_cursor: uuid.UUID | None = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].id
         return GetItemInfoBySkuIdResponse(
-            items=[
-                ItemInfo(
-                    item_id=item.id,
-                    stock=get_item_info_stock_status_db_to_api_map.get(item.stock.status),
-                    reserved_state=item.stock.is_reserved,
+            items=[stock_state_to_item_info(row) for row in rows],
+            next_cursor=next_cursor,
+        )
+
+    async def stream_item_info_by_sku_id(self, sku_id: uuid.UUID) -> AsyncIterator[str]:
+        """Копии товаров SKU в формате NDJSON, по строке на товар
+
+        Строки читаются серверным курсором, поэтому потребление памяти не зависит от количества товаров
+        """
+        async with self.db_session_maker() as session:
+            async for row in self.item_provider(session).stream_stock_states_by_sku_id(sku_id=sku_id):
+                yield stock_state_to_item_info(row).model_dump_json() + "\n"
+
+    async def get_sku_stock_counters(self, sku_id: uuid.UUID) -> GetSkuStockCountersResponse:
+        """Количество товаров SKU по стокам и резерву по счетчикам, без обхода товаров"""
+        async with self.db_session_maker() as session:
+            rows: Sequence[Row] = await self.sku_stock_counter_provider(session).find_by_sku_id(sku_id=sku_id)
+        return GetSkuStockCountersResponse(
+            sku_id=sku_id,
+            counters=[
+                SkuStockCounter(
+                    stock=get_item_info_stock_status_db_to_api_map.get(row.stock_status),
+                    reserved_state=row.is_reserved,
+                    count=row.units_count,
                 )
-                for item in items
-            ]
+                for row in rows
+            ],
+            available_count=sum(
+                row.units_count
+                for row in rows
+                if not row.is_reserved and row.stock_status is not DBStockStatus.NOT_FOUND
+            ),
         )
 
     async def update_sku_actual_price(self, sku_id: uuid.UUID) -> None:
-        async with self.db_session_maker() as session:
-            sku: Sku = await self.sku_provider(session).find_one(id=sku_id)
-            # TODO: Переделать. Есть смысл делать только после перехода на Many To Many связь
-            # max_sku_discount: SkuDiscount | None = None
-            # for sku_discount in sku.discounts:
-            #     if max_sku_discount is None or sku_discount.percentage > max_sku_discount.percentage:
-            #         max_sku_discount = sku_discount
-            # Так как в данный момент на каждый sku только по одной скидке, то можем сделать только так
-            max_sku_discount = sku.discount
-            # Если скидка присутствует, то применяем её
-            if max_sku_discount:
-                # Применяем максимальную скидку
-                coefficient = (Decimal("100.00") - Decimal(max_sku_discount.percentage)) / Decimal("100.00")
-                sku.actual_price = sku.base_price * coefficient
-                await session.commit()
+        await self.update_skus_actual_prices(sku_ids=[sku_id])
 
     async def update_skus_actual_prices(self, sku_ids: list[uuid.UUID]) -> None:
-        for sku_id in sku_ids:
-            await self.update_sku_actual_price(sku_id=sku_id)
+        """Пересчет актуальных цен SKU согласно активным скидкам одной транзакцией"""
+        async with self.db_session_maker() as session:
+            repriced: list[Row] = await self.sku_provider(session).recalculate_actual_prices(ids=sku_ids)
+            await self.outbox_provider(session).add_many(sku_price_changes(repriced))
+            await session.commit()
+        await self.cache.invalidate(sku_cache_keys(row.id for row in repriced))
 
     async def markdown_item(self, request_data: MarkdownItemRequest) -> None:
         """
@@ -123,7 +256,7 @@ class SkuService:
         async with self.db_session_maker() as session:
             # TODO: Продумать случай повторного признания товара дефектным.
             #  Пока предположим у товара может быть несколько дефектов
-            item: Item = await self.item_provider(session).find_one(id=request_data.id)
+            item: Item = await self.item_provider(session).find_one(id=request_data.id, load_profile="markdown")
 
             item_discount: ItemDiscount = ItemDiscount(
                 type=ItemDiscountType.BY_DEFECT,
@@ -152,28 +285,53 @@ class SkuService:
                 picking_task: Task = picking_tasks[0]
                 # Нет смысла добавлять задачу в случае конечных статусов заказа
                 if picking_task.posting.status is PostingStatus.IN_ITEM_PICK:
-                    picking_task.status = TaskStatus.CANCELED
-
-                    new_picking_task: Task = Task(
-                        status=TaskStatus.IN_WORK,
-                        type=TaskType.PICKING,
-                        posting=picking_task.posting,
-                        item=item
+                    task_provider = self.task_provider(session)
+                    # Задача могла быть завершена параллельно, тогда новая не нужна
+                    canceled: Sequence[Row] = await task_provider.finish_in_work(
+                        ids=[picking_task.id],
+                        status=TaskStatus.CANCELED,
                     )
-                    session.add(new_picking_task)
+                    if canceled:
+                        [new_picking_task_id] = await task_provider.add_many([{
+                            "status": TaskStatus.IN_WORK,
+                            "type": TaskType.PICKING,
+                            "posting_id": picking_task.posting_id,
+                            "item_id": item.id,
+                        }])
+                        await publish_task_status_changes(
+                            self.domain_event_provider(session),
+                            self.job_provider(session),
+                            [
+                                # Новая задача передается раньше отмененной, чтобы заказ не считался собранным
+                                TaskStatusChange(
+                                    task_id=new_picking_task_id,
+                                    type=TaskType.PICKING,
+                                    posting_id=picking_task.posting_id,
+                                    item_id=item.id,
+                                    before=None,
+                                    after=TaskStatus.IN_WORK,
+                                ),
+                                *finished_task_changes(canceled, status=TaskStatus.CANCELED),
+                            ],
+                        )
 
             await session.commit()
+        await self.cache.invalidate(item_cache_keys(item_ids=[item.id], sku_ids=[item.sku_id]))
 
     async def set_sku_price(self, request_data: SetSkuPriceRequest) -> None:
         async with self.db_session_maker() as session:
-            # TODO: Сделать пересчет актуальной цены согласно дискаунтам
-            await self.sku_provider(session).edit_one(
+            sku_provider = self.sku_provider(session)
+            await sku_provider.edit_one(
                 id=request_data.sku_id,
                 data={
                     "base_price": request_data.base_price,
                 }
             )
+            # Актуальная цена пересчитывается согласно скидкам в той же транзакции
+            repriced: list[Row] = await sku_provider.recalculate_actual_prices(ids=[request_data.sku_id])
+            await self.outbox_provider(session).add_many(sku_price_changes(repriced))
             await session.commit()
+        await self.cache.invalidate(sku_cache_keys([request_data.sku_id]))
 
     async def toggle_is_hidden(self, request_data: ToggleIsHiddenRequest) -> None:
         """Скрыть или отобразить товар для покупки"""
@@ -187,10 +345,102 @@ class SkuService:
                 }
             )
             await session.commit()
+        await self.cache.invalidate(sku_cache_keys([request_data.sku_id]))
 
     async def move_to_not_found(self, request_data: MoveToNotFoundRequest) -> None:
+        """Перемещение товара на сток NotFound
+
+        Если товар подбирается в собираемый заказ, задача на подбор отменяется
+        и создается задача на подбор аналогичного товара, если незарезервированный товар того же SKU есть.
+        """
         async with self.db_session_maker() as session:
-            item = await self.item_provider(session).find_one(id=request_data.id)
-            item.stock.status = DBStockStatus.NOT_FOUND
-            session.add(item)
+            item: Item = await self.item_provider(session).find_one(id=request_data.id, load_profile="not_found")
+            stock_counter_deltas: Counter[StockCounterKey] = Counter()
+
+            picking_tasks: list[Task] = [
+                task
+                for task in item.tasks
+                if task.type is TaskType.PICKING
+                and task.status is TaskStatus.IN_WORK
+                and task.posting is not None
+                and task.posting.status is PostingStatus.IN_ITEM_PICK
+            ]
+            # Заказы блокируются до задач: замена не подбирается в заказ, отмененный после чтения товара
+            posting_ids: set[uuid.UUID] = await self.posting_provider(session).lock_in_item_pick(
+                ids=[task.posting_id for task in picking_tasks],
+            )
+            picking_task_ids: list[uuid.UUID] = [task.id for task in picking_tasks if task.posting_id in posting_ids]
+            replacement_items: Sequence[Row] = []
+            if picking_task_ids:
+                task_provider = self.task_provider(session)
+                canceled: Sequence[Row] = await task_provider.finish_in_work(
+                    ids=picking_task_ids,
+                    status=TaskStatus.CANCELED,
+                )
+                if canceled:
+                    replacement_items = await self.stock_provider(session).reserve_replacements(
+                        count_by_sku_id={item.sku_id: len(canceled)},
+                    )
+                    for replacement_item in replacement_items:
+                        count_stock_change(
+                            stock_counter_deltas,
+                            sku_id=replacement_item.sku_id,
+                            before=(replacement_item.status, False),
+                            after=(replacement_item.status, True),
+                        )
+                    # Замен может быть меньше, чем отмененных задач: заказ собирается без ненайденного товара
+                    replacements = list(zip(canceled, replacement_items, strict=False))
+                    replacement_task_ids: list[uuid.UUID] = await task_provider.add_many([
+                        {
+                            "status": TaskStatus.IN_WORK,
+                            "type": TaskType.PICKING,
+                            "posting_id": canceled_task.posting_id,
+                            "item_id": replacement_item.item_id,
+                        }
+                        for canceled_task, replacement_item in replacements
+                    ])
+                    await publish_task_status_changes(
+                        self.domain_event_provider(session),
+                        self.job_provider(session),
+                        [
+                            # Созданные задачи передаются раньше отмененных, чтобы заказ не считался собранным
+                            *(
+                                TaskStatusChange(
+                                    task_id=task_id,
+                                    type=TaskType.PICKING,
+                                    posting_id=canceled_task.posting_id,
+                                    item_id=replacement_item.item_id,
+                                    before=None,
+                                    after=TaskStatus.IN_WORK,
+                                )
+                                for task_id, (canceled_task, replacement_item) in zip(
+                                    replacement_task_ids, replacements, strict=True,
+                                )
+                            ),
+                            *finished_task_changes(canceled, status=TaskStatus.CANCELED),
+                        ],
+                    )
+                    await self.outbox_provider(session).add_many(chain.from_iterable(
+                        item_reservation_changes(
+                            [(replacement_item.item_id, replacement_item.sku_id)],
+                            posting_id=canceled_task.posting_id,
+                            is_reserved=True,
+                        )
+                        for canceled_task, replacement_item in replacements
+                    ))
+            # Сток меняется после задач, в том же порядке блокировок, что и при отмене заказа: заказ, задачи, стоки
+            moved: Row | None = await self.stock_provider(session).move_to_not_found(item_id=item.id)
+            if moved is not None:
+                count_stock_change(
+                    stock_counter_deltas,
+                    sku_id=item.sku_id,
+                    before=(moved.status, moved.is_reserved),
+                    after=(DBStockStatus.NOT_FOUND, moved.is_reserved),
+                )
+            # Счетчики стоков SKU меняются в той же транзакции, что и сток
+            await self.sku_stock_counter_provider(session).apply_deltas(stock_counter_deltas)
             await session.commit()
+        await self.cache.invalidate(item_cache_keys(
+            item_ids=[item.id, *(replacement_item.item_id for replacement_item in replacement_items)],
+            sku_ids=[item.sku_id],
+        ))
@@ -0,0 +1,90 @@
+import logging
+import uuid
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TypeAlias
+
+from app.config import config
+from app.metrics import instrument_service, sku_stock_counter_drift
+from models import JobName, StockStatus
+from providers.job import JobProvider
+from providers.sku import SkuProvider
+from providers.sku_stock_counter import SkuStockCounterProvider, StockCounterKey
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Состояние стока товара: (статус стока, признак резерва)
+StockState: TypeAlias = tuple[StockStatus, bool]
+
+
+def count_stock_change(
+    deltas: Counter[StockCounterKey],
+    sku_id: uuid.UUID,
+    before: StockState | None,
+    after: StockState | None,
+) -> None:
+    """Учесть изменение состояния стока товара в изменениях счетчиков
+
+    None - стока до или после изменения нет (например товар только что принят).
+    """
+    if before == after:
+        return
+    if before is not None:
+        deltas[(sku_id, *before)] -= 1
+    if after is not None:
+        deltas[(sku_id, *after)] += 1
+
+
+@instrument_service
+@dataclass
+class StockCounterService:
+    db_session_maker: Callable[[], AsyncSession]
+    sku_stock_counter_provider: Callable[[AsyncSession], SkuStockCounterProvider] = SkuStockCounterProvider
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    sku_provider: Callable[[AsyncSession], SkuProvider] = SkuProvider
+    # Количество SKU, сверяемых одной короткой транзакцией
+    reconcile_batch_size: int = 1000
+
+    async def request_reconciliation(self) -> None:
+        """Поставить сверку счетчиков в очередь фоновых задач, повторные запросы схлопываются в одну задачу"""
+        async with self.db_session_maker() as session:
+            await self.job_provider(session).enqueue(
+                name=JobName.RECONCILE_SKU_STOCK_COUNTERS,
+                payload={},
+                max_attempts=config.JOBS_MAX_ATTEMPTS,
+                idempotency_key=JobName.RECONCILE_SKU_STOCK_COUNTERS,
+            )
+            await session.commit()
+
+    async def reconcile(self) -> list[Row]:
+        """Пересчитать счетчики стоков SKU с нуля и сообщить о расхождениях
+
+        SKU сверяются пачками, каждая пачка в своей транзакции блокирует только свои счетчики,
+        поэтому изменения стоков остальных SKU сверку не ждут.
+        Расхождения исправляются, пишутся в лог и отражаются в метрике sku_stock_counter_drift.
+        """
+        drift: list[Row] = []
+        after_id: uuid.UUID | None = None
+        while True:
+            async with self.db_session_maker() as session:
+                sku_ids = await self.sku_provider(session).find_ids(after_id=after_id, limit=self.reconcile_batch_size)
+                if sku_ids:
+                    drift.extend(await self.sku_stock_counter_provider(session).reconcile(sku_ids))
+                    await session.commit()
+            if len(sku_ids) < self.reconcile_batch_size:
+                break
+            after_id = sku_ids[-1]
+        for row in drift:
+            logger.warning(
+                "Расхождение счетчика стоков SKU %s (%s, резерв: %s): %s, по стокам %s",
+                row.sku_id,
+                row.stock_status,
+                row.is_reserved,
+                row.stored_count,
+                row.actual_count,
+            )
+        sku_stock_counter_drift.set(len(drift))
+        return drift
@@ -1,43 +1,161 @@
 import uuid
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
 
-from models import Task, TaskStatus
+from app.config import config
+from app.metrics import instrument_service
+from models import JobName, Task, TaskStatus, TaskType
+from providers.domain_event import DomainEventProvider
+from providers.job import JobProvider
+from providers.notification import NotificationProvider, acceptance_notification_key
 from providers.task import TaskProvider
-from schemas.task import FinishTaskRequest, GetTaskInfoResponse, TaskTarget
+from schemas.task import (
+    FinishTaskRejection,
+    FinishTaskRequest,
+    FinishTaskResult,
+    FinishTasksRequest,
+    FinishTasksResponse,
+    GetTaskInfoBatchResponse,
+    GetTaskInfoResponse,
+    TaskTarget,
+)
+from services.domain_event import finished_task_changes, publish_task_status_changes
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+def task_to_task_info(task: Task) -> GetTaskInfoResponse:
+    return GetTaskInfoResponse(
+        id=task.id,
+        status=task.status,
+        created_at=task.created_at,
+        type=task.type,
+        task_target=TaskTarget(
+            id=task.item.stock.id,
+            # TODO: Не самое лучшее отображение статусов БД в статусы API
+            stock=task.item.stock.status.value.lower(),
+        ),
+        posting_id=task.posting_id,
+    )
+
+
+@instrument_service
 @dataclass
 class TaskService:
     db_session_maker: Callable[[], AsyncSession]
     task_provider: Callable[[AsyncSession], TaskProvider] = TaskProvider
+    job_provider: Callable[[AsyncSession], JobProvider] = JobProvider
+    domain_event_provider: Callable[[AsyncSession], DomainEventProvider] = DomainEventProvider
+    notification_provider: Callable[[AsyncSession], NotificationProvider] = NotificationProvider
 
     async def get_task_info(self, task_id: uuid.UUID) -> GetTaskInfoResponse:
         """Получение деталей задачи по ID"""
         async with self.db_session_maker() as session:
-            task: Task = await self.task_provider(session).find_one(id=task_id)
+            # Только нужные ответу колонки, без построения графа ORM-объектов
+            row: Row = await self.task_provider(session).find_info(id=task_id)
         return GetTaskInfoResponse(
-            id=task.id,
-            status=task.status,
-            created_at=task.created_at,
-            type=task.type,
+            id=row.id,
+            status=row.status,
+            created_at=row.created_at,
+            type=row.type,
             task_target=TaskTarget(
-                id=task.item.stock.id,
+                id=row.stock_id,
                 # TODO: Не самое лучшее отображение статусов БД в статусы API
-                stock=task.item.stock.status.value.lower(),
+                stock=row.stock_status.value.lower(),
             ),
-            posting_id=task.posting_id,
+            posting_id=row.posting_id,
+        )
+
+    async def get_task_info_batch(self, ids: list[uuid.UUID]) -> GetTaskInfoBatchResponse:
+        """Получение деталей задач по списку ID одним запросом"""
+        async with self.db_session_maker() as session:
+            tasks: dict[uuid.UUID, Task] = await self.task_provider(session).find_many(ids=ids, load_profile="target")
+        return GetTaskInfoBatchResponse.build(
+            ids=ids,
+            found={task_id: task_to_task_info(task) for task_id, task in tasks.items()},
         )
 
     async def finish_task(self, request_data: FinishTaskRequest) -> None:
         """Завершение задачи"""
+        status = TaskStatus(request_data.status)
         async with self.db_session_maker() as session:
-            task: Task = await self.task_provider(session).find_one(id=request_data.id)
-            # TODO: Подумать что делать с отображением статусов API в БД
-            # Предусматриваем что нельзя перевести задачу из одного закрытого в статус в другой,
-            # если это не тот же статус
-            if task.status in [TaskStatus.COMPLETED, TaskStatus.CANCELED] and task.status != request_data.status:
-                raise Exception(f"Вы не можете завершить задание со статусом {task.status}")
-            task.status = request_data.status
+            task_provider = self.task_provider(session)
+            # Статус меняется условным UPDATE, поэтому параллельные завершения одной задачи
+            # меняют статус и записывают событие только один раз
+            finished: Sequence[Row] = await task_provider.finish_in_work(ids=[request_data.id], status=status)
+            if not finished:
+                task: Task = await task_provider.find_one(id=request_data.id)
+                # TODO: Подумать что делать с отображением статусов API в БД
+                # Предусматриваем что нельзя перевести задачу из одного закрытого в статус в другой,
+                # если это не тот же статус
+                if task.status is not status:
+                    raise Exception(f"Вы не можете завершить задание со статусом {task.status}")
+                return
+            await publish_task_status_changes(
+                self.domain_event_provider(session),
+                self.job_provider(session),
+                finished_task_changes(finished, status=status),
+            )
+            # Задачи заказов попадают к подписчикам через обработчик событий, приемок - сразу
+            await self.notification_provider(session).notify(
+                acceptance_notification_key(row.acceptance_id) for row in finished if row.acceptance_id
+            )
             await session.commit()
+
+    async def finish_tasks(self, request_data: FinishTasksRequest) -> FinishTasksResponse:
+        """Пакетное завершение задач
+
+        Правила те же, что и в finish_task: закрытую задачу нельзя перевести в другой закрытый статус,
+        повторное завершение с тем же статусом не считается ошибкой. Статус меняется одним UPDATE,
+        по каждой задаче возвращается результат или причина отказа.
+        Обработка приемок ставится в очередь один раз на затронутую приемку,
+        изменения задач заказов записываются доменными событиями для завершения сборки.
+        """
+        status = TaskStatus(request_data.status)
+        async with self.db_session_maker() as session:
+            task_provider = self.task_provider(session)
+            finished: Sequence[Row] = await task_provider.finish_in_work(ids=request_data.ids, status=status)
+            finished_ids: set[uuid.UUID] = {row.id for row in finished}
+            # Статусы остальных задач нужны только для причины отказа
+            statuses: dict[uuid.UUID, TaskStatus] = await task_provider.find_statuses(
+                ids=[task_id for task_id in request_data.ids if task_id not in finished_ids],
+            )
+            acceptance_ids: set[uuid.UUID] = {
+                row.acceptance_id for row in finished if row.type is TaskType.PLACING and row.acceptance_id
+            }
+            # Ключи идемпотентности те же, что и при создании приемки:
+            # если обработка еще ожидает выполнения, повторная не ставится
+            job_provider = self.job_provider(session)
+            await job_provider.enqueue_many(
+                name=JobName.PROCESS_ACCEPTANCE,
+                payloads={
+                    f"{JobName.PROCESS_ACCEPTANCE}:{acceptance_id}": {"acceptance_id": str(acceptance_id)}
+                    for acceptance_id in sorted(acceptance_ids)
+                },
+                max_attempts=config.JOBS_MAX_ATTEMPTS,
+            )
+            # Сборку заказов завершает обработчик событий, одной пачкой на все затронутые заказы
+            await publish_task_status_changes(
+                self.domain_event_provider(session),
+                job_provider,
+                finished_task_changes(finished, status=status),
+            )
+            await self.notification_provider(session).notify(
+                acceptance_notification_key(acceptance_id) for acceptance_id in acceptance_ids
+            )
+            await session.commit()
+
+        results: list[FinishTaskResult] = []
+        for task_id in request_data.ids:
+            if task_id in finished_ids or statuses.get(task_id) is status:
+                results.append(FinishTaskResult(id=task_id, finished=True, status=status))
+            elif task_id not in statuses:
+                results.append(FinishTaskResult(id=task_id, finished=False, rejection=FinishTaskRejection.NOT_FOUND))
+            else:
+                results.append(FinishTaskResult(
+                    id=task_id,
+                    finished=False,
+                    rejection=FinishTaskRejection.ALREADY_FINISHED,
+                    status=statuses[task_id],
+                ))
+        return FinishTasksResponse(results=results)
@@ -1,9 +1,30 @@
 import uuid
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+from typing import Any, TypeAlias
 
-from sqlalchemy import insert, select, update
+from sqlalchemy import (
+    BindParameter,
+    ColumnElement,
+    any_,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import raiseload
+from sqlalchemy.sql.base import ExecutableOption
+
+# Профиль загрузки - набор опций загрузки связей (selectinload/joinedload/raiseload),
+# описывающий граф объектов, который нужен конкретному методу сервиса
+LoadProfile: TypeAlias = Sequence[ExecutableOption]
+
+
+def array_literal(values: Iterable[Any], item_type: Any) -> BindParameter:
+    """Значения одним параметром-массивом: текст запроса не зависит от их количества"""
+    return literal(list(values), ARRAY(item_type))
 
 
 class AbstractProvider(ABC):
@@ -19,28 +40,92 @@ class AbstractProvider(ABC):
 # TODO: Переписать так, чтобы не было выброса исключений?
 class SQLAlchemyProvider(AbstractProvider):
     model = None
+    # Именованные профили загрузки связей, задаются в наследниках
+    load_profiles: dict[str, LoadProfile] = {}
+    # Профиль, используемый если при вызове профиль не указан
+    default_load_profile: str | None = None
+    # Все связи, не указанные в профиле, при обращении к ним выбрасывают исключение,
+    # вместо незаметной ленивой загрузки (которая к тому же не работает в асинхронной сессии)
+    fallback_load_options: LoadProfile = (raiseload('*', sql_only=True),)
 
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    def get_load_options(self, load_profile: str | None = None) -> list[ExecutableOption]:
+        load_profile = load_profile or self.default_load_profile
+        options: list[ExecutableOption] = []
+        if load_profile is not None:
+            try:
+                options.extend(self.load_profiles[load_profile])
+            except KeyError:
+                raise ValueError(f"Неизвестный профиль загрузки {load_profile!r} для {self.__class__.__name__}")
+        options.extend(self.fallback_load_options)
+        return options
+
+    def id_in(self, ids: Iterable[Any], column: ColumnElement | None = None) -> ColumnElement[bool]:
+        # column = ANY(:ids) - один параметр-массив с типом колонки, по умолчанию колонка ID модели провайдера
+        column = self.model.id if column is None else column
+        return column == any_(array_literal(ids, column.type))
+
     async def add_one(self, data: dict) -> uuid.UUID:
         stmt = insert(self.model).values(**data).returning(self.model.id)
         res = await self.session.execute(stmt)
         return res.scalar_one()
 
+    async def add_many(self, data: list[dict]) -> list[uuid.UUID]:
+        if not data:
+            return []
+        # ID генерируются на клиенте, поэтому RETURNING не нужен
+        for row in data:
+            row.setdefault("id", uuid.uuid4())
+        # Одна команда INSERT ... VALUES на пачку строк (insertmanyvalues) вместо отдельного запроса на каждую строку
+        await self.session.execute(insert(self.model), data)
+        return [row["id"] for row in data]
+
     async def edit_one(self, id: uuid.UUID, data: dict) -> uuid.UUID:
         stmt = update(self.model).values(**data).filter_by(id=id).returning(self.model.id)
         res = await self.session.execute(stmt)
         return res.scalar_one()
 
+    async def edit_many(self, data: dict, **filter_by) -> list[uuid.UUID]:
+        stmt = update(self.model).values(**data).filter_by(**filter_by).returning(self.model.id)
+        res = await self.session.execute(stmt)
+        return list(res.scalars().all())
+
     async def find_all(self):
         stmt = select(self.model)
         res = await self.session.execute(stmt)
         res = [row[0].to_read_model() for row in res.all()]
         return res
 
-    async def find_one(self, **filter_by):
-        stmt = select(self.model).distinct().filter_by(**filter_by).options(joinedload('*'))
+    async def find_many(self, ids: Iterable[uuid.UUID], load_profile: str | None = None) -> dict[uuid.UUID, Any]:
+        """Найти объекты по списку ID одним запросом
+
+        Возвращает объекты по ID, отсутствующих в БД ID в результате нет
+        """
+        # Повторяющиеся ID передаем в запрос один раз
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        stmt = select(self.model).filter(self.id_in(ids)).options(*self.get_load_options(load_profile))
+        res = await self.session.execute(stmt)
+        return {obj.id: obj for obj in res.unique().scalars().all()}
+
+    async def find_one(
+        self,
+        load_profile: str | None = None,
+        populate_existing: bool = False,
+        with_for_update: bool = False,
+        **filter_by,
+    ):
+        stmt = select(self.model).filter_by(**filter_by).options(*self.get_load_options(load_profile))
+        if with_for_update:
+            # Блокируется только строка модели, строки связей профиля не блокируются
+            stmt = stmt.with_for_update(of=self.model)
+        if populate_existing:
+            # Перезаписываем состояние уже загруженных в сессию объектов, включая связи из профиля
+            stmt = stmt.execution_options(populate_existing=True)
         res = await self.session.execute(stmt)
+        # unique() нужен для профилей с joinedload коллекций
         res = res.unique().scalar_one()
         return res
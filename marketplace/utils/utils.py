@@ -1,3 +1,10 @@
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
 def revert_dict(d: dict) -> dict:
     # https://stackoverflow.com/questions/483666/reverse-invert-a-dictionary-mapping
     return {v: k for k, v in d.items()}
@@ -5,3 +12,10 @@ def revert_dict(d: dict) -> dict:
 
 def remove_empty_keys(d: dict) -> dict:
     return {k: v for k, v in d.items() if v is not None}
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[Sequence[T]]:
+    # Аналог itertools.batched
+    iterator = iter(iterable)
+    while chunk := tuple(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,71 @@
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from app.database import async_session_maker
+from models import Acceptance, Item, Sku, Stock, Task, TaskStatus, TaskType
+from schemas.acceptance import (
+    AcceptanceInfoSkuByStockStatus,
+    CreateAcceptanceRequest,
+    StockStatusSchema,
+)
+from services.acceptance import AcceptanceService, api_to_db_stock_status_map
+from sqlalchemy.ext.asyncio import AsyncSession
+
+pytestmark = pytest.mark.benchmark
+
+SKUS_COUNT = 10
+ITEMS_PER_SKU = 999
+
+
+async def legacy_create_acceptance(request_data: CreateAcceptanceRequest) -> None:
+    """Прежняя реализация: ORM-объекты через unit of work и коммит на каждую строку приемки"""
+    async with async_session_maker() as session:
+        acceptance = Acceptance()
+        session.add(acceptance)
+        await session.flush()
+        for sku_by_stock_type in request_data.items_to_accept:
+            sku = await session.get(Sku, sku_by_stock_type.sku_id)
+            if not sku:
+                sku = Sku(id=sku_by_stock_type.sku_id, actual_price=Decimal("0.00"), base_price=Decimal("0.00"))
+                session.add(sku)
+                await session.flush()
+            items = [
+                Item(sku=sku, stock=Stock(status=api_to_db_stock_status_map.get(sku_by_stock_type.stock)), acceptance=acceptance)
+                for _ in range(sku_by_stock_type.count)
+            ]
+            session.add_all([
+                Task(status=TaskStatus.IN_WORK, type=TaskType.PLACING, acceptance=acceptance, item=item)
+                for item in items
+            ])
+            await session.commit()
+
+
+def build_request() -> CreateAcceptanceRequest:
+    return CreateAcceptanceRequest(
+        items_to_accept=[
+            AcceptanceInfoSkuByStockStatus(sku_id=uuid.uuid4(), stock=StockStatusSchema.VALID, count=ITEMS_PER_SKU)
+            for _ in range(SKUS_COUNT)
+        ],
+    )
+
+
+async def test_create_acceptance_rows_per_second(db: AsyncSession):
+    # Товар, сток и задача на каждую единицу товара
+    rows_count = SKUS_COUNT * ITEMS_PER_SKU * 3
+
+    started_at = time.perf_counter()
+    await legacy_create_acceptance(build_request())
+    legacy_elapsed = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    await AcceptanceService(db_session_maker=async_session_maker).create_acceptance(build_request())
+    bulk_elapsed = time.perf_counter() - started_at
+
+    print(
+        f"\ncreate_acceptance ({rows_count} rows): "
+        f"legacy {rows_count / legacy_elapsed:.0f} rows/s, "
+        f"bulk {rows_count / bulk_elapsed:.0f} rows/s"
+    )
+    assert bulk_elapsed < legacy_elapsed
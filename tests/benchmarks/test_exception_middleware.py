@@ -0,0 +1,72 @@
+import datetime
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from app.exception_handlers import ExceptionHandlerMiddleware, app_error_handler
+from app.exceptions import AppError
+from app.fastapi import create_app
+from fastapi import FastAPI
+from httpx import AsyncClient
+from schemas.sku import GetSkuInfoResponse
+from services.sku import SkuService
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+pytestmark = pytest.mark.benchmark
+
+REQUESTS_COUNT = 2000
+
+
+async def legacy_exception_handler_middleware(request, call_next):
+    """Прежняя реализация через BaseHTTPMiddleware"""
+    try:
+        return await call_next(request)
+    except Exception as exc:
+        if not isinstance(exc, AppError):
+            original_exc = exc
+            exc = AppError(log=False)
+            exc.__cause__ = original_exc
+        return await app_error_handler(request, exc)
+
+
+def create_legacy_app() -> FastAPI:
+    app = create_app()
+    app.user_middleware = [
+        Middleware(BaseHTTPMiddleware, dispatch=legacy_exception_handler_middleware)
+        if middleware.cls is ExceptionHandlerMiddleware else middleware
+        for middleware in app.user_middleware
+    ]
+    return app
+
+
+async def requests_per_second(app: FastAPI) -> float:
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        started_at = time.perf_counter()
+        for _ in range(REQUESTS_COUNT):
+            response = await client.get("/getSkuInfo", params={"id": str(uuid.uuid4())})
+            assert response.status_code == 200, response.text
+        return REQUESTS_COUNT / (time.perf_counter() - started_at)
+
+
+async def test_get_sku_info_requests_per_second(mocker):
+    # Сервис подменяется, чтобы замер отражал накладные расходы middleware, а не время запросов к БД
+    mocker.patch.object(
+        SkuService,
+        "get_sku_info",
+        return_value=GetSkuInfoResponse(
+            id=uuid.uuid4(),
+            created_at=datetime.datetime.now(tz=datetime.UTC),
+            actual_price=Decimal("100.00"),
+            base_price=Decimal("100.00"),
+            count=1,
+            is_hidden=False,
+        ),
+    )
+
+    legacy_rps = await requests_per_second(create_legacy_app())
+    asgi_rps = await requests_per_second(create_app())
+
+    print(f"\n/getSkuInfo: BaseHTTPMiddleware {legacy_rps:.0f} rps, ASGI middleware {asgi_rps:.0f} rps")
+    assert asgi_rps > legacy_rps
@@ -0,0 +1,176 @@
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Awaitable, Callable
+
+import pytest
+from app.cache import Cache, InMemoryCacheBackend
+from app.database import async_session_maker
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from factories.models.task import TaskFactoryBase
+from models import Acceptance, Item, Task, TaskStatus, TaskType
+from providers.item import ItemProvider
+from providers.sku import SkuProvider
+from providers.task import TaskProvider
+from schemas.acceptance import (
+    AcceptanceInfoResponseSkuByStockStatus,
+    AcceptanceInfoTask,
+    GetAcceptanceInfoResponse,
+)
+from services.acceptance import (
+    AcceptanceService,
+    db_to_api_stock_status_map,
+    task_status_model_to_api_map,
+)
+from services.sku import SkuService, item_to_item_info, sku_to_sku_info
+from services.task import TaskService, task_to_task_info
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+pytestmark = pytest.mark.benchmark
+
+ACCEPTANCE_ITEMS_COUNT = 500
+REPEAT = 50
+
+
+async def legacy_get_item_info(item_id):
+    async with async_session_maker() as session:
+        item = await ItemProvider(session).find_one(id=item_id, load_profile="stock")
+    return item_to_item_info(item)
+
+
+async def legacy_get_sku_info(sku_id):
+    async with async_session_maker() as session:
+        sku = await SkuProvider(session).find_one(id=sku_id)
+    return sku_to_sku_info(sku)
+
+
+async def legacy_get_task_info(task_id):
+    async with async_session_maker() as session:
+        task = await TaskProvider(session).find_one(id=task_id, load_profile="target")
+    return task_to_task_info(task)
+
+
+async def legacy_get_acceptance_info(acceptance_id):
+    """Прежняя реализация: граф приемка -> задачи -> товары -> стоки"""
+    async with async_session_maker() as session:
+        stmt = (
+            select(Acceptance)
+            .filter_by(id=acceptance_id)
+            .options(selectinload(Acceptance.tasks).joinedload(Task.item).joinedload(Item.stock))
+        )
+        acceptance: Acceptance = (await session.execute(stmt)).scalar_one()
+    tasks = [task for task in acceptance.tasks if task.type is TaskType.PLACING]
+    accepted = Counter(
+        (task.item.sku_id, task.item.stock.status)
+        for task in tasks
+        if task.status is TaskStatus.COMPLETED
+    )
+    return GetAcceptanceInfoResponse(
+        id=acceptance.id,
+        created_at=acceptance.created_at,
+        accepted=[
+            AcceptanceInfoResponseSkuByStockStatus(
+                sku_id=sku_id,
+                stock=db_to_api_stock_status_map.get(stock_status),
+                count=count,
+            )
+            for (sku_id, stock_status), count in accepted.items()
+        ],
+        task_ids=[AcceptanceInfoTask(id=task.id, status=task_status_model_to_api_map.get(task.status)) for task in tasks],
+    )
+
+
+def normalized(response) -> dict:
+    """Ответ без учета порядка элементов списков"""
+    data = response.model_dump()
+    for value in data.values():
+        if isinstance(value, list):
+            value.sort(key=repr)
+    return data
+
+
+async def measure(call: Callable[[], Awaitable]) -> tuple[float, int]:
+    """Среднее время вызова в мс и пиковый объем памяти, выделенной за вызов, в КБ"""
+    # Прогрев: кэш скомпилированных запросов и соединения пула
+    await call()
+    started_at = time.perf_counter()
+    for _ in range(REPEAT):
+        await call()
+    latency_ms = (time.perf_counter() - started_at) / REPEAT * 1000
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return latency_ms, (peak - current) // 1024
+
+
+@pytest.fixture
+async def acceptance(db: AsyncSession) -> Acceptance:
+    acceptance = await AcceptanceFactoryBase.create()
+    sku = SkuFactoryBase.build()
+    for i in range(ACCEPTANCE_ITEMS_COUNT):
+        await ItemFactoryBase.create(
+            sku=sku,
+            acceptance=acceptance,
+            stock=StockFactoryBase.build(),
+            tasks=[TaskFactoryBase.build(
+                acceptance=acceptance,
+                type=TaskType.PLACING,
+                status=TaskStatus.COMPLETED if i % 2 else TaskStatus.IN_WORK,
+            )],
+        )
+    return acceptance
+
+
+async def test_read_paths_orm_vs_projection(db: AsyncSession, acceptance: Acceptance):
+    item: Item = (await db.execute(select(Item).filter_by(acceptance_id=acceptance.id).limit(1))).scalar_one()
+    task: Task = (await db.execute(select(Task).filter_by(item_id=item.id))).scalar_one()
+    no_cache = Cache(backend=InMemoryCacheBackend(max_size=1), ttl=0, enabled=False)
+    sku_service = SkuService(db_session_maker=async_session_maker, cache=no_cache)
+    task_service = TaskService(db_session_maker=async_session_maker)
+    acceptance_service = AcceptanceService(db_session_maker=async_session_maker)
+
+    cases = {
+        "get_item_info": (
+            lambda: legacy_get_item_info(item.id),
+            lambda: sku_service.get_item_info(item_id=item.id),
+        ),
+        "get_sku_info": (
+            lambda: legacy_get_sku_info(item.sku_id),
+            lambda: sku_service.get_sku_info(sku_id=item.sku_id),
+        ),
+        "get_task_info": (
+            lambda: legacy_get_task_info(task.id),
+            lambda: task_service.get_task_info(task_id=task.id),
+        ),
+        "get_acceptance_info": (
+            lambda: legacy_get_acceptance_info(acceptance.id),
+            lambda: acceptance_service.get_acceptance_info(id=acceptance.id),
+        ),
+    }
+    results = {}
+    print()
+    for name, (legacy, projected) in cases.items():
+        # Оба пути должны отдавать одинаковый ответ
+        assert normalized(await legacy()) == normalized(await projected())
+        legacy_latency, legacy_memory = await measure(legacy)
+        projected_latency, projected_memory = await measure(projected)
+        results[name] = (legacy_memory, projected_memory)
+        print(
+            f"{name}: ORM {legacy_latency:.2f} ms / {legacy_memory} KB, "
+            f"projection {projected_latency:.2f} ms / {projected_memory} KB"
+        )
+
+    # На большом графе объектов разница в выделенной памяти гарантированно заметна
+    legacy_memory, projected_memory = results["get_acceptance_info"]
+    assert projected_memory < legacy_memory
@@ -1,15 +1,33 @@
 import asyncio
 import os
+from collections.abc import AsyncIterator, Callable
+from contextlib import AbstractContextManager, asynccontextmanager
 
 import pytest
+from app.config import config
+from app.database import Base, async_session_maker
 from app.fastapi import create_app
+from app.metrics import instrument_engine
+from app.query_budget import QueryRecorder, assert_max_queries, instrument_query_budget
 from asgi_lifespan import LifespanManager
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_scoped_session,
+)
 from sqlalchemy.orm import sessionmaker
 
-# from marketplace.app.config import config
-from marketplace.app.database import Base, async_session_maker, engine
+from tests.database import (
+    DBTestSettings,
+    create_worker_database,
+    database_engine,
+    drop_database,
+    truncate_tables,
+)
+
+db_test_settings = DBTestSettings()
 
 
 def scopefunc():
@@ -47,8 +65,30 @@ def event_loop():
 
 
 @pytest.fixture(scope='session')
-async def app():
-    app = create_app()
+async def db_engine() -> AsyncIterator[AsyncEngine]:
+    """Движок БД текущего процесса тестов: копия шаблонной БД со схемой, создается один раз на сессию
+
+    Фабрики и сервисы работают через async_session_maker и TestDBSession, которые переключаются на эту БД.
+    """
+    name = await create_worker_database(config, db_test_settings, Base.metadata)
+    engine = database_engine(config, name)
+    instrument_engine(engine)
+    instrument_query_budget(engine)
+    bind_session_makers(engine)
+    yield engine
+    await engine.dispose()
+    await drop_database(config, name)
+
+
+def bind_session_makers(bind: AsyncEngine | AsyncConnection, join_transaction_mode: str = "conservative_savepoint"):
+    async_session_maker.configure(bind=bind, join_transaction_mode=join_transaction_mode)
+    TestDBSession.configure(bind=bind, join_transaction_mode=join_transaction_mode)
+
+
+@pytest.fixture(scope='session')
+async def app(db_engine: AsyncEngine):
+    # Приложение работает с движком тестовой БД вместо движка из настроек
+    app = create_app(engine_factory=lambda: db_engine)
     # yield app
     async with LifespanManager(app):
         yield app
@@ -61,16 +101,53 @@ async def client(app) -> AsyncClient:
         yield ac
 
 
-@pytest.fixture()
-async def db() -> AsyncSession:
-    async with engine.connect() as conn:
-        TestDBSession.configure(bind=conn)
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
-        await conn.commit()
-
+@asynccontextmanager
+async def rollback_session(db_engine: AsyncEngine) -> AsyncIterator[AsyncSession]:
+    """Тест во внешней транзакции соединения, которая откатывается после теста
+
+    Сессии сервисов и фабрик работают в SAVEPOINT этой транзакции: commit освобождает SAVEPOINT,
+    rollback откатывает только его. Все сессии теста используют одно соединение.
+    """
+    async with db_engine.connect() as conn:
+        transaction = await conn.begin()
+        bind_session_makers(conn, join_transaction_mode="create_savepoint")
+        try:
+            async with async_session_maker() as session:
+                yield session
+        finally:
+            await TestDBSession.remove()
+            bind_session_makers(db_engine)
+            await transaction.rollback()
+
+
+@asynccontextmanager
+async def truncate_session(db_engine: AsyncEngine) -> AsyncIterator[AsyncSession]:
+    """Тест с настоящими фиксациями транзакций, таблицы очищаются после теста"""
+    try:
         async with async_session_maker() as session:
             yield session
+    finally:
+        await TestDBSession.remove()
+        async with db_engine.begin() as conn:
+            await truncate_tables(conn, [table.name for table in Base.metadata.sorted_tables])
+
+
+@pytest.fixture()
+async def db(request: pytest.FixtureRequest, db_engine: AsyncEngine, app) -> AsyncIterator[AsyncSession]:
+    # Приложение запускается раньше сессии теста: lifespan привязывает фабрику сессий к движку
+    # Тестам с параллельными соединениями (asyncio.gather по сессиям) нужны настоящие фиксации: @pytest.mark.commits
+    if db_test_settings.MODE == "truncate" or request.node.get_closest_marker("commits"):
+        session_context = truncate_session(db_engine)
+    else:
+        session_context = rollback_session(db_engine)
+    async with session_context as session:
+        yield session
+
+
+@pytest.fixture
+def max_queries(db_engine: AsyncEngine) -> Callable[[int], AbstractContextManager[QueryRecorder]]:
+    """Проверка количества SQL-запросов блока: with max_queries(3): await service.get_posting(...)
 
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.commit()
+    Маршруты API проверяются по своим бюджетам в QueryBudgetMiddleware (QUERY_BUDGET_MODE=raise в тестах).
+    """
+    return assert_max_queries
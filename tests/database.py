@@ -0,0 +1,127 @@
+"""Тестовые БД: шаблон со схемой и клоны шаблона для процессов pytest(-xdist)
+
+Схема создается один раз в шаблонной БД, каждый процесс тестов получает свою копию через
+CREATE DATABASE ... TEMPLATE. Шаблон пересоздается, только если изменилась схема моделей.
+Вместо собранного по моделям шаблона можно указать готовую БД (TEST_DB_TEMPLATE),
+например с миграциями и реалистичным набором данных.
+"""
+import hashlib
+import os
+from collections.abc import Sequence
+from typing import Literal
+
+from app.config import Settings
+from app.database import create_engine
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy import MetaData, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# Ключ advisory-блокировки, под которой процессы тестов по очереди собирают шаблон и клонируют его
+TEMPLATE_LOCK_KEY = 0x7465_7374
+
+
+class DBTestSettings(BaseSettings):
+    """Параметры тестовых БД, задаются переменными окружения с префиксом TEST_DB_"""
+    model_config = SettingsConfigDict(env_prefix="TEST_DB_", extra="ignore")
+
+    # rollback - тест выполняется во внешней транзакции соединения, которая откатывается после теста;
+    # truncate - транзакции фиксируются по-настоящему, таблицы очищаются после теста
+    MODE: Literal["rollback", "truncate"] = "rollback"
+    # Готовая БД-шаблон, по умолчанию шаблон собирается по моделям
+    TEMPLATE: str | None = None
+
+
+def schema_hash(metadata: MetaData) -> str:
+    """Хэш DDL схемы моделей, по нему определяется, что шаблон устарел"""
+    dialect = postgresql.dialect()
+    ddl = [str(CreateTable(table).compile(dialect=dialect)) for table in metadata.sorted_tables]
+    ddl.extend(
+        str(CreateIndex(index).compile(dialect=dialect))
+        for table in metadata.sorted_tables
+        for index in sorted(table.indexes, key=lambda index: index.name or "")
+    )
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+def worker_database_name(settings: Settings) -> str:
+    # Без xdist переменной нет, все тесты идут в одном процессе
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    return f"{settings.POSTGRES_DB}_test_{worker_id}"
+
+
+def template_database_name(settings: Settings) -> str:
+    return f"{settings.POSTGRES_DB}_test_template"
+
+
+def database_engine(settings: Settings, database: str) -> AsyncEngine:
+    return create_engine(settings.model_copy(update={"POSTGRES_DB": database}))
+
+
+async def _database_comment(conn: AsyncConnection, name: str) -> str | None:
+    res = await conn.execute(
+        text("SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = :name"),
+        {"name": name},
+    )
+    row = res.one_or_none()
+    # Строка без комментария - БД есть, но шаблон не достроен
+    return None if row is None else row[0] or ""
+
+
+async def _build_template(
+    conn: AsyncConnection,
+    settings: Settings,
+    name: str,
+    metadata: MetaData,
+    digest: str,
+) -> None:
+    await conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}"')
+    await conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+    template_engine = database_engine(settings, name)
+    try:
+        async with template_engine.begin() as template_conn:
+            await template_conn.run_sync(metadata.create_all)
+    finally:
+        await template_engine.dispose()
+    # Хэш схемы записывается последним: шаблон без комментария считается недостроенным
+    await conn.exec_driver_sql(f"COMMENT ON DATABASE \"{name}\" IS '{digest}'")
+
+
+async def create_worker_database(settings: Settings, test_settings: DBTestSettings, metadata: MetaData) -> str:
+    """Собрать шаблон при необходимости и создать из него БД текущего процесса тестов, возвращает ее имя"""
+    name = worker_database_name(settings)
+    # CREATE/DROP DATABASE нельзя выполнять в транзакции
+    admin_engine = database_engine(settings, settings.POSTGRES_DB).execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        async with admin_engine.connect() as conn:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": TEMPLATE_LOCK_KEY})
+            try:
+                template = test_settings.TEMPLATE
+                if template is None:
+                    template = template_database_name(settings)
+                    digest = schema_hash(metadata)
+                    if await _database_comment(conn, template) != digest:
+                        await _build_template(conn, settings, template, metadata, digest)
+                await conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+                await conn.exec_driver_sql(f'CREATE DATABASE "{name}" TEMPLATE "{template}"')
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": TEMPLATE_LOCK_KEY})
+    finally:
+        await admin_engine.dispose()
+    return name
+
+
+async def drop_database(settings: Settings, name: str) -> None:
+    admin_engine = database_engine(settings, settings.POSTGRES_DB).execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        async with admin_engine.connect() as conn:
+            await conn.exec_driver_sql(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await admin_engine.dispose()
+
+
+async def truncate_tables(conn: AsyncConnection, table_names: Sequence[str]) -> None:
+    """Очистить таблицы одной командой, быстрее пересоздания схемы"""
+    if table_names:
+        await conn.exec_driver_sql(f"TRUNCATE TABLE {', '.join(table_names)} RESTART IDENTITY CASCADE")
@@ -0,0 +1,85 @@
+"""Сбор замеров нагрузочного теста и построение отчета
+
+Отчет - JSON с пропускной способностью и перцентилями задержки по каждому эндпоинту,
+ключи отсортированы, чтобы отчеты разных релизов можно было сравнивать diff'ом.
+"""
+import json
+import math
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+REPORT_VERSION = 1
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга, samples должны быть отсортированы"""
+    if not samples:
+        raise ValueError("Empty samples")
+    rank = math.ceil(q / 100 * len(samples))
+    return samples[max(rank, 1) - 1]
+
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    status_codes: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+    def to_dict(self, duration: float) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        errors_count = sum(count for status_code, count in self.status_codes.items() if status_code >= 500)
+        return {
+            "requests": len(latencies),
+            "errors": errors_count,
+            "throughput_rps": round(len(latencies) / duration, 2),
+            "latency_ms": {
+                **{f"p{q}": round(percentile(latencies, q) * 1000, 2) for q in PERCENTILES},
+                "max": round(latencies[-1] * 1000, 2),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            },
+            "status_codes": {str(status_code): count for status_code, count in sorted(self.status_codes.items())},
+        }
+
+
+@dataclass
+class LoadReport:
+    """Замеры запросов по эндпоинтам, эндпоинт - метод и путь, например "POST /createPosting" """
+    stats: dict[str, EndpointStats] = field(default_factory=lambda: defaultdict(EndpointStats))
+
+    def record(self, endpoint: str, elapsed: float, status_code: int) -> None:
+        endpoint_stats = self.stats[endpoint]
+        endpoint_stats.latencies.append(elapsed)
+        endpoint_stats.status_codes[status_code] += 1
+
+    @property
+    def errors_count(self) -> int:
+        return sum(
+            count
+            for endpoint_stats in self.stats.values()
+            for status_code, count in endpoint_stats.status_codes.items()
+            if status_code >= 500
+        )
+
+    def to_dict(self, duration: float, settings: Mapping[str, Any]) -> dict[str, Any]:
+        requests_count = sum(len(endpoint_stats.latencies) for endpoint_stats in self.stats.values())
+        return {
+            "version": REPORT_VERSION,
+            "settings": dict(settings),
+            "duration_s": round(duration, 3),
+            "total": {
+                "requests": requests_count,
+                "errors": self.errors_count,
+                "throughput_rps": round(requests_count / duration, 2),
+            },
+            "endpoints": {
+                endpoint: endpoint_stats.to_dict(duration)
+                for endpoint, endpoint_stats in sorted(self.stats.items())
+            },
+        }
+
+    def write(self, path: Path, duration: float, settings: Mapping[str, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(duration, settings), indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from tests.load.report import REPORT_VERSION, LoadReport, percentile
+
+
+@pytest.mark.parametrize(("q", "expected"), [(50, 5.0), (90, 9.0), (99, 10.0), (100, 10.0), (0, 1.0)])
+def test_percentile_nearest_rank(q: float, expected: float):
+    assert percentile([float(value) for value in range(1, 11)], q) == expected
+
+
+def test_percentile_empty():
+    with pytest.raises(ValueError):
+        percentile([], 50)
+
+
+def test_report_to_dict():
+    report = LoadReport()
+    for elapsed in (0.01, 0.02, 0.03, 0.04):
+        report.record("GET /getSkuInfo", elapsed, 200)
+    report.record("POST /createPosting", 0.1, 201)
+    report.record("POST /createPosting", 0.3, 500)
+
+    result = report.to_dict(duration=2.0, settings={"CONCURRENCY": 4})
+
+    assert result["version"] == REPORT_VERSION
+    assert result["settings"] == {"CONCURRENCY": 4}
+    assert result["total"] == {"requests": 6, "errors": 1, "throughput_rps": 3.0}
+    assert list(result["endpoints"]) == ["GET /getSkuInfo", "POST /createPosting"]
+    assert result["endpoints"]["GET /getSkuInfo"] == {
+        "requests": 4,
+        "errors": 0,
+        "throughput_rps": 2.0,
+        "latency_ms": {"p50": 20.0, "p90": 40.0, "p95": 40.0, "p99": 40.0, "max": 40.0, "mean": 25.0},
+        "status_codes": {"200": 4},
+    }
+    assert result["endpoints"]["POST /createPosting"]["status_codes"] == {"201": 1, "500": 1}
+
+
+def test_report_write(tmp_path: Path):
+    report = LoadReport()
+    report.record("GET /getSkuInfo", 0.01, 200)
+    path = tmp_path / "reports" / "load-report.json"
+
+    report.write(path, duration=1.0, settings={})
+
+    assert json.loads(path.read_text())["total"]["requests"] == 1
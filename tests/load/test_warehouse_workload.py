@@ -0,0 +1,90 @@
+"""Нагрузочный тест HTTP API
+
+Запуск против приложения в процессе теста:
+    pytest -m load -s tests/load
+Против запущенного uvicorn (каталог добавляется в БД из .env, к которой применены миграции):
+    LOAD_BASE_URL=http://127.0.0.1:8000 LOAD_DURATION=60 pytest -m load -s tests/load
+"""
+import json
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+from app.database import async_session_maker, create_engine
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from fastapi import FastAPI
+from httpx import AsyncClient
+from models import Item, Sku, StockStatus
+from services.stock_counter import StockCounterService
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from tests.load.report import LoadReport
+from tests.load.workload import Catalog, LoadSettings, Workload
+
+# Клиенты нагрузки работают параллельно, поэтому нужны настоящие транзакции, а не одно соединение теста
+pytestmark = [pytest.mark.load, pytest.mark.commits]
+
+
+@pytest.fixture
+def settings() -> LoadSettings:
+    return LoadSettings()
+
+
+@pytest.fixture
+async def catalog(db: AsyncSession, settings: LoadSettings) -> Catalog:
+    # Запущенное приложение работает с БД из .env, а не с тестовой БД
+    engine = create_engine() if settings.BASE_URL else None
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False) if engine else async_session_maker
+    # Объекты строятся фабриками без сохранения и добавляются одной транзакцией,
+    # иначе каждая фабрика фиксирует свою строку отдельно и наполнение большого каталога затягивается
+    acceptance = AcceptanceFactoryBase.build()
+    skus: list[Sku] = [SkuFactoryBase.build(is_hidden=False) for _ in range(settings.SKUS)]
+    items: list[Item] = [
+        ItemFactoryBase.build(
+            sku=sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+            acceptance=acceptance,
+        )
+        for sku in skus
+        for _ in range(settings.ITEMS_PER_SKU)
+    ]
+    try:
+        async with session_maker() as session:
+            session.add_all(items)
+            await session.commit()
+        # Товары созданы в обход сервисов, счетчики стоков пересчитываются сверкой
+        await StockCounterService(db_session_maker=session_maker).reconcile()
+    finally:
+        if engine is not None:
+            await engine.dispose()
+    return Catalog(sku_ids=[sku.id for sku in skus], free_item_ids=[item.id for item in items])
+
+
+@pytest.fixture
+async def load_client(app: FastAPI, settings: LoadSettings) -> AsyncIterator[AsyncClient]:
+    if settings.BASE_URL:
+        async with AsyncClient(base_url=settings.BASE_URL, timeout=30.0) as client:
+            yield client
+    else:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+
+
+async def test_warehouse_workload(load_client: AsyncClient, catalog: Catalog, settings: LoadSettings):
+    report = LoadReport()
+    duration = await Workload(client=load_client, catalog=catalog, report=report, settings=settings).run()
+
+    report_path = Path(settings.REPORT_PATH)
+    report.write(report_path, duration=duration, settings=settings.model_dump(exclude={"REPORT_PATH"}))
+    summary = json.loads(report_path.read_text())
+    print(f"\nload report: {report_path.resolve()}")
+    for endpoint, stats in summary["endpoints"].items():
+        print(
+            f"{endpoint}: {stats['throughput_rps']} rps, "
+            f"p50 {stats['latency_ms']['p50']} ms, p99 {stats['latency_ms']['p99']} ms, "
+            f"5xx {stats['errors']}"
+        )
+    assert report.errors_count == 0
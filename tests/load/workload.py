@@ -0,0 +1,167 @@
+"""Смешанная нагрузка склада: приемки, заказы, завершение задач, уценки и чтения
+
+Каждый воркер в цикле выбирает сценарий по весу и выполняет его через HTTP API,
+задержка каждого запроса записывается в LoadReport.
+"""
+import asyncio
+import random
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from httpx import AsyncClient, Response
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from tests.load.report import LoadReport
+
+
+class LoadSettings(BaseSettings):
+    """Параметры нагрузки, задаются переменными окружения с префиксом LOAD_"""
+    model_config = SettingsConfigDict(env_prefix="LOAD_", extra="ignore")
+
+    # Адрес запущенного приложения (uvicorn), без него нагрузка подается на приложение в процессе теста
+    BASE_URL: str | None = None
+    # Каталог: количество SKU и товаров на доступных стоках каждого SKU
+    SKUS: int = 20
+    ITEMS_PER_SKU: int = 50
+    # Длительность нагрузки в секундах и количество параллельных клиентов
+    DURATION: float = 30.0
+    CONCURRENCY: int = 16
+    SEED: int = 0
+    REPORT_PATH: str = "load-report.json"
+    # Веса сценариев
+    WEIGHT_ACCEPTANCE: int = 1
+    WEIGHT_POSTING: int = 3
+    WEIGHT_FINISH_TASKS: int = 3
+    WEIGHT_MARKDOWN: int = 1
+    WEIGHT_READ: int = 10
+
+
+@dataclass
+class Catalog:
+    """Состояние склада, известное нагрузке: ID SKU, свободные товары и объекты с незавершенными задачами"""
+    sku_ids: list[uuid.UUID]
+    free_item_ids: list[uuid.UUID]
+    item_ids: list[uuid.UUID] = field(default_factory=list)
+    posting_ids: list[uuid.UUID] = field(default_factory=list)
+    acceptance_ids: list[uuid.UUID] = field(default_factory=list)
+    # Заказы и приемки, задачи которых еще не завершались
+    unfinished_posting_ids: list[uuid.UUID] = field(default_factory=list)
+    unfinished_acceptance_ids: list[uuid.UUID] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if not self.item_ids:
+            self.item_ids = list(self.free_item_ids)
+
+
+@dataclass
+class Workload:
+    client: AsyncClient
+    catalog: Catalog
+    report: LoadReport
+    settings: LoadSettings
+    rng: random.Random = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.settings.SEED)
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> Response:
+        started_at = time.perf_counter()
+        response = await self.client.request(method, path, **kwargs)
+        self.report.record(f"{method} {path}", time.perf_counter() - started_at, response.status_code)
+        return response
+
+    async def create_acceptance(self) -> None:
+        sku_ids = self.rng.sample(self.catalog.sku_ids, min(self.rng.randint(1, 3), len(self.catalog.sku_ids)))
+        response = await self.request("POST", "/createAcceptance", json={
+            "items_to_accept": [
+                {"sku_id": str(sku_id), "stock": self.rng.choice(["valid", "defect"]), "count": self.rng.randint(1, 10)}
+                for sku_id in sku_ids
+            ],
+        })
+        if response.status_code == 201:
+            acceptance_id = uuid.UUID(response.json()["id"])
+            self.catalog.acceptance_ids.append(acceptance_id)
+            self.catalog.unfinished_acceptance_ids.append(acceptance_id)
+
+    async def create_posting(self) -> None:
+        if not self.catalog.free_item_ids:
+            return
+        # Товары забираются из пула свободных, чтобы заказы не конкурировали за одни и те же товары
+        items_count = min(self.rng.randint(1, 3), len(self.catalog.free_item_ids))
+        item_ids = [self.catalog.free_item_ids.pop() for _ in range(items_count)]
+        response = await self.request("POST", "/createPosting", json={
+            "ordered_goods": [{
+                "sku": str(self.rng.choice(self.catalog.sku_ids)),
+                "from_valid_ids": [str(item_id) for item_id in item_ids],
+            }],
+        })
+        if response.status_code == 201:
+            posting_id = uuid.UUID(response.json()["id"])
+            self.catalog.posting_ids.append(posting_id)
+            self.catalog.unfinished_posting_ids.append(posting_id)
+
+    async def finish_tasks(self) -> None:
+        # Задачи берутся из информации о приемке или заказе, как это делает сборщик
+        if self.catalog.unfinished_acceptance_ids and (
+            not self.catalog.unfinished_posting_ids or self.rng.random() < 0.5
+        ):
+            acceptance_id = self.catalog.unfinished_acceptance_ids.pop(0)
+            response = await self.request("GET", "/getAcceptanceInfo", params={"id": str(acceptance_id)})
+        elif self.catalog.unfinished_posting_ids:
+            posting_id = self.catalog.unfinished_posting_ids.pop(0)
+            response = await self.request("GET", "/getPosting", params={"id": str(posting_id)})
+        else:
+            return
+        if response.status_code != 200:
+            return
+        for task in response.json()["task_ids"]:
+            if task["status"] != "in_work":
+                continue
+            await self.request("POST", "/finishTask", json={
+                "id": task["id"],
+                "status": "completed" if self.rng.random() < 0.9 else "canceled",
+            })
+
+    async def markdown(self) -> None:
+        await self.request("POST", "/markdownItem", json={
+            "id": str(self.rng.choice(self.catalog.item_ids)),
+            "percentage": str(round(self.rng.uniform(0, 0.5), 2)),
+        })
+
+    async def read(self) -> None:
+        read = self.rng.choice(["sku", "item", "counters", "posting", "acceptance"])
+        if read == "sku":
+            await self.request("GET", "/getSkuInfo", params={"id": str(self.rng.choice(self.catalog.sku_ids))})
+        elif read == "item":
+            await self.request("GET", "/getItemInfo", params={"id": str(self.rng.choice(self.catalog.item_ids))})
+        elif read == "counters":
+            await self.request("GET", "/getSkuStockCounters", params={"id": str(self.rng.choice(self.catalog.sku_ids))})
+        elif read == "posting" and self.catalog.posting_ids:
+            await self.request("GET", "/getPosting", params={"id": str(self.rng.choice(self.catalog.posting_ids))})
+        elif read == "acceptance" and self.catalog.acceptance_ids:
+            await self.request("GET", "/getAcceptanceInfo", params={"id": str(self.rng.choice(self.catalog.acceptance_ids))})
+
+    def scenarios(self) -> tuple[list[Callable[[], Awaitable[None]]], list[int]]:
+        weighted = [
+            (self.create_acceptance, self.settings.WEIGHT_ACCEPTANCE),
+            (self.create_posting, self.settings.WEIGHT_POSTING),
+            (self.finish_tasks, self.settings.WEIGHT_FINISH_TASKS),
+            (self.markdown, self.settings.WEIGHT_MARKDOWN),
+            (self.read, self.settings.WEIGHT_READ),
+        ]
+        return [scenario for scenario, _ in weighted], [weight for _, weight in weighted]
+
+    async def worker(self, deadline: float) -> None:
+        scenarios, weights = self.scenarios()
+        while time.perf_counter() < deadline:
+            await self.rng.choices(scenarios, weights)[0]()
+
+    async def run(self) -> float:
+        """Подать нагрузку в течение settings.DURATION, возвращает фактическую длительность"""
+        started_at = time.perf_counter()
+        deadline = started_at + self.settings.DURATION
+        await asyncio.gather(*[self.worker(deadline) for _ in range(self.settings.CONCURRENCY)])
+        return time.perf_counter() - started_at
@@ -1,3 +1,5 @@
+import uuid
+
 import pytest
 from factories.models.acceptance import AcceptanceFactoryBase
 from factories.models.item import ItemFactoryBase
@@ -11,8 +13,12 @@ from factories.schemas.acceptance import (
     CreateAcceptanceRequestFactory,
 )
 from httpx import AsyncClient
-from models import Acceptance, Item
-from schemas.acceptance import CreateAcceptanceRequest, GetAcceptanceInfoResponse
+from models import Acceptance, Item, StockStatus, TaskStatus, TaskType
+from schemas.acceptance import (
+    CreateAcceptanceRequest,
+    GetAcceptanceInfoResponse,
+    StockStatusSchema,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -53,6 +59,77 @@ class TestAcceptanceApi:
         assert response.status_code == 200, response.text
         assert GetAcceptanceInfoResponse(**response.json())
 
+    @pytest.fixture
+    async def acceptance_with_tasks(self, db: AsyncSession) -> Acceptance:
+        # Для каждого SKU по три товара в каждом стоке, две задачи из трех завершены.
+        # У последнего SKU задачи не завершены, в принятых его быть не должно
+        skus = SkuFactoryBase.build_batch(3)
+        items: list[Item] = []
+        tasks = []
+        for sku in skus:
+            task_statuses = (TaskStatus.COMPLETED, TaskStatus.IN_WORK, TaskStatus.COMPLETED)
+            if sku is skus[-1]:
+                task_statuses = (TaskStatus.IN_WORK, TaskStatus.CANCELED, TaskStatus.IN_WORK)
+            for stock_status in (StockStatus.VALID, StockStatus.DEFECT):
+                for task_status in task_statuses:
+                    task = TaskFactoryBase.build(type=TaskType.PLACING, status=task_status)
+                    tasks.append(task)
+                    items.append(ItemFactoryBase.build(
+                        sku=sku,
+                        stock=StockFactoryBase.build(status=stock_status),
+                        tasks=[task],
+                    ))
+        return await AcceptanceFactoryBase.create(items=items, tasks=tasks)
+
+    async def test_get_acceptance_info_accepted(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        acceptance_with_tasks: Acceptance,
+    ):
+        response = await client.get(url="/getAcceptanceInfo", params={"id": acceptance_with_tasks.id})
+
+        assert response.status_code == 200, response.text
+        acceptance_info = GetAcceptanceInfoResponse(**response.json())
+        sku_ids = {item.sku_id for item in acceptance_with_tasks.items}
+        completed_sku_ids = sku_ids - {acceptance_with_tasks.items[-1].sku_id}
+        assert sorted((line.sku_id, line.stock, line.count) for line in acceptance_info.accepted) == sorted(
+            (sku_id, stock, 2)
+            for sku_id in completed_sku_ids
+            for stock in (StockStatusSchema.VALID, StockStatusSchema.DEFECT)
+        )
+        assert sorted(task.id for task in acceptance_info.task_ids) == sorted(
+            task.id for task in acceptance_with_tasks.tasks
+        )
+        assert acceptance_info.next_task_cursor is None
+
+    async def test_get_acceptance_info_tasks_paginated(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        acceptance_with_tasks: Acceptance,
+    ):
+        task_ids: list[uuid.UUID] = []
+        cursor: uuid.UUID | None = None
+        pages_count = 0
+        while True:
+            params = {"id": acceptance_with_tasks.id, "task_limit": 5}
+            if cursor is not None:
+                params["task_cursor"] = cursor
+            response = await client.get(url="/getAcceptanceInfo", params=params)
+            assert response.status_code == 200, response.text
+            page = GetAcceptanceInfoResponse(**response.json())
+            # Принятые товары считаются по всей приемке на каждой странице
+            assert len(page.accepted) == 4
+            task_ids.extend(task.id for task in page.task_ids)
+            pages_count += 1
+            cursor = page.next_task_cursor
+            if cursor is None:
+                break
+
+        assert pages_count == 4
+        assert task_ids == sorted(task.id for task in acceptance_with_tasks.tasks)
+
     @pytest.mark.parametrize('items_count', [1, 5, 10])
     @pytest.mark.parametrize('stock_count_per_item', [1, 5, 10])
     async def test_create_acceptance_success(
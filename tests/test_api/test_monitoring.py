@@ -0,0 +1,23 @@
+from factories.models.sku import SkuFactoryBase
+from httpx import AsyncClient
+from schemas.monitoring import GetPoolStatsResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestMonitoringApi:
+    async def test_get_pool_stats_success(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+    ):
+        sku = await SkuFactoryBase.create()
+        response = await client.get(url="/getSkuInfo", params={"id": sku.id})
+        assert response.status_code == 200, response.text
+
+        response = await client.get(url="/getPoolStats")
+        assert response.status_code == 200, response.text
+        stats = GetPoolStatsResponse(**response.json())
+        # Все соединения запросов вернулись в пул
+        assert stats.checked_out == 0
+        assert stats.checkouts >= 1
+        assert stats.wait_seconds_max <= stats.wait_seconds_total
@@ -6,8 +6,10 @@ from models import Posting, PostingStatus
 from schemas.posting import (
     CancelPostingRequest,
     CreatePostingRequest,
+    CreatePostingResponse,
     GetPostingResponse,
 )
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -31,6 +33,19 @@ class TestPostingApi:
         assert response.status_code == 200, response.text
         assert GetPostingResponse(**response.json())
 
+    async def test_watch_posting_closes_after_final_status(self, db: AsyncSession, client: AsyncClient):
+        posting: Posting = await PostingFactoryBase.create(status=PostingStatus.SENT)
+
+        response = await client.get(url="/watchPosting", params={"id": posting.id})
+
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"].startswith("text/event-stream")
+        # Отправленный заказ больше не меняется: одно событие с текущим состоянием, затем поток закрывается
+        [event] = response.text.strip().split("\n\n")
+        event_line, data_line = event.split("\n")
+        assert event_line == "event: posting"
+        assert GetPostingResponse.model_validate_json(data_line.removeprefix("data: ")).id == posting.id
+
     @pytest.mark.parametrize("skus_count", [1, 5, 10])
     @pytest.mark.parametrize("items_count_per_type_per_sku", [1, 5, 10])
     async def test_create_posting_success(
@@ -73,3 +88,23 @@ class TestPostingApi:
             content=payload_json,
         )
         assert response.status_code == 200, response.text
+
+    async def test_create_posting_idempotency_key(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+    ):
+        request_data: CreatePostingRequest = CreatePostingRequestFactory()
+        headers = {"Idempotency-Key": "create-posting-1"}
+
+        first = await client.post(url="/createPosting", content=request_data.json(), headers=headers)
+        retry = await client.post(url="/createPosting", content=request_data.json(), headers=headers)
+
+        assert first.status_code == 201, first.text
+        assert retry.status_code == 201, retry.text
+        assert CreatePostingResponse(**retry.json()) == CreatePostingResponse(**first.json())
+        assert (await db.execute(select(func.count()).select_from(Posting))).scalar_one() == 1
+
+        other_request_data: CreatePostingRequest = CreatePostingRequestFactory()
+        conflict = await client.post(url="/createPosting", content=other_request_data.json(), headers=headers)
+        assert conflict.status_code == 409, conflict.text
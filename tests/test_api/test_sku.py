@@ -1,3 +1,5 @@
+import uuid
+
 import pytest
 from factories.models.acceptance import AcceptanceFactoryBase
 from factories.models.discount import DiscountFactoryBase
@@ -9,9 +11,12 @@ from factories.models.stock import StockFactoryBase
 from factories.models.task import TaskFactoryBase
 from httpx import AsyncClient
 from models import Item, Sku
+from schemas.batch import BatchRequest
 from schemas.sku import (
+    GetItemInfoBatchResponse,
     GetItemInfoBySkuIdResponse,
     GetItemInfoResponse,
+    GetSkuInfoBatchResponse,
     GetSkuInfoResponse,
     ItemInfo,
     MarkdownItemRequest,
@@ -19,7 +24,11 @@ from schemas.sku import (
     SetSkuPriceRequest,
     ToggleIsHiddenRequest,
 )
-from services.sku import get_item_info_stock_status_db_to_api_map
+from services.sku import (
+    get_item_info_stock_status_db_to_api_map,
+    item_to_item_info,
+    sku_to_sku_info,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -66,6 +75,42 @@ class TestSkuApi:
             reserved_state=item.stock.is_reserved,
         )
 
+    async def test_get_item_info_batch_success(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        item: Item,
+    ):
+        missing_id = uuid.uuid4()
+        request_data = BatchRequest(ids=[missing_id, item.id, item.id])
+        response = await client.post(
+            url="/getItemInfoBatch",
+            content=request_data.model_dump_json(),
+        )
+        assert response.status_code == 200, response.text
+        assert GetItemInfoBatchResponse(**response.json()) == GetItemInfoBatchResponse.build(
+            ids=request_data.ids,
+            found={item.id: item_to_item_info(item)},
+        )
+
+    async def test_get_sku_info_batch_success(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        sku: Sku,
+    ):
+        missing_id = uuid.uuid4()
+        request_data = BatchRequest(ids=[sku.id, missing_id])
+        response = await client.post(
+            url="/getSkuInfoBatch",
+            content=request_data.model_dump_json(),
+        )
+        assert response.status_code == 200, response.text
+        response_data = GetSkuInfoBatchResponse(**response.json())
+        assert [(result.id, result.found) for result in response_data.results] == [(sku.id, True), (missing_id, False)]
+        assert response_data.results[0].data == sku_to_sku_info(sku)
+        assert response_data.results[1].data is None
+
     async def test_get_sku_info_success(
         self,
         db: AsyncSession,
@@ -110,6 +155,53 @@ class TestSkuApi:
             ]
         )
 
+    @pytest.fixture
+    async def sku_with_items(self, db: AsyncSession) -> Sku:
+        return await SkuFactoryBase.create(
+            items=[
+                ItemFactoryBase.build(stock=StockFactoryBase.build(), acceptance=AcceptanceFactoryBase.build())
+                for _ in range(5)
+            ],
+        )
+
+    async def test_get_item_info_by_sku_id_paginated(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        sku_with_items: Sku,
+    ):
+        item_ids: list[uuid.UUID] = []
+        cursor: uuid.UUID | None = None
+        pages_count = 0
+        while True:
+            params = {"id": sku_with_items.id, "limit": 2}
+            if cursor is not None:
+                params["cursor"] = cursor
+            response = await client.get(url="/getItemInfoBySkuId", params=params)
+            assert response.status_code == 200, response.text
+            page = GetItemInfoBySkuIdResponse(**response.json())
+            item_ids.extend(item.item_id for item in page.items)
+            pages_count += 1
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert pages_count == 3
+        assert item_ids == sorted(item.id for item in sku_with_items.items)
+
+    async def test_get_item_info_by_sku_id_stream(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        sku_with_items: Sku,
+    ):
+        response = await client.get(url="/getItemInfoBySkuId", params={"id": sku_with_items.id, "stream": True})
+
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/x-ndjson"
+        items = [ItemInfo.model_validate_json(line) for line in response.text.splitlines()]
+        assert sorted(item.item_id for item in items) == sorted(item.id for item in sku_with_items.items)
+
     async def test_markdown_item_success(
         self,
         db: AsyncSession,
@@ -1,3 +1,5 @@
+import uuid
+
 import pytest
 from factories.models.acceptance import AcceptanceFactoryBase
 from factories.models.discount import DiscountFactoryBase
@@ -8,13 +10,18 @@ from factories.models.sku import SkuFactoryBase
 from factories.models.stock import StockFactoryBase
 from factories.models.task import TaskFactoryBase
 from httpx import AsyncClient
-from models import Item, Sku, Task, TaskStatus
+from models import DomainEvent, Item, Job, JobName, Sku, Task, TaskStatus, TaskType
 from schemas.task import (
+    FinishTaskRejection,
     FinishTaskRequest,
+    FinishTaskResult,
+    FinishTasksRequest,
+    FinishTasksResponse,
     FinishTaskStatus,
     GetTaskInfoResponse,
     TaskTarget,
 )
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -102,3 +109,60 @@ class TestTaskApi:
             content=payload_json,
         )
         assert response.status_code == 200, response.text
+
+    async def test_finish_tasks(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+        sku: Sku,
+    ):
+        posting = PostingFactoryBase.build()
+        picking_tasks = [
+            await TaskFactoryBase.create(
+                status=TaskStatus.IN_WORK,
+                type=TaskType.PICKING,
+                posting=posting,
+                item=ItemFactoryBase.build(sku=sku, stock=StockFactoryBase.build()),
+            )
+            for _ in range(2)
+        ]
+        completed_task = await TaskFactoryBase.create(status=TaskStatus.COMPLETED, type=TaskType.PICKING)
+        canceled_task = await TaskFactoryBase.create(status=TaskStatus.CANCELED, type=TaskType.PICKING)
+        missing_task_id = uuid.uuid4()
+        request_data = FinishTasksRequest(
+            ids=[
+                picking_tasks[0].id,
+                missing_task_id,
+                completed_task.id,
+                canceled_task.id,
+                picking_tasks[1].id,
+            ],
+            status=FinishTaskStatus.COMPLETED,
+        )
+
+        response = await client.post(url="/finishTasks", content=request_data.model_dump_json())
+        assert response.status_code == 200, response.text
+        assert FinishTasksResponse(**response.json()).results == [
+            FinishTaskResult(id=picking_tasks[0].id, finished=True, status=TaskStatus.COMPLETED),
+            FinishTaskResult(id=missing_task_id, finished=False, rejection=FinishTaskRejection.NOT_FOUND),
+            # Повторное завершение с тем же статусом не ошибка
+            FinishTaskResult(id=completed_task.id, finished=True, status=TaskStatus.COMPLETED),
+            FinishTaskResult(
+                id=canceled_task.id,
+                finished=False,
+                rejection=FinishTaskRejection.ALREADY_FINISHED,
+                status=TaskStatus.CANCELED,
+            ),
+            FinishTaskResult(id=picking_tasks[1].id, finished=True, status=TaskStatus.COMPLETED),
+        ]
+
+        statuses = dict((await db.execute(select(Task.id, Task.status))).all())
+        assert statuses[canceled_task.id] is TaskStatus.CANCELED
+        assert all(statuses[task.id] is TaskStatus.COMPLETED for task in picking_tasks)
+        # По событию на каждую завершенную задачу и одна обработка событий на все задачи
+        events = (await db.execute(select(DomainEvent).order_by(DomainEvent.id))).scalars().all()
+        assert [(event.payload["task_id"], event.payload["after"]) for event in events] == [
+            (str(task.id), TaskStatus.COMPLETED) for task in picking_tasks
+        ]
+        jobs = (await db.execute(select(Job))).scalars().all()
+        assert [job.name for job in jobs] == [JobName.PROCESS_DOMAIN_EVENTS]
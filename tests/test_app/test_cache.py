@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+from app.cache import Cache, InMemoryCacheBackend
+
+
+async def test_in_memory_backend_evicts_least_recently_used():
+    backend = InMemoryCacheBackend(max_size=2)
+    await backend.set("a", "1", ttl=60)
+    await backend.set("b", "2", ttl=60)
+    assert await backend.get("a") == "1"
+    await backend.set("c", "3", ttl=60)
+
+    assert await backend.get("a") == "1"
+    assert await backend.get("b") is None
+    assert await backend.get("c") == "3"
+
+
+async def test_in_memory_backend_expires_entries():
+    backend = InMemoryCacheBackend(max_size=2)
+    with patch("app.cache.time.monotonic", return_value=100.0):
+        await backend.set("a", "1", ttl=10)
+    with patch("app.cache.time.monotonic", return_value=109.0):
+        assert await backend.get("a") == "1"
+    with patch("app.cache.time.monotonic", return_value=110.0):
+        assert await backend.get("a") is None
+
+
+async def test_cache_get_or_set():
+    cache = Cache(backend=InMemoryCacheBackend(max_size=10), ttl=60)
+    calls = []
+
+    async def load() -> str:
+        calls.append(1)
+        return f"value-{len(calls)}"
+
+    assert await cache.get_or_set("sku:1", load) == "value-1"
+    assert await cache.get_or_set("sku:1", load) == "value-1"
+    await cache.invalidate(["sku:1"])
+    assert await cache.get_or_set("sku:1", load) == "value-2"
+
+    stats = cache.stats()["sku"]
+    assert (stats.hits, stats.misses) == (1, 2)
+    assert stats.hit_ratio == 1 / 3
+
+
+async def test_disabled_cache_always_loads():
+    cache = Cache(backend=InMemoryCacheBackend(max_size=10), ttl=60, enabled=False)
+
+    async def load() -> str:
+        return "value"
+
+    assert await cache.get_or_set("sku:1", load) == "value"
+    assert await cache.get_or_set("sku:1", load) == "value"
+    assert cache.stats() == {}
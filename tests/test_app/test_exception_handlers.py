@@ -0,0 +1,58 @@
+import pytest
+from app.exception_handlers import setup_exception_handlers
+from app.exceptions import NotFoundError
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette.responses import StreamingResponse
+
+
+@pytest.fixture
+async def error_client() -> AsyncClient:
+    app = FastAPI()
+    setup_exception_handlers(app)
+
+    @app.get("/unhandled")
+    async def unhandled():
+        raise RuntimeError("boom")
+
+    @app.get("/notFound")
+    async def not_found():
+        raise NotFoundError()
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"{i}\n"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    async with AsyncClient(app=app, base_url='http://test') as ac:
+        yield ac
+
+
+async def test_unhandled_exception(error_client: AsyncClient):
+    response = await error_client.get("/unhandled")
+    assert response.status_code == 500
+    assert response.json() == {
+        "error": "EX_UNKNOWN_ERROR",
+        "detail": None,
+        "message": None,
+        "reason": "RuntimeError('boom')",
+    }
+
+
+async def test_app_error(error_client: AsyncClient):
+    response = await error_client.get("/notFound")
+    assert response.status_code == 404
+    assert response.json() == {
+        "error": "EX_NOT_FOUND",
+        "detail": None,
+        "message": "Object not found.",
+    }
+
+
+async def test_streaming_response(error_client: AsyncClient):
+    response = await error_client.get("/stream")
+    assert response.status_code == 200
+    assert response.text == "0\n1\n2\n"
@@ -0,0 +1,75 @@
+import pytest
+from app.database import async_session_maker
+from app.jobs import JobRunner
+from models import Job, JobName, JobStatus
+from providers.job import JobProvider
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestJobRunner:
+    @pytest.fixture
+    def handled_payloads(self) -> list[dict]:
+        return []
+
+    @pytest.fixture
+    def runner(self, handled_payloads: list[dict]) -> JobRunner:
+        async def handler(payload: dict) -> None:
+            handled_payloads.append(payload)
+
+        async def failing_handler(payload: dict) -> None:
+            raise RuntimeError("boom")
+
+        return JobRunner(
+            db_session_maker=async_session_maker,
+            handlers={
+                JobName.PROCESS_ACCEPTANCE: handler,
+                JobName.PROCESS_PICKING_POSTING: failing_handler,
+            },
+            retry_backoff=60,
+        )
+
+    async def enqueue(self, name: JobName, idempotency_key: str | None = None) -> None:
+        async with async_session_maker() as session:
+            await JobProvider(session).enqueue(
+                name=name,
+                payload={"key": idempotency_key},
+                max_attempts=2,
+                idempotency_key=idempotency_key,
+            )
+            await session.commit()
+
+    async def test_pending_jobs_are_deduplicated_by_idempotency_key(self, db: AsyncSession):
+        await self.enqueue(JobName.PROCESS_ACCEPTANCE, idempotency_key="same")
+        await self.enqueue(JobName.PROCESS_ACCEPTANCE, idempotency_key="same")
+
+        jobs = (await db.execute(select(Job))).scalars().all()
+        assert len(jobs) == 1
+
+    async def test_run_once_executes_job(
+        self,
+        db: AsyncSession,
+        runner: JobRunner,
+        handled_payloads: list[dict],
+    ):
+        await self.enqueue(JobName.PROCESS_ACCEPTANCE, idempotency_key="done")
+
+        assert await runner.run_once() == 1
+        await runner.stop()
+
+        job: Job = (await db.execute(select(Job))).scalar_one()
+        assert job.status is JobStatus.DONE
+        assert handled_payloads == [{"key": "done"}]
+
+    async def test_failed_job_is_rescheduled(self, db: AsyncSession, runner: JobRunner):
+        await self.enqueue(JobName.PROCESS_PICKING_POSTING)
+
+        await runner.run_once()
+        await runner.stop()
+
+        job: Job = (await db.execute(select(Job))).scalar_one()
+        assert job.status is JobStatus.PENDING
+        assert job.attempts == 1
+        assert "boom" in job.last_error
+        # Повтор отложен, поэтому сразу задача повторно не берется
+        assert await runner.run_once() == 0
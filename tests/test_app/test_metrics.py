@@ -0,0 +1,53 @@
+from app.metrics import (
+    MetricsRegistry,
+    db_request_queries,
+    http_request_duration,
+    service_method_duration,
+)
+from factories.models.sku import SkuFactoryBase
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Задержка", labelnames=("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Задержка",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 2',
+        'latency_seconds_sum{route="/a"} 0.55',
+        'latency_seconds_count{route="/a"} 2',
+    ]
+
+
+class TestMetricsApi:
+    async def test_request_metrics(
+        self,
+        db: AsyncSession,
+        client: AsyncClient,
+    ):
+        sku = await SkuFactoryBase.create()
+        requests_before, _ = http_request_duration.get(method="GET", route="/getSkuInfo", status="200")
+        queries_before, queries_sum_before = db_request_queries.get(route="/getSkuInfo")
+        service_calls_before, _ = service_method_duration.get(service="SkuService", method="get_sku_info")
+
+        response = await client.get(url="/getSkuInfo", params={"id": sku.id})
+        assert response.status_code == 200, response.text
+
+        assert http_request_duration.get(method="GET", route="/getSkuInfo", status="200")[0] == requests_before + 1
+        queries, queries_sum = db_request_queries.get(route="/getSkuInfo")
+        assert queries == queries_before + 1
+        assert queries_sum > queries_sum_before
+        assert service_method_duration.get(service="SkuService", method="get_sku_info")[0] == service_calls_before + 1
+
+        response = await client.get(url="/metrics")
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_request_duration_seconds_count{method="GET",route="/getSkuInfo",status="200"}' in response.text
+        assert 'db_pool_connections{state="checked_out"} 0' in response.text
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from app.database import async_session_maker
+from app.notifications import SSE_KEEPALIVE, NotificationHub, format_sse
+from providers.notification import NOTIFICATIONS_CHANNEL, NotificationProvider
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+class State(BaseModel):
+    status: str
+
+
+async def test_watch_sends_changed_states_until_final():
+    hub = NotificationHub(heartbeat_interval=0.01)
+    states = [State(status="in_work"), State(status="in_work"), State(status="done")]
+
+    async def load() -> State:
+        state = states.pop(0)
+        if len(states) == 1:
+            # Повторное уведомление, пока не дочитаны все состояния
+            hub._on_notification(None, 0, NOTIFICATIONS_CHANNEL, "posting:1")
+        return state
+
+    stream = hub.watch(
+        key="posting:1",
+        event="posting",
+        load=load,
+        is_final=lambda state: state.status == "done",
+    )
+    assert await anext(stream) == format_sse("posting", '{"status":"in_work"}')
+    # Без уведомлений в поток идет только keepalive
+    assert await anext(stream) == SSE_KEEPALIVE
+    hub._on_notification(None, 0, NOTIFICATIONS_CHANNEL, "posting:1")
+    # Состояние без изменений повторно не отправляется
+    assert await anext(stream) == format_sse("posting", '{"status":"done"}')
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert not hub._subscribers
+
+
+async def test_watch_reads_initial_state_after_subscribing():
+    """Изменение до начала потока не теряется: начальное состояние читается уже под подпиской"""
+    hub = NotificationHub(heartbeat_interval=0.01)
+
+    async def load() -> State:
+        assert hub._subscribers["posting:1"]
+        return State(status="done")
+
+    stream = hub.watch(key="posting:1", event="posting", load=load, is_final=lambda state: state.status == "done")
+    assert [message async for message in stream] == [format_sse("posting", '{"status":"done"}')]
+    assert not hub._subscribers
+
+
+@pytest.mark.commits
+async def test_listen_wakes_subscribers_on_commit(db: AsyncSession, db_engine: AsyncEngine):
+    hub = NotificationHub(engine=db_engine)
+    with hub.subscribe("posting:1") as changed, hub.subscribe("posting:2") as other_changed:
+        await hub.start()
+        try:
+            # После подключения будятся все подписчики
+            await asyncio.wait_for(changed.wait(), timeout=5)
+            changed.clear()
+            other_changed.clear()
+
+            async with async_session_maker() as session:
+                await NotificationProvider(session).notify(["posting:1", "posting:1"])
+                await session.commit()
+
+            await asyncio.wait_for(changed.wait(), timeout=5)
+            assert not other_changed.is_set()
+        finally:
+            await hub.stop()
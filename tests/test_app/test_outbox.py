@@ -0,0 +1,118 @@
+import json
+from collections.abc import Sequence
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from app.database import async_session_maker
+from app.outbox import InMemorySink, NdjsonFileSink, OutboxRelay
+from models import OutboxMessage, OutboxTopic, Sku
+from providers.outbox import OutboxProvider, OutboxRecord
+from schemas.sku import SetSkuPriceRequest
+from services.sku import SkuService
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.factories.models.sku import SkuFactoryBase
+
+
+class FailingSink:
+    async def publish(self, messages: Sequence[dict]) -> None:
+        raise RuntimeError("sink is down")
+
+
+class TestOutboxRelay:
+    @pytest.fixture
+    def sink(self) -> InMemorySink:
+        return InMemorySink()
+
+    @pytest.fixture
+    def relay(self, sink: InMemorySink) -> OutboxRelay:
+        return OutboxRelay(db_session_maker=async_session_maker, sink=sink, batch_size=2)
+
+    async def add_messages(self, count: int) -> None:
+        async with async_session_maker() as session:
+            await OutboxProvider(session).add_many(
+                OutboxRecord(topic=OutboxTopic.POSTING_STATUS_CHANGED, key=str(number), payload={"number": number})
+                for number in range(count)
+            )
+            await session.commit()
+
+    async def test_run_once_publishes_batches_in_order(
+        self,
+        db: AsyncSession,
+        relay: OutboxRelay,
+        sink: InMemorySink,
+    ):
+        await self.add_messages(3)
+
+        assert await relay.run_once() == 2
+        assert await relay.run_once() == 1
+        assert await relay.run_once() == 0
+
+        assert [message["payload"]["number"] for message in sink.messages] == [0, 1, 2]
+        assert [message["topic"] for message in sink.messages] == [OutboxTopic.POSTING_STATUS_CHANGED] * 3
+        messages = (await db.execute(select(OutboxMessage))).scalars().all()
+        assert all(message.published_at is not None for message in messages)
+
+    @pytest.mark.commits
+    async def test_interleaved_writers_message_committed_later_is_published(
+        self,
+        db: AsyncSession,
+        relay: OutboxRelay,
+        sink: InMemorySink,
+    ):
+        """ID выдается при записи: сообщение с меньшим ID, зафиксированное позже, публикуется следующей пачкой"""
+        def record(key: str) -> OutboxRecord:
+            return OutboxRecord(topic=OutboxTopic.POSTING_STATUS_CHANGED, key=key, payload={})
+
+        async with async_session_maker() as first_writer:
+            await OutboxProvider(first_writer).add_many([record("first")])
+            async with async_session_maker() as second_writer:
+                await OutboxProvider(second_writer).add_many([record("second")])
+                await second_writer.commit()
+            # Незафиксированное сообщение не видно ретранслятору и не пропускается им
+            assert await relay.run_once() == 1
+            await first_writer.commit()
+        assert await relay.run_once() == 1
+
+        assert [message["key"] for message in sink.messages] == ["second", "first"]
+        assert sink.messages[0]["id"] > sink.messages[1]["id"]
+
+    async def test_failed_publish_is_retried(self, db: AsyncSession, relay: OutboxRelay, sink: InMemorySink):
+        await self.add_messages(1)
+        failing_relay = OutboxRelay(db_session_maker=async_session_maker, sink=FailingSink())
+
+        with pytest.raises(RuntimeError):
+            await failing_relay.run_once()
+
+        # Пачка не отмечена опубликованной и передается следующему запуску
+        assert await relay.run_once() == 1
+        assert [message["payload"] for message in sink.messages] == [{"number": 0}]
+
+    async def test_service_change_is_published(self, db: AsyncSession, relay: OutboxRelay, sink: InMemorySink):
+        sku: Sku = await SkuFactoryBase.create()
+
+        await SkuService(db_session_maker=async_session_maker).set_sku_price(
+            SetSkuPriceRequest(sku_id=sku.id, base_price=Decimal("120.50")),
+        )
+        await relay.run_once()
+
+        [message] = sink.messages
+        assert message["topic"] == OutboxTopic.SKU_PRICE_CHANGED
+        assert message["key"] == str(sku.id)
+        assert message["payload"] == {"sku_id": str(sku.id), "base_price": "120.50", "actual_price": "120.50"}
+
+
+async def test_ndjson_file_sink(tmp_path: Path):
+    path = tmp_path / "outbox.ndjson"
+    sink = NdjsonFileSink(path=path)
+
+    await sink.publish([{"id": 1, "topic": "a"}, {"id": 2, "topic": "б"}])
+    await sink.publish([{"id": 3, "topic": "c"}])
+
+    assert [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] == [
+        {"id": 1, "topic": "a"},
+        {"id": 2, "topic": "б"},
+        {"id": 3, "topic": "c"},
+    ]
@@ -0,0 +1,107 @@
+import logging
+
+import pytest
+from api.routers import all_routers
+from app.query_budget import (
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    _before_cursor_execute,
+    assert_max_queries,
+    get_query_budget,
+    query_budget,
+    record_queries,
+)
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+# Потоки Server-Sent Events перечитывают состояние после каждого изменения, число запросов не ограничено
+UNBUDGETED_PATHS = {"/watchPosting", "/watchAcceptance"}
+
+
+def execute(statement: str) -> None:
+    # Вызов обработчика события движка, как при выполнении SQL-запроса
+    _before_cursor_execute(None, None, statement, None, None, False)
+
+
+def create_app(mode: str) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, mode=mode)
+
+    @app.get("/limited")
+    @query_budget(1)
+    async def limited() -> dict:
+        execute("SELECT 1")
+        execute("SELECT 2")
+        return {}
+
+    @app.get("/unlimited")
+    async def unlimited() -> dict:
+        execute("SELECT 1")
+        execute("SELECT 2")
+        return {}
+
+    return app
+
+
+def test_record_queries_nested():
+    execute("SELECT 0")
+    with record_queries() as outer:
+        execute("SELECT 1")
+        with record_queries() as inner:
+            execute("SELECT 2")
+        execute("SELECT 3")
+
+    assert outer.statements == ["SELECT 1", "SELECT 2", "SELECT 3"]
+    assert inner.statements == ["SELECT 2"]
+
+
+def test_assert_max_queries():
+    with assert_max_queries(2):
+        execute("SELECT 1")
+        execute("SELECT 2")
+
+    with pytest.raises(QueryBudgetExceeded) as exc_info:
+        with assert_max_queries(1, name="get_posting"):
+            execute("SELECT 1")
+            execute("SELECT 2")
+    assert str(exc_info.value).splitlines() == [
+        "get_posting: 2 SQL-запросов при бюджете 1",
+        "1. SELECT 1",
+        "2. SELECT 2",
+    ]
+
+
+def test_query_budget_decorator():
+    @query_budget(3)
+    async def endpoint() -> None:
+        ...
+
+    assert get_query_budget(endpoint) == 3
+    assert get_query_budget(None) is None
+
+
+def test_all_routes_declare_query_budget():
+    # Бюджеты маршрутов проверяются в тестах API, маршрут без бюджета не проверяется
+    paths = [
+        route.path
+        for router in all_routers
+        for route in router.routes
+        if get_query_budget(route.endpoint) is None
+    ]
+    assert sorted(paths) == sorted(UNBUDGETED_PATHS)
+
+
+async def test_middleware_raise():
+    async with AsyncClient(app=create_app(mode="raise"), base_url="http://test") as client:
+        assert (await client.get("/unlimited")).status_code == 200
+        with pytest.raises(QueryBudgetExceeded) as exc_info:
+            await client.get("/limited")
+    assert exc_info.value.name == "GET /limited"
+    assert exc_info.value.statements == ["SELECT 1", "SELECT 2"]
+
+
+async def test_middleware_warn(caplog: pytest.LogCaptureFixture):
+    async with AsyncClient(app=create_app(mode="warn"), base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING, logger="app.query_budget"):
+            assert (await client.get("/limited")).status_code == 200
+    assert "GET /limited: 2 SQL-запросов при бюджете 1" in caplog.text
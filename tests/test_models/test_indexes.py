@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from app.database import async_session_maker
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.posting import PostingFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from factories.models.task import TaskFactoryBase
+from models import Item, Posting, PostingStatus, Sku, StockStatus, TaskStatus, TaskType
+from services.acceptance import AcceptanceService
+from services.posting import PostingService
+from services.sku import SkuService
+from services.task import TaskService
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+def find_seq_scans(plan: dict) -> list[str]:
+    """Рекурсивно собрать таблицы, которые читаются последовательным сканированием"""
+    tables = []
+    if plan.get("Node Type") == "Seq Scan":
+        tables.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        tables.extend(find_seq_scans(child))
+    return tables
+
+
+class TestIndexes:
+    @pytest.fixture
+    async def sku(self, db: AsyncSession) -> Sku:
+        return await SkuFactoryBase.create(is_hidden=False)
+
+    @pytest.fixture
+    async def posting(self, db: AsyncSession) -> Posting:
+        return await PostingFactoryBase.create(status=PostingStatus.IN_ITEM_PICK)
+
+    @pytest.fixture
+    async def items(self, db: AsyncSession, sku: Sku, posting: Posting) -> list[Item]:
+        acceptance = await AcceptanceFactoryBase.create()
+        return [
+            await ItemFactoryBase.create(
+                sku=sku,
+                posting=posting,
+                acceptance=acceptance,
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=True),
+                tasks=[
+                    TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK),
+                    TaskFactoryBase.build(acceptance=acceptance, type=TaskType.PLACING, status=TaskStatus.COMPLETED),
+                ],
+            )
+            for _ in range(5)
+        ]
+
+    @pytest.fixture
+    def statements(self, db_engine: AsyncEngine) -> list[tuple[str, tuple]]:
+        """Перехватить все SELECT-запросы, выполненные сервисами"""
+        captured = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                captured.append((statement, parameters))
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        yield captured
+        event.remove(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    async def test_service_queries_use_indexes(
+        self,
+        db: AsyncSession,
+        db_engine: AsyncEngine,
+        sku: Sku,
+        posting: Posting,
+        items: list[Item],
+        statements: list[tuple[str, tuple]],
+    ):
+        item = items[0]
+        await SkuService(db_session_maker=async_session_maker).get_item_info_by_sku_id(sku_id=sku.id)
+        await SkuService(db_session_maker=async_session_maker).get_item_info(item_id=item.id)
+        await PostingService(db_session_maker=async_session_maker).get_posting(posting_id=posting.id)
+        await AcceptanceService(db_session_maker=async_session_maker).get_acceptance_info(id=item.acceptance_id)
+        await TaskService(db_session_maker=async_session_maker).get_task_info(task_id=item.tasks[0].id)
+        assert statements
+
+        seq_scans = {}
+        async with db_engine.connect() as conn:
+            # На маленьком наборе данных планировщик предпочтет Seq Scan даже при наличии индекса,
+            # поэтому запрещаем его: если индекса нет, Seq Scan все равно останется в плане
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in statements:
+                res = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = res.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                tables = find_seq_scans(plan[0]["Plan"])
+                if tables:
+                    seq_scans[statement] = tables
+            await conn.rollback()
+
+        assert not seq_scans, seq_scans
@@ -0,0 +1,94 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.item_discount import ItemDiscountFactoryBase
+from factories.models.posting import PostingFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from factories.models.task import TaskFactoryBase
+from models import Item, Posting, TaskType
+from providers.posting import PostingProvider
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestPostingProvider:
+    @pytest.fixture
+    async def posting(self, db: AsyncSession) -> Posting:
+        posting = PostingFactoryBase.build()
+        await ItemFactoryBase.create(
+            sku=SkuFactoryBase.build(),
+            stock=StockFactoryBase.build(),
+            tasks=TaskFactoryBase.build_batch(3, posting=posting, type=TaskType.PICKING),
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+        return posting
+
+    async def test_find_one_picking_profile_loads_nested_graph(
+        self,
+        db: AsyncSession,
+        posting: Posting,
+    ):
+        found: Posting = await PostingProvider(db).find_one(id=posting.id, load_profile="picking")
+
+        assert len(found.tasks) == 3
+        assert all(task.item.stock.status for task in found.tasks)
+        assert all(task.item.sku.id for task in found.tasks)
+
+    async def test_find_one_without_profile_raises_on_lazy_load(
+        self,
+        db: AsyncSession,
+        posting: Posting,
+    ):
+        found: Posting = await PostingProvider(db).find_one(id=posting.id)
+
+        with pytest.raises(InvalidRequestError):
+            _ = found.tasks
+
+    async def test_find_one_unknown_profile(
+        self,
+        db: AsyncSession,
+        posting: Posting,
+    ):
+        with pytest.raises(ValueError):
+            await PostingProvider(db).find_one(id=posting.id, load_profile="unknown")
+
+    async def test_find_many(
+        self,
+        db: AsyncSession,
+        posting: Posting,
+    ):
+        missing_id = uuid.uuid4()
+        found: dict[uuid.UUID, Posting] = await PostingProvider(db).find_many(
+            ids=[missing_id, posting.id, posting.id],
+            load_profile="info",
+        )
+
+        assert list(found) == [posting.id]
+        assert len(found[posting.id].tasks) == 3
+
+    async def test_calculate_costs(self, db: AsyncSession):
+        postings: list[Posting] = PostingFactoryBase.build_batch(3)
+        items: list[Item] = [
+            await ItemFactoryBase.create(
+                sku=SkuFactoryBase.build(),
+                stock=StockFactoryBase.build(),
+                posting=posting,
+                acceptance=AcceptanceFactoryBase.build(),
+                item_discounts=ItemDiscountFactoryBase.build_batch(discounts_count),
+            )
+            for posting in postings[:2]
+            for discounts_count in range(4)
+        ]
+        expected: dict[uuid.UUID, Decimal] = {posting.id: Decimal(0) for posting in postings[:2]}
+        for item in items:
+            percentage = max((item_discount.percentage for item_discount in item.item_discounts), default=0)
+            expected[item.posting.id] += item.sku.base_price * (100 - percentage) / 100
+
+        costs = await PostingProvider(db).calculate_costs(ids=[posting.id for posting in postings])
+
+        # Заказ без товаров в результат не попадает
+        assert costs == expected
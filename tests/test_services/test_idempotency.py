@@ -0,0 +1,164 @@
+import asyncio
+import uuid
+
+import pytest
+from app.database import async_session_maker
+from app.exceptions import ConflictError
+from models import IdempotencyKey
+from schemas.posting import CancelPostingRequest, CreatePostingResponse
+from services.idempotency import IdempotencyService, IdempotentRequest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestIdempotencyService:
+    @pytest.fixture()
+    async def service(self, db: AsyncSession) -> IdempotencyService:
+        return IdempotencyService(
+            db_session_maker=async_session_maker,
+        )
+
+    @pytest.fixture
+    def request_data(self) -> CancelPostingRequest:
+        return CancelPostingRequest(id=uuid.uuid4())
+
+    async def test_retry_returns_stored_response(
+        self,
+        db: AsyncSession,
+        service: IdempotencyService,
+        request_data: CancelPostingRequest,
+        max_queries,
+    ):
+        calls: list[CreatePostingResponse] = []
+
+        async def operation(idempotent_request: IdempotentRequest | None) -> CreatePostingResponse:
+            calls.append(CreatePostingResponse(id=uuid.uuid4()))
+            async with async_session_maker() as session:
+                await idempotent_request.save_response(session, calls[-1])
+                await session.commit()
+            return calls[-1]
+
+        async def execute() -> CreatePostingResponse:
+            return await service.execute(
+                endpoint="createPosting",
+                key="key",
+                request_data=request_data,
+                operation=operation,
+                response_model=CreatePostingResponse,
+            )
+
+        responses = [await execute()]
+        # Повтор - одно чтение ключа без записи
+        with max_queries(1):
+            responses.append(await execute())
+        responses.append(await execute())
+
+        assert len(calls) == 1
+        assert responses == [calls[0]] * 3
+
+    async def test_without_key_always_executes(
+        self,
+        db: AsyncSession,
+        service: IdempotencyService,
+        request_data: CancelPostingRequest,
+    ):
+        calls: list[IdempotentRequest | None] = []
+
+        async def operation(idempotent_request: IdempotentRequest | None) -> None:
+            calls.append(idempotent_request)
+
+        for _ in range(2):
+            await service.execute(endpoint="cancelPosting", key=None, request_data=request_data, operation=operation)
+
+        assert calls == [None, None]
+
+    async def test_different_request_conflict(
+        self,
+        db: AsyncSession,
+        service: IdempotencyService,
+        request_data: CancelPostingRequest,
+    ):
+        async def operation(idempotent_request: IdempotentRequest | None) -> None:
+            async with async_session_maker() as session:
+                await idempotent_request.save_response(session, None)
+                await session.commit()
+
+        await service.execute(endpoint="cancelPosting", key="key", request_data=request_data, operation=operation)
+
+        with pytest.raises(ConflictError):
+            await service.execute(
+                endpoint="cancelPosting",
+                key="key",
+                request_data=CancelPostingRequest(id=uuid.uuid4()),
+                operation=operation,
+            )
+
+    async def test_uncommitted_operation_executes_again(
+        self,
+        db: AsyncSession,
+        service: IdempotencyService,
+        request_data: CancelPostingRequest,
+    ):
+        calls: list[None] = []
+
+        async def operation(idempotent_request: IdempotentRequest | None) -> None:
+            calls.append(None)
+            async with async_session_maker() as session:
+                await idempotent_request.save_response(session, None)
+                if len(calls) == 1:
+                    # Ответ не сохраняется без фиксации транзакции запроса
+                    raise RuntimeError("Первая попытка не удалась")
+                await session.commit()
+
+        with pytest.raises(RuntimeError):
+            await service.execute(endpoint="cancelPosting", key="key", request_data=request_data, operation=operation)
+        await service.execute(endpoint="cancelPosting", key="key", request_data=request_data, operation=operation)
+
+        assert len(calls) == 2
+
+    @pytest.mark.commits
+    async def test_concurrent_retry_returns_first_response(
+        self,
+        db: AsyncSession,
+        service: IdempotencyService,
+        request_data: CancelPostingRequest,
+    ):
+        saved = asyncio.Event()
+        finish = asyncio.Event()
+        first_response = CreatePostingResponse(id=uuid.uuid4())
+
+        async def first_operation(idempotent_request: IdempotentRequest | None) -> CreatePostingResponse:
+            async with async_session_maker() as session:
+                await idempotent_request.save_response(session, first_response)
+                saved.set()
+                await finish.wait()
+                await session.commit()
+            return first_response
+
+        async def retry_operation(idempotent_request: IdempotentRequest | None) -> CreatePostingResponse:
+            response = CreatePostingResponse(id=uuid.uuid4())
+            async with async_session_maker() as session:
+                # Ждет фиксации исходного запроса, затем транзакция повтора откатывается
+                await idempotent_request.save_response(session, response)
+                await session.commit()
+            return response
+
+        def execute(operation) -> asyncio.Task:
+            return asyncio.create_task(service.execute(
+                endpoint="createPosting",
+                key="key",
+                request_data=request_data,
+                operation=operation,
+                response_model=CreatePostingResponse,
+            ))
+
+        first = execute(first_operation)
+        await saved.wait()
+        retry = execute(retry_operation)
+        await asyncio.sleep(0.1)
+        finish.set()
+
+        assert await first == first_response
+        assert await retry == first_response
+        async with async_session_maker() as session:
+            assert (await session.execute(select(func.count()).select_from(IdempotencyKey))).scalar_one() == 1
@@ -0,0 +1,377 @@
+import asyncio
+import random
+import uuid
+from collections import Counter
+from collections.abc import Iterable
+from decimal import Decimal
+
+import pytest
+from app.database import async_session_maker
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.item_discount import ItemDiscountFactoryBase
+from factories.models.posting import PostingFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from factories.models.task import TaskFactoryBase
+from models import (
+    DomainEvent,
+    Item,
+    Posting,
+    PostingStatus,
+    Sku,
+    Stock,
+    StockStatus,
+    Task,
+    TaskStatus,
+    TaskType,
+)
+from providers.outbox import OutboxProvider, OutboxRecord
+from providers.sku_stock_counter import SkuStockCounterProvider
+from schemas.posting import (
+    CancelPostingRequest,
+    CreatePostingRequest,
+    CreatePostingResponse,
+    OrderedGood,
+)
+from schemas.task import FinishTaskRequest, FinishTaskStatus
+from services.posting import PostingService
+from services.task import TaskService
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestPostingService:
+    @pytest.fixture()
+    async def service(self, db: AsyncSession) -> PostingService:
+        return PostingService(
+            db_session_maker=async_session_maker,
+        )
+
+    @pytest.fixture
+    async def sku(self, db: AsyncSession) -> Sku:
+        return await SkuFactoryBase.create(is_hidden=False)
+
+    @pytest.fixture
+    async def posting(self, db: AsyncSession) -> Posting:
+        return await PostingFactoryBase.create(status=PostingStatus.IN_ITEM_PICK)
+
+    @pytest.fixture
+    async def lost_items(self, db: AsyncSession, sku: Sku, posting: Posting) -> list[Item]:
+        return [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=StockStatus.NOT_FOUND, is_reserved=True),
+                tasks=[TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK)],
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for _ in range(3)
+        ]
+
+    @pytest.fixture
+    async def spare_items(self, db: AsyncSession, sku: Sku) -> list[Item]:
+        return [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for _ in range(2)
+        ]
+
+    async def set_open_picking_tasks(self, db: AsyncSession, posting: Posting, count: int) -> None:
+        # Задачи созданы фабриками в обход сервисов, поэтому счетчик задач заказа задается явно
+        await db.execute(update(Posting).filter_by(id=posting.id).values(open_picking_tasks=count))
+        await db.commit()
+
+    async def test_process_picking_posting_reserves_replacements(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        posting: Posting,
+        lost_items: list[Item],
+        spare_items: list[Item],
+    ):
+        """Потерянные товары заменяются незарезервированными товарами того же SKU, пока они есть"""
+        await service.process_picking_posting(posting_id=posting.id)
+
+        tasks = (await db.execute(select(Task).filter_by(posting_id=posting.id))).scalars().all()
+        lost_item_ids = {item.id for item in lost_items}
+        spare_item_ids = {item.id for item in spare_items}
+
+        assert {task.item_id for task in tasks if task.status is TaskStatus.CANCELED} == lost_item_ids
+        assert {task.item_id for task in tasks if task.status is TaskStatus.COMPLETED} == spare_item_ids
+
+        spare_stocks = (await db.execute(
+            select(Stock).filter(Stock.item_id.in_(spare_item_ids))
+        )).scalars().all()
+        assert all(stock.is_reserved for stock in spare_stocks)
+
+    async def test_process_picking_posting_skips_canceled_posting(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        posting: Posting,
+        sku: Sku,
+    ):
+        """Заказ, отмененный до выполнения фоновой задачи сбора, задачей не собирается"""
+        item: Item = await ItemFactoryBase.create(
+            sku=sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=True),
+            tasks=[TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK)],
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+
+        await service.cancel_posting(CancelPostingRequest(id=posting.id))
+        await service.process_picking_posting(posting_id=posting.id)
+        await service.process_task_events()
+
+        processed: Posting = (await db.execute(select(Posting).filter_by(id=posting.id))).scalar_one()
+        assert processed.status is PostingStatus.CANCELED
+        task: Task = (await db.execute(select(Task).filter_by(id=item.tasks[0].id))).scalar_one()
+        assert task.status is not TaskStatus.COMPLETED
+
+    async def test_cancel_posting_before_picking_releases_reserved_items(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        spare_items: list[Item],
+    ):
+        """Отмена до завершения задач на подбор снимает резерв со всех товаров заказа и закрывает задачи"""
+        spare_item_ids = {item.id for item in spare_items}
+        posting = await service.create_posting(CreatePostingRequest(
+            ordered_goods=[OrderedGood(sku=spare_items[0].sku_id, from_valid_ids=list(spare_item_ids))],
+        ))
+
+        await service.cancel_posting(CancelPostingRequest(id=posting.id))
+        await service.process_task_events()
+
+        stocks = (await db.execute(
+            select(Stock).filter(Stock.item_id.in_(spare_item_ids)).execution_options(populate_existing=True)
+        )).scalars().all()
+        assert not any(stock.is_reserved for stock in stocks)
+        tasks = (await db.execute(select(Task).filter_by(posting_id=posting.id))).scalars().all()
+        assert {(task.item_id, task.type, task.status) for task in tasks} == {
+            (item_id, TaskType.PICKING, TaskStatus.CANCELED) for item_id in spare_item_ids
+        }
+        processed: Posting = (await db.execute(select(Posting).filter_by(id=posting.id))).scalar_one()
+        assert (processed.status, processed.open_picking_tasks) == (PostingStatus.CANCELED, 0)
+
+    async def test_cancel_posting_returns_picked_items(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        spare_items: list[Item],
+    ):
+        """Товар, подобранный до отмены, возвращается задачей на размещение и не привязывается к отмененному заказу"""
+        posting = await service.create_posting(CreatePostingRequest(
+            ordered_goods=[OrderedGood(sku=spare_items[0].sku_id, from_valid_ids=[spare_items[0].id])],
+        ))
+        [picking_task] = (await db.execute(select(Task).filter_by(posting_id=posting.id))).scalars().all()
+        await TaskService(db_session_maker=async_session_maker).finish_task(
+            FinishTaskRequest(id=picking_task.id, status=FinishTaskStatus.COMPLETED),
+        )
+
+        await service.cancel_posting(CancelPostingRequest(id=posting.id))
+        await service.process_task_events()
+
+        stock: Stock = (await db.execute(
+            select(Stock).filter_by(item_id=spare_items[0].id).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert not stock.is_reserved
+        tasks = (await db.execute(
+            select(Task).filter_by(posting_id=posting.id, type=TaskType.PLACING)
+        )).scalars().all()
+        assert [(task.item_id, task.status) for task in tasks] == [(spare_items[0].id, TaskStatus.IN_WORK)]
+        posting_item_ids = (await db.execute(select(Item.id).filter_by(posting_id=posting.id))).scalars().all()
+        assert posting_item_ids == []
+
+    async def test_get_posting_and_create_posting_query_count(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        posting: Posting,
+        lost_items: list[Item],
+        spare_items: list[Item],
+        max_queries,
+    ):
+        """Количество SQL-запросов не зависит от количества товаров и задач заказа"""
+        with max_queries(3):
+            await service.get_posting(posting_id=posting.id)
+
+        with max_queries(6):
+            await service.create_posting(CreatePostingRequest(
+                ordered_goods=[OrderedGood(sku=spare_items[0].sku_id, from_valid_ids=[item.id for item in spare_items])],
+            ))
+
+    async def test_process_picking_posting_calculates_cost(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        posting: Posting,
+    ):
+        """Стоимость собранного заказа - сумма базовых цен за вычетом максимальной скидки каждого товара"""
+        await self.set_open_picking_tasks(db, posting, 2)
+        for base_price, percentages in ((Decimal("10.01"), [5, 30]), (Decimal("0.99"), [])):
+            await ItemFactoryBase.create(
+                sku=SkuFactoryBase.build(is_hidden=False, base_price=base_price),
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=True),
+                tasks=[TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK)],
+                acceptance=AcceptanceFactoryBase.build(),
+                item_discounts=[ItemDiscountFactoryBase.build(percentage=percentage) for percentage in percentages],
+            )
+
+        await service.process_picking_posting(posting_id=posting.id)
+        # Сборку заказа завершает обработчик событий задач
+        assert await service.process_task_events() == 2
+
+        processed: Posting = (await db.execute(select(Posting).filter_by(id=posting.id))).scalar_one()
+        assert processed.status is PostingStatus.SENT
+        assert processed.cost == Decimal("10.01") * Decimal("0.70") + Decimal("0.99")
+
+    async def test_process_task_events_finishes_posting_once(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        sku: Sku,
+    ):
+        """Заказ собирается, когда завершена последняя задача на подбор, повторно события не применяются"""
+        posting: Posting = await PostingFactoryBase.create(status=PostingStatus.IN_ITEM_PICK, open_picking_tasks=2)
+        items: list[Item] = [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=True),
+                tasks=[TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK)],
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for _ in range(2)
+        ]
+        task_service = TaskService(db_session_maker=async_session_maker)
+
+        await task_service.finish_task(FinishTaskRequest(id=items[0].tasks[0].id, status=FinishTaskStatus.COMPLETED))
+        assert await service.process_task_events() == 1
+        processed: Posting = (await db.execute(select(Posting).filter_by(id=posting.id))).scalar_one()
+        assert (processed.status, processed.open_picking_tasks) == (PostingStatus.IN_ITEM_PICK, 1)
+
+        # Повторное завершение той же задачи не меняет статус и не записывает событие
+        await task_service.finish_task(FinishTaskRequest(id=items[0].tasks[0].id, status=FinishTaskStatus.COMPLETED))
+        await task_service.finish_task(FinishTaskRequest(id=items[1].tasks[0].id, status=FinishTaskStatus.CANCELED))
+        assert await service.process_task_events() == 1
+        assert await service.process_task_events() == 0
+
+        processed = (await db.execute(
+            select(Posting).filter_by(id=posting.id).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert (processed.status, processed.open_picking_tasks) == (PostingStatus.SENT, 0)
+        assert processed.cost == sku.base_price
+        # К заказу привязан только подобранный товар
+        posting_item_ids = (await db.execute(select(Item.id).filter_by(posting_id=posting.id))).scalars().all()
+        assert posting_item_ids == [items[0].id]
+        assert (await db.execute(select(DomainEvent).filter(DomainEvent.processed_at.is_(None)))).first() is None
+
+    async def test_process_task_events_cancels_posting_without_items(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        posting: Posting,
+        lost_items: list[Item],
+    ):
+        """Если замена потерянным товарам не нашлась, собранный заказ без товаров отменяется"""
+        await self.set_open_picking_tasks(db, posting, len(lost_items))
+
+        await service.process_picking_posting(posting_id=posting.id)
+        await service.process_task_events()
+
+        processed: Posting = (await db.execute(select(Posting).filter_by(id=posting.id))).scalar_one()
+        assert (processed.status, processed.open_picking_tasks) == (PostingStatus.CANCELED, 0)
+
+    @pytest.mark.commits
+    async def test_concurrent_create_posting_no_double_reservation(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        sku: Sku,
+    ):
+        """Параллельные заказы одних и тех же товаров: каждый товар резервируется ровно одним заказом"""
+        items: list[Item] = [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for _ in range(20)
+        ]
+        item_ids: list[uuid.UUID] = [item.id for item in items]
+        rng = random.Random(0)
+        requests: list[CreatePostingRequest] = [
+            CreatePostingRequest(ordered_goods=[OrderedGood(sku=sku.id, from_valid_ids=rng.sample(item_ids, 3))])
+            for _ in range(200)
+        ]
+
+        responses: list[CreatePostingResponse] = await asyncio.gather(*[
+            service.create_posting(request_data=request_data) for request_data in requests
+        ])
+
+        tasks = (await db.execute(select(Task).filter(Task.type == TaskType.PICKING))).scalars().all()
+        # Ни один товар не попал в два заказа
+        tasks_count_by_item_id = Counter(task.item_id for task in tasks)
+        assert max(tasks_count_by_item_id.values()) == 1
+        # Каждый заказанный товар либо зарезервирован заказом, либо возвращен как не зарезервированный
+        reserved_item_ids_by_posting_id: dict[uuid.UUID, set[uuid.UUID]] = {}
+        for task in tasks:
+            reserved_item_ids_by_posting_id.setdefault(task.posting_id, set()).add(task.item_id)
+        for request_data, response in zip(requests, responses, strict=True):
+            reserved_item_ids = reserved_item_ids_by_posting_id.get(response.id, set())
+            assert reserved_item_ids.isdisjoint(response.not_reserved_item_ids)
+            assert reserved_item_ids | set(response.not_reserved_item_ids) == set(request_data.ordered_goods[0].from_valid_ids)
+        # Зарезервированы ровно те товары, на которые созданы задачи
+        stocks = (await db.execute(select(Stock).filter(Stock.item_id.in_(item_ids)))).scalars().all()
+        assert {stock.item_id for stock in stocks if stock.is_reserved} == set(tasks_count_by_item_id)
+
+    @pytest.mark.commits
+    async def test_create_posting_different_items_of_sku_do_not_block(
+        self,
+        db: AsyncSession,
+        service: PostingService,
+        sku: Sku,
+    ):
+        """Заказы разных товаров одного SKU не ждут друг друга, в том числе на счетчиках стоков SKU"""
+        items: list[Item] = [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for _ in range(2)
+        ]
+        counters_changed = asyncio.Event()
+        finish = asyncio.Event()
+
+        class PausingOutboxProvider(OutboxProvider):
+            # Первый заказ держит транзакцию открытой после резерва и изменения счетчиков
+            async def add_many(self, records: Iterable[OutboxRecord]) -> None:
+                await super().add_many(records)
+                counters_changed.set()
+                await finish.wait()
+
+        first = asyncio.create_task(
+            PostingService(db_session_maker=async_session_maker, outbox_provider=PausingOutboxProvider).create_posting(
+                CreatePostingRequest(ordered_goods=[OrderedGood(sku=sku.id, from_valid_ids=[items[0].id])]),
+            )
+        )
+        await counters_changed.wait()
+        try:
+            second: CreatePostingResponse = await asyncio.wait_for(
+                service.create_posting(
+                    CreatePostingRequest(ordered_goods=[OrderedGood(sku=sku.id, from_valid_ids=[items[1].id])]),
+                ),
+                timeout=5,
+            )
+        finally:
+            finish.set()
+        first_response: CreatePostingResponse = await first
+
+        assert first_response.not_reserved_item_ids == second.not_reserved_item_ids == []
+        async with async_session_maker() as session:
+            counters = await SkuStockCounterProvider(session).find_by_sku_id(sku_id=sku.id)
+        assert (StockStatus.VALID, True, 2) in [tuple(counter) for counter in counters]
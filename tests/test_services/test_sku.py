@@ -0,0 +1,202 @@
+from collections import Counter
+from decimal import Decimal
+
+import pytest
+from app.cache import Cache, InMemoryCacheBackend
+from app.database import async_session_maker
+from models import (
+    Discount,
+    DiscountStatus,
+    DomainEvent,
+    PostingStatus,
+    Sku,
+    Stock,
+    StockStatus,
+    Task,
+    TaskStatus,
+    TaskType,
+)
+from providers.posting import PostingProvider
+from providers.sku_stock_counter import SkuStockCounterProvider, StockCounterKey
+from providers.stock import StockProvider
+from schemas.sku import MoveToNotFoundRequest, SetSkuPriceRequest, ToggleIsHiddenRequest
+from services.discount import DiscountService
+from services.sku import SkuService
+from services.stock_counter import StockCounterService, count_stock_change
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.factories.models.acceptance import AcceptanceFactoryBase
+from tests.factories.models.discount import DiscountFactoryBase
+from tests.factories.models.item import ItemFactoryBase
+from tests.factories.models.posting import PostingFactoryBase
+from tests.factories.models.sku import SkuFactoryBase
+from tests.factories.models.stock import StockFactoryBase
+from tests.factories.models.task import TaskFactoryBase
+
+
+class TestSkuService:
+    @pytest.fixture()
+    async def service(self, db: AsyncSession) -> SkuService:
+        return SkuService(
+            db_session_maker=async_session_maker,
+        )
+
+    @pytest.fixture
+    async def discount(self, db: AsyncSession) -> Discount:
+        return await DiscountFactoryBase.create(
+            status=DiscountStatus.ACTIVE,
+            percentage=10,
+            skus=SkuFactoryBase.build_batch(3, base_price=Decimal("100.00")),
+        )
+
+    async def get_actual_prices(self, db: AsyncSession, discount: Discount) -> list[Decimal]:
+        res = await db.execute(select(Sku.actual_price).filter_by(discount_id=discount.id))
+        return list(res.scalars().all())
+
+    async def test_update_skus_actual_prices(
+        self,
+        db: AsyncSession,
+        service: SkuService,
+        discount: Discount,
+    ):
+        await service.update_skus_actual_prices(sku_ids=[sku.id for sku in discount.skus])
+
+        assert await self.get_actual_prices(db, discount) == [Decimal("90.00")] * 3
+
+    async def test_set_sku_price_applies_discount(
+        self,
+        db: AsyncSession,
+        service: SkuService,
+        discount: Discount,
+    ):
+        sku: Sku = discount.skus[0]
+        await service.set_sku_price(request_data=SetSkuPriceRequest(sku_id=sku.id, base_price="50.00"))
+
+        actual_price = (await db.execute(select(Sku.actual_price).filter_by(id=sku.id))).scalar_one()
+        assert actual_price == Decimal("45.00")
+
+    async def test_cancel_discount_restores_base_price(
+        self,
+        db: AsyncSession,
+        service: SkuService,
+        discount: Discount,
+    ):
+        await service.update_skus_actual_prices(sku_ids=[sku.id for sku in discount.skus])
+        await DiscountService(db_session_maker=async_session_maker).cancel_discount(discount_id=discount.id)
+
+        assert await self.get_actual_prices(db, discount) == [Decimal("100.00")] * 3
+
+    async def test_get_sku_info_cached_until_write(
+        self,
+        db: AsyncSession,
+        discount: Discount,
+    ):
+        cache = Cache(backend=InMemoryCacheBackend(max_size=100), ttl=60)
+        service = SkuService(db_session_maker=async_session_maker, cache=cache)
+        sku: Sku = discount.skus[0]
+
+        assert (await service.get_sku_info(sku_id=sku.id)).base_price == Decimal("100.00")
+        # Изменение в обход сервиса не видно, пока запись в кэше не инвалидирована
+        await db.execute(update(Sku).filter_by(id=sku.id).values(base_price=Decimal("200.00")))
+        await db.commit()
+        assert (await service.get_sku_info(sku_id=sku.id)).base_price == Decimal("100.00")
+
+        await service.toggle_is_hidden(request_data=ToggleIsHiddenRequest(sku_id=sku.id, is_hidden=True))
+        sku_info = await service.get_sku_info(sku_id=sku.id)
+        assert sku_info.is_hidden is True
+        assert sku_info.base_price == Decimal("200.00")
+
+        stats = cache.stats()["sku"]
+        assert (stats.hits, stats.misses) == (1, 2)
+
+    async def test_cancel_discount_invalidates_sku_info(
+        self,
+        db: AsyncSession,
+        discount: Discount,
+    ):
+        cache = Cache(backend=InMemoryCacheBackend(max_size=100), ttl=60)
+        service = SkuService(db_session_maker=async_session_maker, cache=cache)
+        sku: Sku = discount.skus[0]
+        await service.update_skus_actual_prices(sku_ids=[sku.id])
+        assert (await service.get_sku_info(sku_id=sku.id)).actual_price == Decimal("90.00")
+
+        await DiscountService(db_session_maker=async_session_maker, cache=cache).cancel_discount(discount_id=discount.id)
+
+        assert (await service.get_sku_info(sku_id=sku.id)).actual_price == Decimal("100.00")
+
+    async def test_move_to_not_found_replaces_picking_task(
+        self,
+        db: AsyncSession,
+        service: SkuService,
+    ):
+        """Потерянный товар собираемого заказа заменяется незарезервированным товаром того же SKU"""
+        sku: Sku = await SkuFactoryBase.create(is_hidden=False)
+        posting = PostingFactoryBase.build(status=PostingStatus.IN_ITEM_PICK)
+        lost_item = await ItemFactoryBase.create(
+            sku=sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=True),
+            tasks=[TaskFactoryBase.build(posting=posting, type=TaskType.PICKING, status=TaskStatus.IN_WORK)],
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+        spare_item = await ItemFactoryBase.create(
+            sku=sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+
+        await service.move_to_not_found(MoveToNotFoundRequest(id=lost_item.id))
+
+        tasks = (await db.execute(select(Task).filter_by(posting_id=posting.id))).scalars().all()
+        assert {(task.item_id, task.status) for task in tasks} == {
+            (lost_item.id, TaskStatus.CANCELED),
+            (spare_item.id, TaskStatus.IN_WORK),
+        }
+        stocks = (await db.execute(select(Stock).filter(Stock.item_id.in_([lost_item.id, spare_item.id])))).scalars()
+        assert {stock.item_id: (stock.status, stock.is_reserved) for stock in stocks} == {
+            lost_item.id: (StockStatus.NOT_FOUND, True),
+            spare_item.id: (StockStatus.VALID, True),
+        }
+        # Задача на подбор замены записана раньше отмененной, счетчик задач заказа не обнуляется между ними
+        events = (await db.execute(select(DomainEvent).order_by(DomainEvent.id))).scalars().all()
+        assert [(event.payload["item_id"], event.payload["after"]) for event in events] == [
+            (str(spare_item.id), TaskStatus.IN_WORK),
+            (str(lost_item.id), TaskStatus.CANCELED),
+        ]
+
+    @pytest.mark.commits
+    async def test_move_to_not_found_after_concurrent_reservation(self, db: AsyncSession):
+        """Резерв, зафиксированный после чтения товара, не ломает перемещение и учитывается в счетчиках"""
+        sku: Sku = await SkuFactoryBase.create(is_hidden=False)
+        item = await ItemFactoryBase.create(
+            sku=sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+        await StockCounterService(db_session_maker=async_session_maker).reconcile()
+
+        class ReservingPostingProvider(PostingProvider):
+            # Параллельный заказ резервирует товар между чтением товара и изменением его стока
+            async def lock_in_item_pick(self, ids):
+                async with async_session_maker() as session:
+                    deltas: Counter[StockCounterKey] = Counter()
+                    for row in await StockProvider(session).reserve(item_ids=[item.id]):
+                        count_stock_change(
+                            deltas,
+                            sku_id=row.sku_id,
+                            before=(row.status, False),
+                            after=(row.status, True),
+                        )
+                    await SkuStockCounterProvider(session).apply_deltas(deltas)
+                    await session.commit()
+                return await super().lock_in_item_pick(ids)
+
+        await SkuService(
+            db_session_maker=async_session_maker,
+            posting_provider=ReservingPostingProvider,
+        ).move_to_not_found(MoveToNotFoundRequest(id=item.id))
+
+        async with async_session_maker() as session:
+            stock: Stock = (await session.execute(select(Stock).filter_by(item_id=item.id))).scalar_one()
+            assert (stock.status, stock.is_reserved) == (StockStatus.NOT_FOUND, True)
+            assert await SkuStockCounterProvider(session).find_drift() == []
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from app.database import async_session_maker
+from factories.models.acceptance import AcceptanceFactoryBase
+from factories.models.item import ItemFactoryBase
+from factories.models.sku import SkuFactoryBase
+from factories.models.stock import StockFactoryBase
+from models import Item, Sku, StockStatus
+from providers.sku_stock_counter import SkuStockCounterProvider
+from schemas.acceptance import (
+    AcceptanceInfoSkuByStockStatus,
+    CreateAcceptanceRequest,
+    StockStatusSchema,
+)
+from schemas.posting import CancelPostingRequest, CreatePostingRequest, OrderedGood
+from schemas.sku import MoveToNotFoundRequest
+from schemas.sku import StockStatus as ApiStockStatus
+from services.acceptance import AcceptanceService
+from services.posting import PostingService
+from services.sku import SkuService
+from services.stock_counter import StockCounterService
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class TestStockCounterService:
+    @pytest.fixture()
+    async def service(self, db: AsyncSession) -> StockCounterService:
+        return StockCounterService(
+            db_session_maker=async_session_maker,
+        )
+
+    @pytest.fixture
+    async def sku(self, db: AsyncSession) -> Sku:
+        return await SkuFactoryBase.create(is_hidden=False)
+
+    @pytest.fixture
+    async def items(self, db: AsyncSession, sku: Sku) -> list[Item]:
+        # Товары созданы в обход сервисов, поэтому счетчиков для них нет
+        return [
+            await ItemFactoryBase.create(
+                sku=sku,
+                stock=StockFactoryBase.build(status=status, is_reserved=False),
+                acceptance=AcceptanceFactoryBase.build(),
+            )
+            for status in (StockStatus.VALID, StockStatus.VALID, StockStatus.DEFECT)
+        ]
+
+    async def assert_no_drift(self) -> None:
+        async with async_session_maker() as session:
+            assert await SkuStockCounterProvider(session).find_drift() == []
+
+    async def test_reconcile_fixes_drift(
+        self,
+        db: AsyncSession,
+        service: StockCounterService,
+        sku: Sku,
+        items: list[Item],
+    ):
+        drift = await service.reconcile()
+
+        assert sorted((row.stock_status, row.stored_count, row.actual_count) for row in drift) == sorted([
+            (StockStatus.VALID, 0, 2),
+            (StockStatus.DEFECT, 0, 1),
+        ])
+        await self.assert_no_drift()
+        assert await service.reconcile() == []
+
+        counters = await SkuService(db_session_maker=async_session_maker).get_sku_stock_counters(sku_id=sku.id)
+        assert counters.available_count == 3
+
+    async def test_reconcile_in_sku_batches(self, db: AsyncSession, sku: Sku, items: list[Item]):
+        other_sku: Sku = await SkuFactoryBase.create(is_hidden=False)
+        await ItemFactoryBase.create(
+            sku=other_sku,
+            stock=StockFactoryBase.build(status=StockStatus.VALID, is_reserved=False),
+            acceptance=AcceptanceFactoryBase.build(),
+        )
+        service = StockCounterService(db_session_maker=async_session_maker, reconcile_batch_size=1)
+
+        drift = await service.reconcile()
+
+        assert sorted((row.sku_id, row.stock_status) for row in drift) == sorted([
+            (sku.id, StockStatus.VALID),
+            (sku.id, StockStatus.DEFECT),
+            (other_sku.id, StockStatus.VALID),
+        ])
+        await self.assert_no_drift()
+
+    @pytest.mark.commits
+    async def test_reconcile_does_not_wait_for_other_skus(self, db: AsyncSession, sku: Sku, items: list[Item]):
+        other_sku: Sku = await SkuFactoryBase.create(is_hidden=False)
+        async with async_session_maker() as writer:
+            # Незафиксированное изменение счетчика другого SKU держит блокировку до конца транзакции
+            await SkuStockCounterProvider(writer).apply_deltas({(other_sku.id, StockStatus.VALID, False): 1})
+            async with async_session_maker() as session:
+                drift = await asyncio.wait_for(SkuStockCounterProvider(session).reconcile([sku.id]), timeout=5)
+                await session.commit()
+            await writer.rollback()
+
+        assert len(drift) == 2
+        await self.assert_no_drift()
+
+    async def test_counters_follow_stock_changes(
+        self,
+        db: AsyncSession,
+        service: StockCounterService,
+        sku: Sku,
+        items: list[Item],
+    ):
+        await service.reconcile()
+        posting_service = PostingService(db_session_maker=async_session_maker)
+        sku_service = SkuService(db_session_maker=async_session_maker)
+
+        await AcceptanceService(db_session_maker=async_session_maker).create_acceptance(CreateAcceptanceRequest(
+            items_to_accept=[AcceptanceInfoSkuByStockStatus(sku_id=sku.id, stock=StockStatusSchema.VALID, count=4)],
+        ))
+        await self.assert_no_drift()
+
+        posting = await posting_service.create_posting(CreatePostingRequest(
+            ordered_goods=[OrderedGood(sku=sku.id, from_valid_ids=[items[0].id], from_defect_ids=[items[2].id])],
+        ))
+        await self.assert_no_drift()
+
+        await sku_service.move_to_not_found(MoveToNotFoundRequest(id=items[0].id))
+        await self.assert_no_drift()
+
+        await posting_service.cancel_posting(CancelPostingRequest(id=posting.id))
+        await self.assert_no_drift()
+
+        # Отмена снимает резерв с товаров незавершенных задач на подбор, включая замену потерянного товара.
+        # Потерянный товар остается зарезервированным: его задача на подбор отменена до отмены заказа
+        counters = await sku_service.get_sku_stock_counters(sku_id=sku.id)
+        assert sorted(
+            (counter.stock.value, counter.reserved_state, counter.count) for counter in counters.counters
+        ) == sorted([
+            (ApiStockStatus.VALID.value, False, 5),
+            (ApiStockStatus.DEFECT.value, False, 1),
+            (ApiStockStatus.NOT_FOUND.value, True, 1),
+        ])
+        assert counters.available_count == 6